@@ -0,0 +1,369 @@
+# Prediction analytics: count/mean/min/max and approximate percentiles per
+# UTC day and per ocean_proximity.
+#
+# Aggregation runs in SQL (JSONB ->> on Postgres, JSON_EXTRACT on SQLite) and
+# lands in the prediction_rollups table, maintained either on insert
+# (ROLLUP_MODE=insert, an upsert in the insert transaction) or by a
+# background refresher (ROLLUP_MODE=schedule, the default, which keeps the
+# insert path a single-row write). /predictions/stats then reads O(buckets)
+# rollup rows.
+# Percentiles come from a fixed-width value histogram kept per rollup row.
+import logging
+import os
+import threading
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import Integer, case, cast, delete, func, literal_column, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from .feature_schema import load_schema, schema_from_csv
+from .model_runtime import DATA_PATH, SCHEMA_PATH
+from .models import Prediction, PredictionRollup, RollupWatermark
+
+logger = logging.getLogger("app.analytics")
+
+# Histogram bin width in predicted-value units (dollars); percentile error is
+# at most one bin before interpolation
+BIN_WIDTH = 5000.0
+UNKNOWN_CATEGORY = ""
+ROLLUP_MODE = os.getenv("ROLLUP_MODE", "schedule").lower()
+ROLLUP_INTERVAL = float(os.getenv("ROLLUP_INTERVAL_SECONDS", "30"))
+# The refresher folds predictions once they are this old: created_at is set
+# before the row commits (write-behind queueing, retries, other workers'
+# clocks), so a younger row may still be invisible. Must exceed that delay;
+# scheduled stats trail by this much.
+ROLLUP_LAG = float(os.getenv("ROLLUP_LAG_SECONDS", "60"))
+# pg_try_advisory_xact_lock key that lets one worker refresh at a time
+_REFRESH_LOCK_KEY = 0x726F6C6C  # "roll"
+
+RollupKey = Tuple[int, date, str]
+
+
+# Categories the model was trained on. Anything else (typos, arbitrary client
+# strings) is rolled up as UNKNOWN_CATEGORY, which also keeps the rollup key
+# within its String(64) column.
+def _known_categories() -> Tuple[str, ...]:
+    schema = load_schema(SCHEMA_PATH) or schema_from_csv(DATA_PATH)
+    return tuple(schema["categories"]["ocean_proximity"])
+
+
+KNOWN_CATEGORIES = _known_categories()
+
+
+@dataclass
+class _Acc:
+    count: int = 0
+    total: float = 0.0
+    min_value: Optional[float] = None
+    max_value: Optional[float] = None
+    histogram: Dict[int, int] = field(default_factory=dict)
+
+    def add(self, count: int, total: float, lo: float, hi: float, bins: Dict[int, int]) -> None:
+        self.count += count
+        self.total += total
+        self.min_value = lo if self.min_value is None else min(self.min_value, lo)
+        self.max_value = hi if self.max_value is None else max(self.max_value, hi)
+        for b, c in bins.items():
+            self.histogram[b] = self.histogram.get(b, 0) + c
+
+    def add_value(self, value: float) -> None:
+        self.add(1, value, value, value, {_bin(value): 1})
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for b in sorted(self.histogram):
+            c = self.histogram[b]
+            if seen + c >= rank:
+                # interpolate inside the bin, then clamp to the observed range
+                value = (b + (rank - seen) / c) * BIN_WIDTH
+                return min(max(value, self.min_value), self.max_value)
+            seen += c
+        return self.max_value
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else None,
+            "min": self.min_value,
+            "max": self.max_value,
+            "p50": self.percentile(0.50),
+            "p90": self.percentile(0.90),
+            "p99": self.percentile(0.99),
+        }
+
+
+def _bin(value: float) -> int:
+    return max(0, int(value // BIN_WIDTH))
+
+
+def _as_date(value) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def _category(payload: Optional[dict]) -> str:
+    value = (payload or {}).get("ocean_proximity")
+    return value if value in KNOWN_CATEGORIES else UNKNOWN_CATEGORY
+
+
+# SQL expressions for the grouping keys, per dialect
+def _bucket_columns(db: Session):
+    dialect = db.get_bind().dialect.name
+    day = func.date(Prediction.created_at)
+    raw = Prediction.payload["ocean_proximity"].as_string()
+    ocean = case((raw.in_(KNOWN_CATEGORIES), raw), else_=UNKNOWN_CATEGORY)
+    scaled = Prediction.predicted_value / BIN_WIDTH
+    # CAST rounds on Postgres but truncates on SQLite (no floor() there by default)
+    value_bin = cast(func.floor(scaled), Integer) if dialect == "postgresql" else cast(scaled, Integer)
+    return day, ocean, value_bin
+
+
+# Aggregate predictions matching `conditions` in the database, grouped by
+# (user, day, ocean_proximity, value bin), folded into one _Acc per rollup key
+def aggregate(db: Session, conditions: Iterable) -> Dict[RollupKey, _Acc]:
+    day, ocean, value_bin = _bucket_columns(db)
+    stmt = (
+        select(
+            Prediction.user_id,
+            day,
+            ocean,
+            value_bin,
+            func.count(),
+            func.sum(Prediction.predicted_value),
+            func.min(Prediction.predicted_value),
+            func.max(Prediction.predicted_value),
+        )
+        .where(*conditions)
+        .group_by(Prediction.user_id, day, ocean, value_bin)
+    )
+    out: Dict[RollupKey, _Acc] = {}
+    for user_id, d, cat, b, count, total, lo, hi in db.execute(stmt):
+        key = (user_id, _as_date(d), cat)
+        out.setdefault(key, _Acc()).add(count, total, lo, hi, {max(0, int(b)): count})
+    return out
+
+
+def _acc_from_row(row: PredictionRollup) -> _Acc:
+    return _Acc(
+        count=row.count,
+        total=row.total,
+        min_value=row.min_value,
+        max_value=row.max_value,
+        histogram={int(k): int(v) for k, v in (row.histogram or {}).items()},
+    )
+
+
+def _write_acc(row: PredictionRollup, acc: _Acc) -> None:
+    row.count = acc.count
+    row.total = acc.total
+    row.min_value = acc.min_value
+    row.max_value = acc.max_value
+    row.histogram = {str(k): v for k, v in sorted(acc.histogram.items())}
+
+
+# Per-key histogram sum of the stored and the incoming row, for the upsert below
+_HISTOGRAM_MERGE = {
+    "postgresql": (
+        "(SELECT jsonb_object_agg(k, s) FROM (SELECT key AS k, SUM(value::bigint) AS s FROM ("
+        "SELECT * FROM jsonb_each_text(prediction_rollups.histogram) "
+        "UNION ALL SELECT * FROM jsonb_each_text(excluded.histogram)) e GROUP BY key) t)"
+    ),
+    "sqlite": (
+        "(SELECT json_group_object(k, s) FROM (SELECT key AS k, SUM(value) AS s FROM ("
+        "SELECT key, value FROM json_each(prediction_rollups.histogram) "
+        "UNION ALL SELECT key, value FROM json_each(excluded.histogram)) GROUP BY key))"
+    ),
+}
+
+
+# Insert-time maintenance: fold freshly inserted rows (dicts with user_id,
+# payload, predicted_value, created_at) into their rollups in the caller's
+# transaction. One INSERT .. ON CONFLICT DO UPDATE per key merges in SQL, so
+# concurrent first inserts for the same key can't collide.
+def apply_to_rollups(db: Session, rows: Iterable[dict]) -> None:
+    pending: Dict[RollupKey, _Acc] = {}
+    for r in rows:
+        key = (r["user_id"], _as_date(r["created_at"]), _category(r.get("payload")))
+        pending.setdefault(key, _Acc()).add_value(float(r["predicted_value"]))
+    merge_into_rollups(db, pending)
+
+
+# Add per-key deltas to the stored rollups
+def merge_into_rollups(db: Session, pending: Dict[RollupKey, _Acc]) -> None:
+    dialect = db.get_bind().dialect.name
+    if dialect not in _HISTOGRAM_MERGE:
+        _apply_locked(db, pending)
+        return
+    insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+    # two-argument min/max are scalar on SQLite; Postgres spells them LEAST/GREATEST
+    least, greatest = (func.least, func.greatest) if dialect == "postgresql" else (func.min, func.max)
+    t = PredictionRollup.__table__
+    now = datetime.utcnow()
+    for key in sorted(pending):
+        acc = pending[key]
+        stmt = insert(t).values(
+            user_id=key[0],
+            day=key[1],
+            ocean_proximity=key[2],
+            count=acc.count,
+            total=acc.total,
+            min_value=acc.min_value,
+            max_value=acc.max_value,
+            histogram={str(k): v for k, v in sorted(acc.histogram.items())},
+            updated_at=now,
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[t.c.user_id, t.c.day, t.c.ocean_proximity],
+            set_={
+                "count": t.c.count + stmt.excluded.count,
+                "total": t.c.total + stmt.excluded.total,
+                "min_value": least(t.c.min_value, stmt.excluded.min_value),
+                "max_value": greatest(t.c.max_value, stmt.excluded.max_value),
+                "histogram": literal_column(_HISTOGRAM_MERGE[dialect]),
+                "updated_at": stmt.excluded.updated_at,
+            },
+        )
+        db.execute(stmt)
+
+
+# Other dialects: read-modify-write under a row lock
+def _apply_locked(db: Session, pending: Dict[RollupKey, _Acc]) -> None:
+    for key in sorted(pending):
+        acc = pending[key]
+        row = db.get(PredictionRollup, key, with_for_update=True)
+        if row is None:
+            row = PredictionRollup(user_id=key[0], day=key[1], ocean_proximity=key[2])
+            db.add(row)
+            merged = acc
+        else:
+            merged = _acc_from_row(row)
+            merged.add(acc.count, acc.total, acc.min_value, acc.max_value, acc.histogram)
+        _write_acc(row, merged)
+
+
+# Scheduled maintenance: aggregate the predictions created in
+# [watermark, now - lag) in SQL and add them to the rollups as deltas, then
+# move the watermark to now - lag. Each prediction is folded exactly once, as
+# long as it commits within `lag` of its created_at. On Postgres an advisory
+# lock lets a single worker refresh per round; the others skip it. Returns
+# the number of rollup keys updated.
+def refresh_rollups(db: Session, lag: float = ROLLUP_LAG) -> int:
+    if db.get_bind().dialect.name == "postgresql":
+        locked = db.execute(select(func.pg_try_advisory_xact_lock(_REFRESH_LOCK_KEY))).scalar()
+        if not locked:
+            db.rollback()
+            return 0
+    wm = db.get(RollupWatermark, 1, with_for_update=True)
+    if wm is None:
+        wm = RollupWatermark(id=1)
+        db.add(wm)
+        db.flush()
+    cutoff = datetime.utcnow() - timedelta(seconds=lag)
+    conditions = [Prediction.created_at < cutoff]
+    if wm.folded_until is not None:
+        if cutoff <= wm.folded_until:
+            db.rollback()
+            return 0
+        conditions.append(Prediction.created_at >= wm.folded_until)
+    deltas = aggregate(db, conditions)
+    merge_into_rollups(db, deltas)
+    wm.folded_until = cutoff
+    db.commit()
+    logger.info("rollup_refresh", extra={"keys": len(deltas), "folded_until": cutoff.isoformat()})
+    return len(deltas)
+
+
+# Drop and rebuild all rollups (e.g. after switching ROLLUP_MODE)
+def rebuild_rollups(db: Session, lag: float = ROLLUP_LAG) -> int:
+    db.execute(delete(PredictionRollup))
+    db.execute(delete(RollupWatermark))
+    db.flush()
+    return refresh_rollups(db, lag=lag)
+
+
+# Stats for one user from rollups (source="rollup") or straight from the
+# predictions table (source="raw"); both aggregate in SQL
+def user_stats(
+    db: Session, user_id: int, group_by: str = "day", days: int = 30, source: str = "rollup"
+) -> List[dict]:
+    since = (datetime.utcnow() - timedelta(days=max(1, days) - 1)).date()
+    if source == "raw":
+        start = datetime.combine(since, datetime.min.time())
+        parts = aggregate(db, [Prediction.user_id == user_id, Prediction.created_at >= start])
+    else:
+        rows = db.execute(
+            select(PredictionRollup).where(
+                PredictionRollup.user_id == user_id, PredictionRollup.day >= since
+            )
+        ).scalars()
+        parts = {(r.user_id, r.day, r.ocean_proximity): _acc_from_row(r) for r in rows}
+
+    groups: Dict[tuple, _Acc] = {}
+    for (_, d, cat), acc in parts.items():
+        if group_by == "day":
+            key: tuple = (d.isoformat(), None)
+        elif group_by == "ocean_proximity":
+            key = (None, cat)
+        else:
+            key = (d.isoformat(), cat)
+        groups.setdefault(key, _Acc()).add(
+            acc.count, acc.total, acc.min_value, acc.max_value, acc.histogram
+        )
+    return [
+        {"day": d, "ocean_proximity": cat, **acc.summary()}
+        for (d, cat), acc in sorted(groups.items(), key=lambda kv: (kv[0][0] or "", kv[0][1] or ""))
+    ]
+
+
+# Background thread for ROLLUP_MODE=schedule
+class RollupRefresher:
+    def __init__(self, session_factory, interval: float = ROLLUP_INTERVAL) -> None:
+        self._session_factory = session_factory
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="rollup-refresher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            db = self._session_factory()
+            try:
+                refresh_rollups(db)
+            except Exception:
+                db.rollback()
+                logger.exception("rollup_refresh_failed")
+            finally:
+                db.close()
+            self._stop.wait(self.interval)
+
+
+if __name__ == "__main__":
+    import sys
+
+    from .db import SessionLocal, init_db
+
+    if sys.argv[1:] != ["rebuild"]:
+        raise SystemExit("usage: python -m app.analytics rebuild")
+    init_db()
+    session = SessionLocal()
+    try:
+        print(f"rebuilt {rebuild_rollups(session)} rollup rows")
+    finally:
+        session.close()
@@ -1,12 +1,19 @@
 import os
+import hashlib
 import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
-from typing import List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 
 import jwt
 from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 
+from .metrics import observe_stage
+
 
 # JWT authentication setup
 _security = HTTPBearer(auto_error=False)
@@ -27,63 +34,192 @@ def _audit_fail(req: Request, reason: str) -> None:
     )
 
 
-# Retrieve JWT secrets from environment variables
-def _get_jwt_secrets() -> List[str]:
-    secrets = os.getenv("JWT_SECRETS") or os.getenv("JWT_SECRET")
-    if not secrets:
-        return []
-    return [s.strip() for s in secrets.split(",") if s.strip()]
+# JWT configuration, read from the environment once and reused per request
+@dataclass(frozen=True)
+class JWTSettings:
+    secrets: Tuple[str, ...]
+    issuer: Optional[str]
+    audience: Optional[str]
+    alg: str
+    ttl_seconds: int
+    cache_size: int
+
+
+def _load_settings() -> JWTSettings:
+    raw = os.getenv("JWT_SECRETS") or os.getenv("JWT_SECRET") or ""
+    return JWTSettings(
+        secrets=tuple(s.strip() for s in raw.split(",") if s.strip()),
+        issuer=os.getenv("JWT_ISSUER") or None,
+        audience=os.getenv("JWT_AUDIENCE") or None,
+        alg=os.getenv("JWT_ALG", "HS256"),
+        ttl_seconds=int(os.getenv("JWT_TTL_SECONDS", "900")),
+        cache_size=int(os.getenv("JWT_CACHE_SIZE", "10000")),
+    )
+
+
+_settings: Optional[JWTSettings] = None
+_settings_lock = threading.Lock()
+
+
+def get_settings() -> JWTSettings:
+    global _settings
+    if _settings is None:
+        with _settings_lock:
+            if _settings is None:
+                _settings = _load_settings()
+    return _settings
+
+
+# Re-read JWT_* variables (e.g. after rotating secrets) and drop cached tokens
+def reload_settings() -> JWTSettings:
+    global _settings
+    with _settings_lock:
+        _settings = _load_settings()
+    _token_cache.clear()
+    _secret_matches.reset()
+    return _settings
+
+
+# Bounded LRU of verified tokens: sha256(token) -> (claims, exp).
+# Entries are dropped once exp passes, so a cached token never outlives itself.
+class _VerifiedTokenCache:
+    def __init__(self) -> None:
+        self._data: "OrderedDict[str, Tuple[dict, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, digest: str, now: float) -> Optional[dict]:
+        with self._lock:
+            item = self._data.get(digest)
+            if item is None:
+                self.misses += 1
+                return None
+            claims, exp = item
+            if exp <= now:
+                del self._data[digest]
+                self.misses += 1
+                return None
+            self._data.move_to_end(digest)
+            self.hits += 1
+            return claims
+
+    def put(self, digest: str, claims: dict, max_entries: int) -> None:
+        if max_entries <= 0:
+            return
+        with self._lock:
+            self._data[digest] = (claims, float(claims["exp"]))
+            self._data.move_to_end(digest)
+            while len(self._data) > max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+# How many tokens each secret (by rotation index) has verified; the most
+# recent match is tried first so old-secret tokens don't pay N failed decodes
+class _SecretMatchStats:
+    def __init__(self) -> None:
+        self._counts: Dict[int, int] = {}
+        self._last = 0
+        self._lock = threading.Lock()
+
+    # Rotation indexes to try, most recent match first
+    def order(self, n: int) -> List[int]:
+        first = self._last if self._last < n else 0
+        return [first] + [i for i in range(n) if i != first]
+
+    def record(self, idx: int) -> None:
+        with self._lock:
+            self._last = idx
+            self._counts[idx] = self._counts.get(idx, 0) + 1
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counts.clear()
+            self._last = 0
+
+    def counts(self) -> Dict[int, int]:
+        with self._lock:
+            return dict(self._counts)
+
+
+_token_cache = _VerifiedTokenCache()
+_secret_matches = _SecretMatchStats()
+
+
+def _decode(token: str, secret: str, settings: JWTSettings) -> dict:
+    return jwt.decode(
+        token,
+        secret,
+        algorithms=[settings.alg],
+        audience=settings.audience,
+        issuer=settings.issuer,
+        options={"require": ["exp", "iat"]},
+    )
 
-# Common JWT parameters
-def _jwt_common_params() -> Tuple[Optional[str], Optional[str], str]:
-    issuer = os.getenv("JWT_ISSUER")
-    audience = os.getenv("JWT_AUDIENCE")
-    alg = os.getenv("JWT_ALG", "HS256")
-    return issuer, audience, alg
 
 # Verify JWT token against available secrets
 def _verify_jwt(token: str) -> Optional[dict]:
-    issuer, audience, alg = _jwt_common_params()
-    options = {"require": ["exp", "iat"]}
-    for secret in _get_jwt_secrets():
+    settings = get_settings()
+    digest = hashlib.sha256(token.encode()).hexdigest()
+    cached = _token_cache.get(digest, time.time())
+    if cached is not None:
+        return cached
+    for idx in _secret_matches.order(len(settings.secrets)):
         try:
-            payload = jwt.decode(
-                token,
-                secret,
-                algorithms=[alg],
-                audience=audience if audience else None,
-                issuer=issuer if issuer else None,
-                options=options,
-            )
-            return payload
+            payload = _decode(token, settings.secrets[idx], settings)
         except jwt.PyJWTError:
             continue
+        _secret_matches.record(idx)
+        _token_cache.put(digest, payload, settings.cache_size)
+        return payload
     return None
 
 
+def token_cache_stats() -> dict:
+    return {
+        "size": len(_token_cache),
+        "hits": _token_cache.hits,
+        "misses": _token_cache.misses,
+        "secret_matches": _secret_matches.counts(),
+    }
+
+
 # Issue a new JWT token for the given subject
 def issue_jwt(subject: str) -> str:
-    secrets = _get_jwt_secrets()
-    if not secrets:
+    settings = get_settings()
+    if not settings.secrets:
         raise RuntimeError("JWT_SECRETS (or JWT_SECRET) must be set to issue JWTs")
-    issuer, audience, alg = _jwt_common_params()
-    ttl = int(os.getenv("JWT_TTL_SECONDS", "900"))
     now = datetime.now(timezone.utc)
     payload = {
         "sub": subject,
         "iat": int(now.timestamp()),
-        "exp": int((now + timedelta(seconds=ttl)).timestamp()),
+        "exp": int((now + timedelta(seconds=settings.ttl_seconds)).timestamp()),
     }
-    if issuer:
-        payload["iss"] = issuer
-    if audience:
-        payload["aud"] = audience
-    token = jwt.encode(payload, secrets[0], algorithm=alg)
+    if settings.issuer:
+        payload["iss"] = settings.issuer
+    if settings.audience:
+        payload["aud"] = settings.audience
+    token = jwt.encode(payload, settings.secrets[0], algorithm=settings.alg)
     return token
 
 
 # Dependency to require and validate bearer token
 def require_token(request: Request, creds: HTTPAuthorizationCredentials = Depends(_security)) -> str:
+    t0 = time.perf_counter()
+    try:
+        return _check_token(request, creds)
+    finally:
+        observe_stage("auth", time.perf_counter() - t0)
+
+
+def _check_token(request: Request, creds: Optional[HTTPAuthorizationCredentials]) -> str:
     # Validate presence and scheme of credentials
     if not creds or creds.scheme.lower() != "bearer":
         _audit_fail(request, "missing_bearer")
@@ -0,0 +1,174 @@
+# Comparable districts: the K rows of housing.csv closest to a request.
+#
+# Distance is Euclidean over standardized features. The count features are
+# log-scaled first (they are heavily skewed), and longitude/latitude are
+# weighted by COMPARABLES_LOCATION_WEIGHT so location dominates. Candidates
+# share the request's ocean_proximity when that category has at least K
+# rows, otherwise all rows are searched. One KD-tree per category (plus one
+# over everything) answers a query in tens of microseconds; see
+# benchmarks/bench_comparables.py for the brute-force comparison.
+#
+# The index is built from housing.csv at startup (~50 ms), or loaded from
+# COMPARABLES_PATH when `python -m app.comparables build` saved one for the
+# same CSV.
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import KDTree
+
+from .feature_schema import file_sha256
+from .model_runtime import DATA_PATH, ROOT
+
+logger = logging.getLogger("app.model")
+
+COMPARABLES_PATH = Path(os.getenv("COMPARABLES_PATH", str(ROOT / "comparables.joblib")))
+LOCATION_WEIGHT = float(os.getenv("COMPARABLES_LOCATION_WEIGHT", "2.0"))
+COMPARABLES_MAX_K = 50
+
+FEATURES = (
+    "longitude", "latitude", "housing_median_age", "total_rooms",
+    "total_bedrooms", "population", "households", "median_income",
+)
+_LOG_COLUMNS = [3, 4, 5, 6]
+_LOCATION_COLUMNS = [0, 1]
+
+
+class ComparablesIndex:
+    def __init__(self, df: pd.DataFrame, data_hash: str, location_weight: float = LOCATION_WEIGHT) -> None:
+        self.data_hash = data_hash
+        self.raw = df[list(FEATURES)].to_numpy(dtype=np.float64)
+        self.values = df["median_house_value"].to_numpy(dtype=np.float64)
+        self.categories = df["ocean_proximity"].to_numpy(dtype=object)
+        self.row_ids = df.index.to_numpy()
+
+        logged = self._log_scale(self.raw)
+        self.mean = logged.mean(axis=0)
+        self.scale = logged.std(axis=0)
+        self.weights = np.ones(len(FEATURES))
+        self.weights[_LOCATION_COLUMNS] = location_weight
+        self.points = self.transform(self.raw)
+
+        self._tree = KDTree(self.points)
+        self._by_category: Dict[str, Tuple[np.ndarray, KDTree]] = {}
+        for cat in np.unique(self.categories):
+            rows = np.flatnonzero(self.categories == cat)
+            self._by_category[cat] = (rows, KDTree(self.points[rows]))
+
+    @staticmethod
+    def _log_scale(X: np.ndarray) -> np.ndarray:
+        X = X.copy()
+        X[:, _LOG_COLUMNS] = np.log1p(np.maximum(X[:, _LOG_COLUMNS], 0.0))
+        return X
+
+    # Raw feature rows -> the weighted, standardized space the trees index
+    def transform(self, X: np.ndarray) -> np.ndarray:
+        return (self._log_scale(X) - self.mean) / self.scale * self.weights
+
+    # Rows searched for a request: its category's rows, or all rows (None)
+    def candidates(self, category: Optional[str], k: int) -> Tuple[Optional[np.ndarray], KDTree]:
+        sub = self._by_category.get(category)
+        if sub is not None and len(sub[0]) >= k:
+            return sub
+        return None, self._tree
+
+    def query(self, payload: dict, k: int = 5) -> List[dict]:
+        x = self.transform(np.array([[float(payload[f]) for f in FEATURES]]))
+        rows, tree = self.candidates(payload.get("ocean_proximity"), k)
+        dist, ind = tree.query(x, k=min(k, tree.data.shape[0]))
+        ind = ind[0] if rows is None else rows[ind[0]]
+        return [self._record(i, d) for i, d in zip(ind, dist[0])]
+
+    def _record(self, i: int, distance: float) -> dict:
+        out = {"id": int(self.row_ids[i])}
+        out.update(zip(FEATURES, self.raw[i].tolist()))
+        out["ocean_proximity"] = str(self.categories[i])
+        out["median_house_value"] = float(self.values[i])
+        out["distance"] = round(float(distance), 6)
+        return out
+
+
+def build_index(data_path: Path = DATA_PATH) -> ComparablesIndex:
+    # index = row number among housing.csv's data rows
+    df = pd.read_csv(data_path).dropna()
+    return ComparablesIndex(df, file_sha256(data_path))
+
+
+def save_index(index: ComparablesIndex, path: Path = COMPARABLES_PATH) -> None:
+    tmp = Path(path).with_suffix(".tmp")
+    joblib.dump(index, tmp)
+    os.replace(tmp, path)
+
+
+# The saved index, or None when it is missing, unreadable or built from
+# another version of the CSV
+def load_index(path: Path = COMPARABLES_PATH, data_path: Path = DATA_PATH) -> Optional[ComparablesIndex]:
+    try:
+        index = joblib.load(path)
+    except FileNotFoundError:
+        return None
+    except Exception:
+        # truncated or corrupt file (unpickling can fail with almost any
+        # exception type), or pickled by code that has since changed
+        logger.warning("comparables_index_unreadable", extra={"path": str(path)}, exc_info=True)
+        return None
+    if not isinstance(index, ComparablesIndex) or index.data_hash != file_sha256(data_path):
+        logger.warning("comparables_index_stale", extra={"path": str(path)})
+        return None
+    return index
+
+
+# Loads the artifact or builds the index on first use (or on a startup thread)
+class ComparablesStore:
+    def __init__(self, path: Path = COMPARABLES_PATH, data_path: Path = DATA_PATH) -> None:
+        self.path = path
+        self.data_path = data_path
+        self._index: Optional[ComparablesIndex] = None
+        self._lock = threading.Lock()
+        self.load_seconds: Optional[float] = None
+
+    def get(self) -> ComparablesIndex:
+        index = self._index
+        if index is not None:
+            return index
+        with self._lock:
+            if self._index is None:
+                t0 = time.perf_counter()
+                index = load_index(self.path, self.data_path)
+                source = "artifact"
+                if index is None:
+                    index, source = build_index(self.data_path), "csv"
+                self._index = index
+                self.load_seconds = time.perf_counter() - t0
+                logger.info(
+                    "comparables_index_ready",
+                    extra={"source": source, "rows": len(index.row_ids), "seconds": round(self.load_seconds, 4)},
+                )
+            return self._index
+
+    def start_background(self) -> None:
+        threading.Thread(target=self._load_logged, name="comparables-loader", daemon=True).start()
+
+    # A failed background build is logged; the next get() tries again
+    def _load_logged(self) -> None:
+        try:
+            self.get()
+        except Exception:
+            logger.exception("comparables_index_failed")
+
+
+if __name__ == "__main__":
+    import sys
+
+    if sys.argv[1:] != ["build"]:
+        raise SystemExit("usage: python -m app.comparables build")
+    t0 = time.perf_counter()
+    idx = build_index()
+    save_index(idx)
+    print(f"indexed {len(idx.row_ids)} rows in {time.perf_counter() - t0:.3f}s -> {COMPARABLES_PATH}")
@@ -1,16 +1,31 @@
 import logging
-from typing import Optional
+import os
+from datetime import datetime
+from typing import Iterator, List, Optional, Sequence, Tuple
 
 from passlib.context import CryptContext
+from sqlalchemy import insert, or_, select
 from sqlalchemy.orm import Session
 
+from . import analytics
 from .models import User, Prediction
 
 
 logger = logging.getLogger("app.db")
+# Largest page any list endpoint returns
+MAX_PAGE_SIZE = 500
+# Work factors; hashes below the configured rounds are flagged for rehash
+PBKDF2_ROUNDS = int(os.getenv("PASSWORD_PBKDF2_ROUNDS", "29000"))
+BCRYPT_ROUNDS = int(os.getenv("PASSWORD_BCRYPT_ROUNDS", "12"))
+
 # Prefer pbkdf2_sha256 for portability; allow verifying legacy bcrypt variants
 pwd_context = CryptContext(
-    schemes=["pbkdf2_sha256", "bcrypt_sha256", "bcrypt"], deprecated="auto"
+    schemes=["pbkdf2_sha256", "bcrypt_sha256", "bcrypt"],
+    deprecated="auto",
+    pbkdf2_sha256__default_rounds=PBKDF2_ROUNDS,
+    pbkdf2_sha256__min_rounds=PBKDF2_ROUNDS,
+    bcrypt_sha256__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
 )
 
 # Password hashing
@@ -21,69 +36,171 @@ def hash_password(password: str) -> str:
 def verify_password(password: str, password_hash: str) -> bool:
     return pwd_context.verify(password, password_hash)
 
+# Verify and, if the hash uses a deprecated scheme or too few rounds,
+# return a fresh hash to store (None otherwise)
+def verify_and_update_password(password: str, password_hash: str) -> Tuple[bool, Optional[str]]:
+    return pwd_context.verify_and_update(password, password_hash)
+
 # Retrieve user by email from the database
 def get_user_by_email(db: Session, email: str) -> Optional[User]:
-    logger.debug("db_query_get_user_by_email", extra={"email": email})
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("db_query_get_user_by_email", extra={"email": email})
     user = db.query(User).filter(User.email == email).first()
-    logger.debug(
-        "db_query_result",
-        extra={"found": bool(user), "entity": "User", "by": "email"},
-    )
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(
+            "db_query_result",
+            extra={"found": bool(user), "entity": "User", "by": "email"},
+        )
     return user
 
 # Create a new user in the database
-def create_user(db: Session, email: str, password: str) -> User:
-    logger.info("db_insert_user_start", extra={"email": email})
+# Pass password_hash when the password was already hashed off-thread
+def create_user(
+    db: Session, email: str, password: Optional[str] = None, password_hash: Optional[str] = None
+) -> User:
+    if logger.isEnabledFor(logging.INFO):
+        logger.info("db_insert_user_start", extra={"email": email})
 
     user = User(
         email=email,
-        password_hash=hash_password(password),
+        password_hash=password_hash or hash_password(password),
     )
 
     db.add(user)
     db.commit()      # Persist to DB
     db.refresh(user) # To get the generated ID and other defaults
 
-    logger.info("db_insert_user_done", extra={"user_id": user.id})
+    if logger.isEnabledFor(logging.INFO):
+        logger.info("db_insert_user_done", extra={"user_id": user.id})
     return user
 
+# Store a rehashed password (transparent upgrade on login)
+def update_password_hash(db: Session, user: User, password_hash: str) -> None:
+    user.password_hash = password_hash
+    db.commit()
+    if logger.isEnabledFor(logging.INFO):
+        logger.info("db_user_password_rehashed", extra={"user_id": user.id})
+
 # List users with pagination
 # For now it works for all logged in users only; in future may restrict to admins
-def list_users(db: Session, offset: int = 0, limit: int = 100):
-    logger.debug("db_query_list_users", extra={"offset": offset, "limit": limit})
+# after_id (keyset cursor) takes precedence over offset
+def list_users(db: Session, offset: int = 0, limit: int = 100, after_id: Optional[int] = None):
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("db_query_list_users", extra={"offset": offset, "limit": limit, "after_id": after_id})
     q = db.query(User).order_by(User.id.asc())
-    if offset:
+    if after_id is not None:
+        q = q.filter(User.id > after_id)
+    elif offset:
         q = q.offset(max(0, int(offset)))
     if limit:
-        q = q.limit(max(1, min(int(limit), 500)))
+        q = q.limit(max(1, min(int(limit), MAX_PAGE_SIZE)))
     rows = q.all()
-    logger.debug("db_query_result", extra={"count": len(rows), "entity": "User"})
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("db_query_result", extra={"count": len(rows), "entity": "User"})
     return rows
 
 # Create a prediction record
-def create_prediction(db: Session, user_id: int, payload: dict, predicted_value: float) -> Prediction:
-    logger.info("db_insert_prediction_start", extra={"user_id": user_id})
-    rec = Prediction(user_id=user_id, payload=payload, predicted_value=predicted_value)
+def create_prediction(
+    db: Session, user_id: int, payload: dict, predicted_value: float, model_version: Optional[str] = None
+) -> Prediction:
+    if logger.isEnabledFor(logging.INFO):
+        logger.info("db_insert_prediction_start", extra={"user_id": user_id})
+    rec = Prediction(
+        user_id=user_id,
+        payload=payload,
+        predicted_value=predicted_value,
+        model_version=model_version,
+        created_at=datetime.utcnow(),
+    )
     db.add(rec)
+    if analytics.ROLLUP_MODE == "insert":
+        analytics.apply_to_rollups(
+            db,
+            [{"user_id": user_id, "payload": payload, "predicted_value": predicted_value, "created_at": rec.created_at}],
+        )
     db.commit()
     db.refresh(rec)
-    logger.info("db_insert_prediction_done", extra={"prediction_id": rec.id})
+    if logger.isEnabledFor(logging.INFO):
+        logger.info("db_insert_prediction_done", extra={"prediction_id": rec.id})
     return rec
 
-# List predictions for a user
-def list_user_predictions(db: Session, user_id: int, offset: int = 0, limit: int = 100):
-    logger.debug(
-        "db_query_list_predictions", extra={"user_id": user_id, "offset": offset, "limit": limit}
-    )
+# Create many prediction records with one multi-row INSERT and a single commit
+def create_predictions(
+    db: Session,
+    user_id: int,
+    payloads: Sequence[dict],
+    predicted_values: Sequence[float],
+    model_version: Optional[str] = None,
+) -> int:
+    if logger.isEnabledFor(logging.INFO):
+        logger.info("db_insert_predictions_start", extra={"user_id": user_id, "count": len(payloads)})
+    rows: List[dict] = [
+        {"user_id": user_id, "payload": payload, "predicted_value": value, "model_version": model_version}
+        for payload, value in zip(payloads, predicted_values)
+    ]
+    insert_prediction_rows(db, rows)
+    if logger.isEnabledFor(logging.INFO):
+        logger.info("db_insert_predictions_done", extra={"user_id": user_id, "count": len(rows)})
+    return len(rows)
+
+# Bulk insert of ready-made rows (user_id, payload, predicted_value[, created_at, model_version])
+# Rollups for the same rows are updated in the same transaction
+def insert_prediction_rows(db: Session, rows: Sequence[dict]) -> int:
+    if rows:
+        now = datetime.utcnow()
+        rows = [r if r.get("created_at") else {**r, "created_at": now} for r in rows]
+        db.execute(insert(Prediction), rows)
+        if analytics.ROLLUP_MODE == "insert":
+            analytics.apply_to_rollups(db, rows)
+        db.commit()
+    return len(rows)
+
+# List predictions for a user, newest first
+# after=(created_at, id) of the previous page's last row seeks past it via
+# ix_predictions_user_created_id instead of scanning and discarding OFFSET rows
+def list_user_predictions(
+    db: Session,
+    user_id: int,
+    offset: int = 0,
+    limit: int = 100,
+    after: Optional[Tuple[datetime, int]] = None,
+):
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(
+            "db_query_list_predictions",
+            extra={"user_id": user_id, "offset": offset, "limit": limit, "keyset": after is not None},
+        )
     q = (
         db.query(Prediction)
         .filter(Prediction.user_id == user_id)
-        .order_by(Prediction.created_at.desc())
+        .order_by(Prediction.created_at.desc(), Prediction.id.asc())
     )
-    if offset:
+    if after is not None:
+        after_created, after_id = after
+        # the redundant `<=` gives the planner a range bound on the index
+        q = q.filter(
+            Prediction.created_at <= after_created,
+            or_(Prediction.created_at < after_created, Prediction.id > after_id),
+        )
+    elif offset:
         q = q.offset(max(0, int(offset)))
     if limit:
-        q = q.limit(max(1, min(int(limit), 500)))
+        q = q.limit(max(1, min(int(limit), MAX_PAGE_SIZE)))
     rows = q.all()
-    logger.debug("db_query_result", extra={"count": len(rows), "entity": "Prediction"})
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("db_query_result", extra={"count": len(rows), "entity": "Prediction"})
     return rows
+
+# Stream a user's full history as (id, created_at, predicted_value, payload)
+# tuples through a server-side cursor; memory stays flat regardless of row count
+def iter_user_predictions(db: Session, user_id: int, chunk_size: int = 1000) -> Iterator[tuple]:
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("db_stream_predictions", extra={"user_id": user_id, "chunk_size": chunk_size})
+    stmt = (
+        select(Prediction.id, Prediction.created_at, Prediction.predicted_value, Prediction.payload)
+        .where(Prediction.user_id == user_id)
+        .order_by(Prediction.created_at.desc(), Prediction.id.asc())
+        .execution_options(stream_results=True, yield_per=chunk_size)
+    )
+    for row in db.execute(stmt):
+        yield tuple(row)
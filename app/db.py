@@ -1,10 +1,14 @@
 import os
 import logging
+import threading
+import time
 from contextlib import contextmanager
-from typing import Generator
+from typing import Generator, Optional
 
-from sqlalchemy import create_engine, event
+from sqlalchemy import create_engine, event, exc, inspect, text
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.pool import QueuePool
 
 logger = logging.getLogger("app.db")
 
@@ -16,11 +20,160 @@ if not DATABASE_URL:
         "postgresql+psycopg2://app:app@db:5432/appdb"
     )
 
+# Pool sizing (per worker process). DB_POOL_RECYCLE closes connections older
+# than N seconds at checkout (-1 = never), below server/proxy idle timeouts.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+# Liveness check on checkout: "always" (SELECT 1 on every checkout), "idle"
+# (only when the connection sat in the pool longer than DB_PRE_PING_IDLE
+# seconds) or "off" (rely on recycle and disconnect invalidation)
+DB_PRE_PING = os.getenv("DB_PRE_PING", "idle").lower()
+DB_PRE_PING_IDLE = float(os.getenv("DB_PRE_PING_IDLE", "30"))
+
+
+# Pool counters fed by pool events; checkout wait is timed in TimedQueuePool
+class PoolMetrics:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.pings = 0
+        self.ping_failures = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record_wait(self, seconds: float, timed_out: bool = False) -> None:
+        with self._lock:
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            if timed_out:
+                self.timeouts += 1
+
+    def incr(self, name: str) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def snapshot(self, pool) -> dict:
+        with self._lock:
+            out = {
+                "checkouts": self.checkouts,
+                "connects": self.connects,
+                "invalidations": self.invalidations,
+                "pings": self.pings,
+                "ping_failures": self.ping_failures,
+                "timeouts": self.timeouts,
+                "checkout_wait_mean_ms": (self.wait_total / self.checkouts * 1e3) if self.checkouts else 0.0,
+                "checkout_wait_max_ms": self.wait_max * 1e3,
+            }
+        if isinstance(pool, QueuePool):
+            out.update(
+                size=pool.size(),
+                in_use=pool.checkedout(),
+                idle=pool.checkedin(),
+                overflow=max(0, pool.overflow()),
+            )
+        return out
+
+
+# QueuePool that times how long callers wait for a connection
+class TimedQueuePool(QueuePool):
+    def __init__(self, *args, metrics: Optional[PoolMetrics] = None, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.metrics = metrics or PoolMetrics()
+
+    def _do_get(self):
+        t0 = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except exc.TimeoutError:
+            self.metrics.record_wait(time.perf_counter() - t0, timed_out=True)
+            raise
+        self.metrics.record_wait(time.perf_counter() - t0)
+        return conn
+
+    def recreate(self):
+        new = super().recreate()
+        new.metrics = self.metrics
+        return new
+
+
+def _ping(dbapi_connection) -> None:
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute("SELECT 1")
+    finally:
+        cursor.close()
+
+
+def _install_pool_events(engine: Engine, metrics: PoolMetrics, pre_ping: str, idle_seconds: float) -> None:
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, record):
+        metrics.incr("connects")
+        record.info["checked_in_at"] = time.monotonic()
+
+    @event.listens_for(engine, "checkin")
+    def _on_checkin(dbapi_connection, record):
+        record.info["checked_in_at"] = time.monotonic()
+
+    @event.listens_for(engine, "invalidate")
+    def _on_invalidate(dbapi_connection, record, exception):
+        metrics.incr("invalidations")
+
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_connection, record, proxy):
+        metrics.incr("checkouts")
+        if pre_ping == "always":
+            # SQLAlchemy's own pool_pre_ping does the round trip
+            metrics.incr("pings")
+        if pre_ping != "idle":
+            return
+        idle = time.monotonic() - record.info.get("checked_in_at", 0.0)
+        if idle < idle_seconds:
+            return
+        metrics.incr("pings")
+        try:
+            _ping(dbapi_connection)
+        except Exception:
+            metrics.incr("ping_failures")
+            # the pool discards this connection and retries with a fresh one
+            raise exc.DisconnectionError()
+
+
+# Build an engine with the configured pool; keyword overrides are for benchmarks
+def build_engine(
+    url: str,
+    pool_size: int = DB_POOL_SIZE,
+    max_overflow: int = DB_MAX_OVERFLOW,
+    pool_timeout: float = DB_POOL_TIMEOUT,
+    pool_recycle: int = DB_POOL_RECYCLE,
+    pre_ping: str = DB_PRE_PING,
+    pre_ping_idle: float = DB_PRE_PING_IDLE,
+) -> Engine:
+    kwargs = {"pool_pre_ping": pre_ping == "always", "pool_recycle": pool_recycle}
+    metrics = PoolMetrics()
+    parsed = make_url(url)
+    # in-memory SQLite keeps its per-thread singleton pool
+    if not (parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:")):
+        kwargs.update(
+            poolclass=TimedQueuePool,
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=pool_timeout,
+        )
+    new_engine = create_engine(url, **kwargs)
+    if isinstance(new_engine.pool, TimedQueuePool):
+        new_engine.pool.metrics = metrics
+    new_engine.pool_metrics = metrics
+    _install_pool_events(new_engine, metrics, pre_ping, pre_ping_idle)
+    return new_engine
+
+
 # Create engine / session factory
-engine = create_engine(
-    DATABASE_URL,
-    pool_pre_ping=True,
-)
+engine = build_engine(DATABASE_URL)
 
 safe_url = engine.url.render_as_string(hide_password=True)
 logger.info("db_engine_created", extra={"url": safe_url})
@@ -36,8 +189,42 @@ def init_db() -> None:
     from . import models  # noqa: F401 - ensure models are imported
     logger.info("db_init_start", extra={"url": safe_url})
     Base.metadata.create_all(bind=engine)
+    # create_all skips indexes on tables that already exist; add any new ones
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+    _add_missing_columns()
     logger.info("db_init_complete")
 
+# Nullable columns added to existing tables after their first release;
+# create_all only creates whole tables, so add these in place
+_ADDED_COLUMNS = {"predictions": ("model_version",)}
+
+
+def _add_missing_columns() -> None:
+    insp = inspect(engine)
+    for table_name, columns in _ADDED_COLUMNS.items():
+        existing = {c["name"] for c in insp.get_columns(table_name)}
+        table = Base.metadata.tables[table_name]
+        for name in columns:
+            if name in existing:
+                continue
+            col_type = table.c[name].type.compile(dialect=engine.dialect)
+            with engine.begin() as conn:
+                conn.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {name} {col_type}"))
+            logger.info("db_column_added", extra={"table": table_name, "column": name})
+
+
+# Cheap connectivity check used by the readiness probe
+def ping_db() -> bool:
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        return True
+    except Exception:
+        logger.warning("db_ping_failed", exc_info=True)
+        return False
+
 # Provide a transactional scope around a series of operations
 # Open a session, yield it, commit if successful, rollback on error, and close
 @contextmanager
@@ -58,6 +245,8 @@ def session_scope() -> Generator:
         logger.debug("db_session_close")
 
 # FastAPI dependency to get DB session per request
+# A Session checks out a connection on its first query, so requests rejected
+# before touching the database (401/429) never reach the pool
 def get_db() -> Generator:
     db = SessionLocal()
     logger.debug("db_session_open")
@@ -68,6 +257,11 @@ def get_db() -> Generator:
         logger.debug("db_session_close")
 
 
+# Pool counters and current occupancy for /stats
+def pool_stats() -> dict:
+    return engine.pool_metrics.snapshot(engine.pool)
+
+
 @event.listens_for(engine, "connect")
 def _on_connect(dbapi_connection, connection_record):
     logger.info("db_connect")
@@ -0,0 +1,70 @@
+# Streaming export of a user's prediction history as NDJSON or CSV.
+# The generators open their own session (the request-scoped one is closed
+# before a StreamingResponse body is sent) and emit text in chunks.
+import csv
+import io
+import json
+from typing import Callable, Iterator, List
+
+from .crud import iter_user_predictions
+from .db import SessionLocal
+from .schemas import PredictionInput
+
+# Rows per server-side fetch and per emitted chunk
+EXPORT_CHUNK_ROWS = 1000
+
+_fields = getattr(PredictionInput, "model_fields", None) or PredictionInput.__fields__
+PAYLOAD_COLUMNS: List[str] = list(_fields)
+CSV_COLUMNS: List[str] = ["id", "created_at", "predicted_value"] + PAYLOAD_COLUMNS
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def _ndjson_chunks(rows: Iterator[tuple]) -> Iterator[str]:
+    buf: List[str] = []
+    for row_id, created_at, value, payload in rows:
+        buf.append(
+            json.dumps(
+                {
+                    "id": row_id,
+                    "created_at": created_at.isoformat(),
+                    "predicted_value": value,
+                    "payload": payload,
+                },
+                separators=(",", ":"),
+            )
+        )
+        if len(buf) >= EXPORT_CHUNK_ROWS:
+            yield "\n".join(buf) + "\n"
+            buf.clear()
+    if buf:
+        yield "\n".join(buf) + "\n"
+
+
+def _csv_chunks(rows: Iterator[tuple]) -> Iterator[str]:
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(CSV_COLUMNS)
+    n = 0
+    for row_id, created_at, value, payload in rows:
+        writer.writerow(
+            [row_id, created_at.isoformat(), value] + [payload.get(c, "") for c in PAYLOAD_COLUMNS]
+        )
+        n += 1
+        if n % EXPORT_CHUNK_ROWS == 0:
+            yield out.getvalue()
+            out.seek(0)
+            out.truncate()
+    yield out.getvalue()
+
+
+_FORMATTERS: dict = {"ndjson": _ndjson_chunks, "csv": _csv_chunks}
+
+
+def stream_user_predictions(user_id: int, fmt: str) -> Iterator[str]:
+    formatter: Callable[[Iterator[tuple]], Iterator[str]] = _FORMATTERS[fmt]
+    db = SessionLocal()
+    try:
+        yield from formatter(iter_user_predictions(db, user_id, chunk_size=EXPORT_CHUNK_ROWS))
+    finally:
+        db.close()
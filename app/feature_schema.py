@@ -0,0 +1,65 @@
+# Feature schema artifact written next to the model by the training script.
+# It records everything the API needs to encode requests (column order and
+# category vocabulary) so workers don't have to re-read housing.csv.
+import hashlib
+import json
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+SCHEMA_VERSION = 1
+TARGET_COLUMN = "median_house_value"
+
+
+# sha256 of the training file, used to tie a schema to the data it came from
+def file_sha256(path: Path, chunk_size: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+# Build the schema from the cleaned (pre-dummies) frame and the encoded features
+def build_schema(raw: pd.DataFrame, features: pd.DataFrame, data_path: Path) -> dict:
+    categories: Dict[str, List[str]] = {
+        col: sorted(str(v) for v in raw[col].unique())
+        for col in raw.columns
+        if raw[col].dtype == object
+    }
+    return {
+        "schema_version": SCHEMA_VERSION,
+        "columns": list(features.columns),
+        "categories": categories,
+        "dtypes": {col: str(dtype) for col, dtype in features.dtypes.items()},
+        "target": TARGET_COLUMN,
+        "training_rows": int(len(raw)),
+        "training_hash": file_sha256(data_path),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def save_schema(schema: dict, path: Path) -> None:
+    tmp = Path(path).with_suffix(".tmp")
+    tmp.write_text(json.dumps(schema, indent=2, sort_keys=True))
+    tmp.replace(path)
+
+
+# Return the schema, or None when it is missing, unreadable or of another version
+def load_schema(path: Path) -> Optional[dict]:
+    try:
+        schema = json.loads(Path(path).read_text())
+    except (OSError, ValueError):
+        return None
+    if schema.get("schema_version") != SCHEMA_VERSION or not schema.get("columns"):
+        return None
+    return schema
+
+
+# Same cleaning/encoding the model was trained with
+def schema_from_csv(data_path: Path) -> dict:
+    raw = pd.read_csv(data_path).dropna()
+    features = pd.get_dummies(raw).drop([TARGET_COLUMN], axis=1)
+    return build_schema(raw, features, data_path)
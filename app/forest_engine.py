@@ -0,0 +1,144 @@
+# NumPy inference engine for fitted tree ensembles (RandomForestRegressor).
+#
+# The forest is flattened into contiguous node arrays shared by all trees;
+# child indexes are global and leaves point to themselves, so every row walks
+# every tree in lockstep for at most max_depth vectorized steps. This skips
+# sklearn's per-call input validation and joblib dispatch, which dominate
+# single-row latency. sklearn stays the reference (see tests/test_forest_engine.py).
+#
+# Per node visit the NumPy gathers cost more than sklearn's Cython loop, so
+# the gain is largest for small batches; large batches break even or lose.
+#
+# save()/load() keep the node arrays as plain .npy files next to the mmap
+# model export, so under MODEL_FORMAT=mmap every worker maps the same pages
+# instead of flattening the forest into private memory.
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+# Rows scored per vectorized pass; bounds the (rows x trees) index matrices
+CHUNK_ROWS = int(os.getenv("FOREST_ENGINE_CHUNK_ROWS", "512"))
+
+_ARRAYS = ("feature", "threshold", "children", "value", "roots")
+
+
+# Directory holding the flattened arrays of a model file (model.mmap.joblib -> model.mmap.flat)
+def flat_dir(model_path: Path) -> Path:
+    return Path(model_path).with_suffix(".flat")
+
+
+class FlatForest:
+    def __init__(
+        self,
+        feature: np.ndarray,
+        threshold: np.ndarray,
+        children: np.ndarray,
+        value: np.ndarray,
+        roots: np.ndarray,
+        max_depth: int,
+        n_features: int,
+    ) -> None:
+        # children[2 * node] is the left child, children[2 * node + 1] the right
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.value = value
+        self.roots = roots
+        self.max_depth = max_depth
+        self.n_features = n_features
+
+    @classmethod
+    def from_sklearn(cls, model) -> "FlatForest":
+        trees = [est.tree_ for est in model.estimators_]
+        if any(t.n_outputs != 1 for t in trees):
+            raise ValueError("FlatForest supports single-output regressors only")
+        sizes = np.array([t.node_count for t in trees], dtype=np.intp)
+        offsets = np.concatenate(([0], np.cumsum(sizes)[:-1])).astype(np.intp)
+        total = int(sizes.sum())
+
+        # np.intp indexes go straight into take() without a conversion pass
+        feature = np.empty(total, dtype=np.intp)
+        threshold = np.empty(total, dtype=np.float64)
+        children = np.empty((total, 2), dtype=np.intp)
+        value = np.empty(total, dtype=np.float64)
+        for t, off, n in zip(trees, offsets, sizes):
+            sl = slice(off, off + n)
+            own = np.arange(off, off + n, dtype=np.intp)
+            leaf = t.children_left == -1
+            feature[sl] = np.where(leaf, 0, t.feature)
+            # leaves loop onto themselves whatever the comparison says
+            threshold[sl] = np.where(leaf, np.inf, t.threshold)
+            children[sl, 0] = np.where(leaf, own, t.children_left + off)
+            children[sl, 1] = np.where(leaf, own, t.children_right + off)
+            value[sl] = t.value[:, 0, 0]
+        return cls(
+            feature=feature,
+            threshold=threshold,
+            children=children.ravel(),
+            value=value,
+            roots=offsets,
+            max_depth=max(t.max_depth for t in trees),
+            n_features=int(model.n_features_in_),
+        )
+
+    # `source` identifies the model file the arrays were built from (its
+    # sha256), so a loader can tell when they are stale. Written to a temp
+    # dir and swapped in, so readers never see a half-written set.
+    def save(self, directory: Path, source: str) -> None:
+        directory = Path(directory)
+        tmp = Path(tempfile.mkdtemp(dir=directory.parent, prefix=f".{directory.name}-"))
+        for name in _ARRAYS:
+            np.save(tmp / f"{name}.npy", getattr(self, name))
+        meta = {"max_depth": self.max_depth, "n_features": self.n_features, "source": source}
+        (tmp / "meta.json").write_text(json.dumps(meta))
+        if directory.exists():
+            shutil.rmtree(directory)
+        tmp.rename(directory)
+
+    # Arrays opened with mmap_mode="r" stay in the shared page cache; returns
+    # None when the directory is missing or was built from another model
+    @classmethod
+    def load(cls, directory: Path, source: str, mmap_mode: Optional[str] = "r") -> Optional["FlatForest"]:
+        directory = Path(directory)
+        try:
+            meta = json.loads((directory / "meta.json").read_text())
+            if meta.get("source") != source:
+                return None
+            arrays = {name: np.load(directory / f"{name}.npy", mmap_mode=mmap_mode) for name in _ARRAYS}
+        except (OSError, ValueError):
+            return None
+        return cls(max_depth=int(meta["max_depth"]), n_features=int(meta["n_features"]), **arrays)
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    def _predict_chunk(self, X: np.ndarray) -> np.ndarray:
+        n = X.shape[0]
+        nodes = np.broadcast_to(self.roots, (n, self.n_trees)).copy()
+        # flat offset of each row's first column, to gather X[row, feature] in one take
+        row_base = (np.arange(n, dtype=np.intp) * X.shape[1])[:, None]
+        flat_X = X.ravel()
+        for _ in range(self.max_depth):
+            x = flat_X.take(self.feature.take(nodes) + row_base)
+            go_right = x > self.threshold.take(nodes)
+            nodes <<= 1
+            nodes += go_right
+            nodes = self.children.take(nodes)
+        return self.value.take(nodes).mean(axis=1)
+
+    # Same semantics as RandomForestRegressor.predict: inputs compared as float32
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"expected a (n, {self.n_features}) array, got {X.shape}")
+        if X.shape[0] <= CHUNK_ROWS:
+            return self._predict_chunk(X)
+        return np.concatenate(
+            [self._predict_chunk(X[i : i + CHUNK_ROWS]) for i in range(0, X.shape[0], CHUNK_ROWS)]
+        )
@@ -0,0 +1,85 @@
+# Bounded executor for password hashing. pbkdf2/bcrypt are deliberately slow;
+# running them here keeps a login burst from occupying the threads that serve
+# /predict and other handlers. Once `max_pending` hashes are in flight new
+# requests are rejected (503) instead of queueing without bound.
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional, Tuple
+
+from fastapi import HTTPException, status
+
+logger = logging.getLogger("app.auth")
+
+
+def _timed_call(fn: Callable, args: Tuple) -> Tuple[float, Any]:
+    return time.perf_counter(), fn(*args)
+
+
+class HashingExecutor:
+    def __init__(self, workers: int = 2, max_pending: Optional[int] = None) -> None:
+        self.workers = max(1, int(workers))
+        self.max_pending = max(self.workers, int(max_pending or self.workers * 8))
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="hashing")
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+
+    async def run(self, fn: Callable, *args: Any) -> Any:
+        with self._lock:
+            if self.in_flight >= self.max_pending:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail={"code": "auth_busy", "message": "Too many concurrent logins, retry shortly"},
+                    headers={"Retry-After": "1"},
+                )
+            self.in_flight += 1
+        submitted = time.perf_counter()
+        try:
+            started, result = await asyncio.get_running_loop().run_in_executor(
+                self._pool, _timed_call, fn, args
+            )
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+        wait = started - submitted
+        with self._lock:
+            self.completed += 1
+            self.queue_wait_total += wait
+            self.queue_wait_max = max(self.queue_wait_max, wait)
+        return result
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "in_flight": self.in_flight,
+                "queue_depth": max(0, self.in_flight - self.workers),
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "queue_wait_mean_seconds": self.queue_wait_total / (self.completed or 1),
+                "queue_wait_max_seconds": self.queue_wait_max,
+            }
+
+
+# PASSWORD_HASH_WORKERS (default: half the CPUs) / PASSWORD_HASH_MAX_PENDING
+def build_hashing_executor() -> HashingExecutor:
+    workers = int(os.getenv("PASSWORD_HASH_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+    pending = os.getenv("PASSWORD_HASH_MAX_PENDING")
+    executor = HashingExecutor(workers, int(pending) if pending else None)
+    logger.info(
+        "hashing_executor_created",
+        extra={"workers": executor.workers, "max_pending": executor.max_pending},
+    )
+    return executor
@@ -0,0 +1,134 @@
+# Dedicated executor for CPU-bound inference, so forest evaluation doesn't
+# compete with DB-bound handlers on FastAPI's default threadpool.
+# "thread" shares the process' model; "process" gives each worker its own
+# ModelRuntime and sidesteps the GIL for pure-Python parts of scoring.
+import asyncio
+import contextvars
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger("app.inference")
+
+# Per-process runtime used by process-pool workers
+_worker_runtime = None
+
+
+def _init_worker(version: Optional[str] = None) -> None:
+    global _worker_runtime
+    from .model_runtime import ModelRuntime
+
+    _worker_runtime = ModelRuntime(version)
+
+
+# Score records inside a process-pool worker; returns (predictions, model version)
+def score_in_worker(payloads: Sequence[dict]) -> Tuple[List[float], str]:
+    rt = _worker_runtime
+    return rt.predict_batch(rt.prepare_batch(payloads)), rt.version
+
+
+# Runs in the pool; reports when the task actually started so the caller
+# can tell queue wait apart from run time
+def _timed_call(fn: Callable, args: Tuple) -> Tuple[float, Any]:
+    started = time.time()
+    return started, fn(*args)
+
+
+class InferenceExecutor:
+    def __init__(self, kind: str = "thread", workers: Optional[int] = None) -> None:
+        self.kind = kind
+        self.workers = max(1, int(workers or os.cpu_count() or 1))
+        # Model version the process workers serve (None until the first load)
+        self.model_version: Optional[str] = None
+        self._pool: Executor
+        if kind == "process":
+            self._pool = self._process_pool()
+        else:
+            self.kind = "thread"
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="inference")
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.completed = 0
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+        self.run_total = 0.0
+
+    # Await fn(*args) on the pool; fn must be picklable in process mode
+    async def run(self, fn: Callable, *args: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        submitted = time.time()
+        with self._lock:
+            self.in_flight += 1
+        try:
+            if self.kind == "thread":
+                # carry request context (stage timers) into the worker thread
+                ctx = contextvars.copy_context()
+                call = loop.run_in_executor(self._pool, ctx.run, _timed_call, fn, args)
+            else:
+                call = loop.run_in_executor(self._pool, _timed_call, fn, args)
+            started, result = await call
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+        finished = time.time()
+        wait = max(0.0, started - submitted)
+        with self._lock:
+            self.completed += 1
+            self.queue_wait_total += wait
+            self.queue_wait_max = max(self.queue_wait_max, wait)
+            self.run_total += finished - started
+        return result
+
+    def _process_pool(self, version: Optional[str] = None) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(version,),
+        )
+
+    # Process workers hold their own model: after a reload, start a pool on
+    # the new version and let the old one finish what it already accepted
+    # The first load only records the version: the initial workers loaded the
+    # same default model on their own
+    def recycle(self, version: str) -> None:
+        if self.kind != "process":
+            return
+        if self.model_version is None or self.model_version == version:
+            self.model_version = version
+            return
+        self.model_version = version
+        old, self._pool = self._pool, self._process_pool(version)
+        old.shutdown(wait=False)
+        logger.info("inference_pool_recycled", extra={"model_version": version})
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=True, cancel_futures=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            done = self.completed or 1
+            return {
+                "kind": self.kind,
+                "workers": self.workers,
+                "in_flight": self.in_flight,
+                # tasks beyond the worker count are waiting for a free worker
+                "queue_depth": max(0, self.in_flight - self.workers),
+                "completed": self.completed,
+                "queue_wait_mean_seconds": self.queue_wait_total / done,
+                "queue_wait_max_seconds": self.queue_wait_max,
+                "run_mean_seconds": self.run_total / done,
+            }
+
+
+# INFERENCE_EXECUTOR=thread|process, INFERENCE_WORKERS=<n> (default: CPU count)
+def build_inference_executor() -> InferenceExecutor:
+    kind = os.getenv("INFERENCE_EXECUTOR", "thread").lower()
+    workers = os.getenv("INFERENCE_WORKERS")
+    executor = InferenceExecutor(kind, int(workers) if workers else None)
+    logger.info("inference_executor_created", extra={"kind": executor.kind, "workers": executor.workers})
+    return executor
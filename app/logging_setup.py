@@ -0,0 +1,137 @@
+# Logging pipeline for the API process.
+#
+# Request threads only create the LogRecord and put it on a queue; a
+# QueueListener thread formats (JSON or text) and writes it. High-volume debug
+# events can be sampled per logger. Configured from LOG_* env vars:
+#   LOG_LEVEL   level of the app.* loggers (default WARNING)
+#   LOG_FORMAT  json (default) | text
+#   LOG_ASYNC   on (default) | off - format and write on the calling thread
+#   LOG_SAMPLE  per-logger keep rate for DEBUG records, e.g. "app.db=0.01,app.api=0.1"
+#   LOG_CONFIGURE  off leaves logging to the host (e.g. a uvicorn --log-config)
+# The API calls configure_from_env() from its startup hook, so importing app.main
+# (tests, scripts) does not install handlers or start the listener thread.
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from typing import Dict, Optional, TextIO
+
+# Attributes every LogRecord has; anything else came in through `extra=`
+_RESERVED = frozenset(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+_handler: Optional[logging.Handler] = None
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        out = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "event": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and not key.startswith("_"):
+                out[key] = value
+        if record.exc_info:
+            out["exc"] = self.formatException(record.exc_info)
+        return json.dumps(out, default=str, separators=(",", ":"))
+
+
+# Keeps a `rate` fraction of DEBUG-and-below records per logger prefix;
+# records above DEBUG always pass
+class SamplingFilter(logging.Filter):
+    def __init__(self, rates: Dict[str, float]) -> None:
+        super().__init__()
+        # longest prefix wins
+        self.rates = sorted(rates.items(), key=lambda kv: -len(kv[0]))
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG:
+            return True
+        for prefix, rate in self.rates:
+            if record.name == prefix or record.name.startswith(prefix + "."):
+                return rate >= 1.0 or random.random() < rate
+        return True
+
+
+def parse_sample_rates(spec: str) -> Dict[str, float]:
+    rates = {}
+    for part in spec.split(","):
+        if "=" in part:
+            name, rate = part.split("=", 1)
+            rates[name.strip()] = float(rate)
+    return rates
+
+
+# QueueHandler.prepare() formats the message on the caller's thread; the
+# listener here runs in-process, so the record can be handed over as is and
+# formatted by the listener's handler instead
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def configure_logging(
+    level: Optional[str] = None,
+    fmt: Optional[str] = None,
+    async_: Optional[bool] = None,
+    sample: Optional[str] = None,
+    stream: Optional[TextIO] = None,
+) -> None:
+    global _handler, _listener
+    level = (level or os.getenv("LOG_LEVEL", "WARNING")).upper()
+    fmt = (fmt or os.getenv("LOG_FORMAT", "json")).lower()
+    if async_ is None:
+        async_ = os.getenv("LOG_ASYNC", "on").lower() not in ("0", "off", "false")
+    sample = os.getenv("LOG_SAMPLE", "") if sample is None else sample
+
+    shutdown_logging()
+    sink = logging.StreamHandler(stream or sys.stdout)
+    sink.setFormatter(
+        JSONFormatter() if fmt == "json" else logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s")
+    )
+    if async_:
+        q: queue.SimpleQueue = queue.SimpleQueue()
+        _handler = _DeferredQueueHandler(q)
+        _listener = logging.handlers.QueueListener(q, sink, respect_handler_level=True)
+        _listener.start()
+    else:
+        _handler = sink
+    rates = parse_sample_rates(sample)
+    if rates:
+        _handler.addFilter(SamplingFilter(rates))
+
+    app_logger = logging.getLogger("app")
+    app_logger.setLevel(level)
+    app_logger.addHandler(_handler)
+    # records already have a sink; passing them on to root (e.g. uvicorn's
+    # handlers) would write every line twice and synchronously
+    app_logger.propagate = False
+
+
+# Flush and detach the handler installed by configure_logging
+def shutdown_logging() -> None:
+    global _handler, _listener
+    if _handler is not None:
+        app_logger = logging.getLogger("app")
+        app_logger.removeHandler(_handler)
+        app_logger.propagate = True
+        _handler = None
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(shutdown_logging)
+
+
+def configure_from_env() -> None:
+    if os.getenv("LOG_CONFIGURE", "on").lower() not in ("0", "off", "false"):
+        configure_logging()
@@ -2,32 +2,76 @@
 # Implements user authentication, rate limiting, and prediction endpoints.
 #
 #
+import hashlib
+import hmac
 import os
 import logging
+import time
 import uuid
-from typing import Any, List
-from fastapi import Depends, FastAPI, HTTPException, Request, status
-from fastapi.responses import JSONResponse
+from typing import Any, List, Optional, Tuple
+from fastapi import Depends, FastAPI, Header, HTTPException, Request, Response, status
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.exceptions import RequestValidationError
+from starlette.concurrency import run_in_threadpool
 
 from fastapi.openapi.utils import get_openapi
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from pathlib import Path
 
-from .auth import require_token, issue_jwt
-from .model_runtime import runtime
-from .rate_limit import FixedWindowLimiter, limiter_dependency_factory
+from .analytics import ROLLUP_MODE, RollupRefresher, user_stats
+from .comparables import COMPARABLES_MAX_K, ComparablesStore
+from .logging_setup import configure_from_env
+from .auth import get_settings, issue_jwt, reload_settings, require_token, token_cache_stats
+from .export import MEDIA_TYPES, stream_user_predictions
+from .hashing import build_hashing_executor
+from .pagination import parse_prediction_cursor, parse_user_cursor, prediction_cursor, user_cursor
+from .inference_pool import build_inference_executor, score_in_worker
+from .metrics import (
+    SERVER_TIMING,
+    begin_request,
+    detach_request,
+    build_slow_request_profiler,
+    observe_request,
+    observe_stage,
+    render_prometheus,
+    server_timing,
+)
+from .micro_batcher import build_micro_batcher
+from .model_registry import MODEL_WATCH_INTERVAL, ModelWatcher, registry
+from .model_runtime import model_loader
+from .prediction_cache import build_prediction_cache
+from .price_grid import GridStore
+from .rate_limit import build_limiter, limiter_dependency_factory
+from .shadow import build_shadow_evaluator
 from .schemas import (
     PredictionInput,
     PredictionOutput,
+    ComparablesOutput,
+    PredictionBatchInput,
+    PredictionBatchOutput,
     TokenResponse,
     UserCreate,
     UserOut,
     PredictionRecord,
+    PredictionStats,
+    ModelReloadRequest,
+    ModelVersions,
+)
+from .db import SessionLocal, get_db, init_db, ping_db, pool_stats
+from .write_behind import build_prediction_writer
+from .crud import (
+    create_user,
+    get_user_by_email,
+    hash_password,
+    verify_and_update_password,
+    update_password_hash,
+    list_users,
+    create_prediction,
+    create_predictions,
+    list_user_predictions,
+    MAX_PAGE_SIZE,
 )
-from .db import get_db, init_db
-from .crud import create_user, get_user_by_email, verify_password, list_users, create_prediction, list_user_predictions
 from sqlalchemy.orm import Session
 
 # Rate limiting configuration
@@ -35,8 +79,65 @@ from sqlalchemy.orm import Session
 RATE_LIMIT_MAX = int(os.getenv("RATE_LIMIT_MAX", "10"))
 RATE_LIMIT_WINDOW = int(os.getenv("RATE_LIMIT_WINDOW", "60"))
 
-# Initialize rate limiter
-_limiter = FixedWindowLimiter(RATE_LIMIT_MAX, RATE_LIMIT_WINDOW)
+# How the model is loaded: "background" (thread started at startup),
+# "eager" (block startup until loaded) or "lazy" (first prediction loads it)
+MODEL_LOAD_MODE = os.getenv("MODEL_LOAD_MODE", "background").lower()
+
+# Optional result cache in front of the model (PREDICTION_CACHE=off|memory|sqlite);
+# a newly loaded model drops entries scored by the previous one
+prediction_cache = build_prediction_cache()
+model_loader.add_listener(lambda rt: prediction_cache.invalidate(rt.version))
+
+# Admin endpoints (/admin/*) require this value in X-Admin-Token;
+# they are disabled when it is unset
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+# Follow promotions in the model registry (models/CURRENT) without a restart
+model_watcher = (
+    ModelWatcher(
+        registry,
+        lambda: model_loader.version,
+        model_loader.reload_in_background,
+        failed_version=lambda: model_loader.failed_version,
+    )
+    if MODEL_WATCH_INTERVAL > 0
+    else None
+)
+
+# Write-behind persistence of /predict results (None = synchronous commit)
+prediction_writer = build_prediction_writer(SessionLocal)
+
+# ROLLUP_MODE=schedule folds new predictions into rollups periodically
+# instead of in the insert transaction
+rollup_refresher = RollupRefresher(SessionLocal) if ROLLUP_MODE == "schedule" else None
+
+# Dedicated pool for CPU-bound scoring (INFERENCE_EXECUTOR / INFERENCE_WORKERS)
+inference_executor = build_inference_executor()
+model_loader.add_listener(lambda rt: inference_executor.recycle(rt.version))
+
+# Shadow-score a sample of in-process model calls with a candidate version
+# (SHADOW_MODEL_VERSION); process workers score outside this process and are not sampled
+shadow_evaluator = build_shadow_evaluator(SessionLocal) if inference_executor.kind == "thread" else None
+
+# Bounded pool for pbkdf2/bcrypt work in /users and /login
+hashing_executor = build_hashing_executor()
+
+# Nearest real districts from housing.csv (/comparables, /predict?comparables=K)
+comparables_store = ComparablesStore()
+
+# Precomputed price grid served by /grid (python -m app.price_grid build)
+grid_store = GridStore()
+GRID_MAX_CELLS = int(os.getenv("GRID_MAX_CELLS", "250000"))
+GRID_CACHE_SECONDS = int(os.getenv("GRID_CACHE_SECONDS", "3600"))
+
+# Upper bound on records accepted by /predict/batch in one call
+PREDICT_BATCH_MAX = int(os.getenv("PREDICT_BATCH_MAX", "50000"))
+
+# Opt-in sampling profiler for slow requests (PROFILE_SLOW_MS)
+slow_request_profiler = build_slow_request_profiler()
+
+# Initialize rate limiter (RATE_LIMIT_ALGORITHM / RATE_LIMIT_BACKEND pick the implementation)
+_limiter = build_limiter(RATE_LIMIT_MAX, RATE_LIMIT_WINDOW)
 limit_for = limiter_dependency_factory(_limiter)
 
 # Just some metadata for OpenAPI docs
@@ -44,6 +145,7 @@ tags_metadata = [
     {"name": "Auth", "description": "User registration and login"},
     {"name": "Predictions", "description": "Endpoints for price predictions"},
     {"name": "Health", "description": "Service health checks"},
+    {"name": "Admin", "description": "Model registry operations (X-Admin-Token)"},
 ]
 
 app = FastAPI(title="Housing Price Predictor", version="1.0.0", openapi_tags=tags_metadata)
@@ -55,13 +157,27 @@ app.add_middleware(
     allow_credentials=False,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID", "X-Next-Cursor"],
 )
 
 
 # Custom OpenAPI schema generation to include security schemes
 @app.on_event("startup")
 def on_startup() -> None:
+    configure_from_env()
     init_db()
+    if MODEL_LOAD_MODE == "eager":
+        model_loader.load()
+        comparables_store.get()
+    elif MODEL_LOAD_MODE != "lazy":
+        model_loader.start_background()
+        comparables_store.start_background()
+    if prediction_writer is not None:
+        prediction_writer.start()
+    if rollup_refresher is not None:
+        rollup_refresher.start()
+    if model_watcher is not None and registry.root.is_dir():
+        model_watcher.start()
     # Mount React app build if present
     react_dist = Path(__file__).resolve().parents[1] / "frontend" / "dist"
     if react_dist.exists():
@@ -72,6 +188,21 @@ def on_startup() -> None:
             log_app.exception("react_mount_failed")
 
 
+# Flush queued predictions before the worker exits
+@app.on_event("shutdown")
+def on_shutdown() -> None:
+    if prediction_writer is not None:
+        prediction_writer.stop()
+    if rollup_refresher is not None:
+        rollup_refresher.stop()
+    if model_watcher is not None:
+        model_watcher.stop()
+    if shadow_evaluator is not None:
+        shadow_evaluator.stop()
+    inference_executor.shutdown()
+    hashing_executor.shutdown()
+
+
 # Health "Debug" check endpoint
 
 @app.get("/health", tags=["Health"], openapi_extra={"security": []})
@@ -79,27 +210,135 @@ def health() -> dict:
     return {"status": "ok"}
 
 
+# Readiness check: 200 only once the model is loaded and the DB answers
+@app.get("/ready", tags=["Health"], openapi_extra={"security": []})
+def ready():
+    model = model_loader.status()
+    db_ok = ping_db()
+    is_ready = model["loaded"] and db_ok
+    return JSONResponse(
+        status_code=200 if is_ready else 503,
+        content={
+            "status": "ready" if is_ready else "not_ready",
+            "model": model,
+            "db": {"ok": db_ok},
+        },
+    )
+
+
+# Runtime counters for tuning: inference pool, result cache, write-behind queue
+# ( Needs bearer token )
+@app.get("/stats", tags=["Health"])
+def stats(_: str = Depends(require_token)) -> dict:
+    return {
+        "inference": inference_executor.stats(),
+        "prediction_cache": prediction_cache.stats(),
+        "prediction_writer": prediction_writer.stats() if prediction_writer is not None else None,
+        "micro_batcher": micro_batcher.stats() if micro_batcher is not None else None,
+        "auth": token_cache_stats(),
+        "hashing": hashing_executor.stats(),
+        "db_pool": pool_stats(),
+        "shadow": shadow_evaluator.stats() if shadow_evaluator is not None else None,
+        "slow_request_profiler": slow_request_profiler.stats() if slow_request_profiler is not None else None,
+    }
+
+
+# Prometheus text exposition: request latency per route and per-stage histograms
+@app.get("/metrics", tags=["Health"], openapi_extra={"security": []}, response_class=PlainTextResponse)
+def metrics() -> PlainTextResponse:
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+# Admin guard: X-Admin-Token must match ADMIN_TOKEN; 404 when admin is disabled
+def _require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    if not ADMIN_TOKEN:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail={"code": "not_found", "message": "Not Found"},
+        )
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail={"code": "forbidden", "message": "Invalid admin token"},
+        )
+
+
+# Registered model versions and the one this worker is serving
+@app.get("/admin/models", response_model=ModelVersions, tags=["Admin"], openapi_extra={"security": []})
+def admin_models(_: None = Depends(_require_admin)) -> ModelVersions:
+    return ModelVersions(
+        versions=registry.versions(),
+        current=registry.current(),
+        loaded=model_loader.version,
+        status=model_loader.status(),
+    )
+
+
+# Promote a version (optional) and hot-swap it in the background; other
+# workers follow through their registry watcher
+@app.post(
+    "/admin/models/reload",
+    status_code=status.HTTP_202_ACCEPTED,
+    tags=["Admin"],
+    openapi_extra={"security": []},
+)
+def admin_reload_model(payload: ModelReloadRequest, _: None = Depends(_require_admin)) -> dict:
+    if payload.version is not None:
+        try:
+            registry.set_current(payload.version)
+        except KeyError:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail={"code": "unknown_model_version", "message": f"No model version {payload.version!r}"},
+            )
+    started = model_loader.reload_in_background(payload.version)
+    return {"version": payload.version or registry.current(), "started": started}
+
+
+# Re-read JWT_* settings after a secret rotation and drop cached tokens;
+# each worker keeps its own settings, so call it once per worker
+@app.post("/admin/auth/reload", tags=["Admin"], openapi_extra={"security": []})
+def admin_reload_auth(_: None = Depends(_require_admin)) -> dict:
+    settings = reload_settings()
+    return {"secrets": len(settings.secrets), "ttl_seconds": settings.ttl_seconds}
+
+
 # Root path intentionally left to API routes/docs only
 
 
 # Request logging middleware with request ID
+# Also records latency per route and adds a Server-Timing header with stage durations
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
     req_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex[:12]
     request.state.request_id = req_id
-    log_app.info(
-        "request_start",
-        extra={"id": req_id, "method": request.method, "path": request.url.path},
-    )
-    try:
-        response = await call_next(request)
+    if log_app.isEnabledFor(logging.INFO):
         log_app.info(
-            "request_end",
-            extra={"id": req_id, "status": response.status_code},
+            "request_start",
+            extra={"id": req_id, "method": request.method, "path": request.url.path},
         )
+    stages = begin_request()
+    profile = slow_request_profiler.start() if slow_request_profiler is not None else None
+    t0 = time.perf_counter()
+    try:
+        response = await call_next(request)
+        elapsed = time.perf_counter() - t0
+        route = request.scope.get("route")
+        observe_request(request.method, getattr(route, "path", "unmatched"), response.status_code, elapsed)
+        if profile is not None:
+            slow_request_profiler.finish(profile, elapsed, f"{request.method} {request.url.path} id={req_id}")
+        if log_app.isEnabledFor(logging.INFO):
+            log_app.info(
+                "request_end",
+                extra={"id": req_id, "status": response.status_code},
+            )
         response.headers["X-Request-ID"] = req_id
+        if SERVER_TIMING:
+            response.headers["Server-Timing"] = server_timing(stages, elapsed)
         return response
     except Exception:
+        if profile is not None:
+            slow_request_profiler.finish(profile, time.perf_counter() - t0, f"{request.method} {request.url.path} id={req_id}")
         log_app.exception("request_exception", extra={"id": req_id})
         return JSONResponse(
             status_code=500,
@@ -112,10 +351,11 @@ async def log_requests(request: Request, call_next):
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
     req_id = getattr(request.state, "request_id", None) or uuid.uuid4().hex[:12]
-    log_app.info(
-        "validation_error",
-        extra={"id": req_id, "errors": exc.errors(), "path": request.url.path},
-    )
+    if log_app.isEnabledFor(logging.INFO):
+        log_app.info(
+            "validation_error",
+            extra={"id": req_id, "errors": exc.errors(), "path": request.url.path},
+        )
     return JSONResponse(
         status_code=422,
         content={"code": "validation_error", "message": "Invalid request", "errors": exc.errors()},
@@ -126,10 +366,11 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
     req_id = getattr(request.state, "request_id", None) or uuid.uuid4().hex[:12]
-    log_app.info(
-        "http_error",
-        extra={"id": req_id, "status": exc.status_code, "detail": exc.detail},
-    )
+    if log_app.isEnabledFor(logging.INFO):
+        log_app.info(
+            "http_error",
+            extra={"id": req_id, "status": exc.status_code, "detail": exc.detail},
+        )
     # Ensure detail is dict with code/message for consistency
     if isinstance(exc.detail, dict):
         content: Any = exc.detail
@@ -144,98 +385,292 @@ async def http_exception_handler(request: Request, exc: HTTPException):
 
 # Create user (signup)
 @app.post("/users", response_model=UserOut, status_code=201, tags=["Auth"], openapi_extra={"security": []})
-def create_user_endpoint(payload: UserCreate, db: Session = Depends(get_db)) -> UserOut:
-    existing = get_user_by_email(db, payload.email)
+async def create_user_endpoint(payload: UserCreate, db: Session = Depends(get_db)) -> UserOut:
+    existing = await run_in_threadpool(get_user_by_email, db, payload.email)
     if existing:
         log_app.info("signup_conflict", extra={"email": payload.email})
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail={"code": "user_exists", "message": "Email already registered"},
         )
-    user = create_user(db, payload.email, payload.password)
+    password_hash = await hashing_executor.run(hash_password, payload.password)
+    user = await run_in_threadpool(create_user, db, payload.email, password_hash=password_hash)
     log_app.info("signup_success", extra={"user_id": user.id, "email": user.email})
     return UserOut(id=user.id, email=user.email)
 
 
 # Login user -> issue JWT
 @app.post("/login", response_model=TokenResponse, tags=["Auth"], openapi_extra={"security": []})
-def login(payload: UserCreate, db: Session = Depends(get_db)) -> TokenResponse:
-    user = get_user_by_email(db, payload.email)
-    if not user or not verify_password(payload.password, user.password_hash):
+async def login(payload: UserCreate, db: Session = Depends(get_db)) -> TokenResponse:
+    user = await run_in_threadpool(get_user_by_email, db, payload.email)
+    ok, new_hash = False, None
+    if user:
+        ok, new_hash = await hashing_executor.run(
+            verify_and_update_password, payload.password, user.password_hash
+        )
+    if not ok:
         log_app.info("login_failed", extra={"email": payload.email})
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail={"code": "invalid_credentials", "message": "Invalid email or password"},
         )
-    ttl = int(os.getenv("JWT_TTL_SECONDS", "900"))
+    if new_hash:
+        # Stored hash used a deprecated scheme or too few rounds
+        await run_in_threadpool(update_password_hash, db, user, new_hash)
+    ttl = get_settings().ttl_seconds
     token = issue_jwt(subject=str(user.id))
     log_app.info("login_success", extra={"user_id": user.id})
     return TokenResponse(access_token=token, expires_in=ttl)
 
 
+# Keyset pagination helpers
+# Parse an `after=` cursor or answer 400
+def _parse_cursor(parse, after: Optional[str]):
+    try:
+        return parse(after)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"code": "invalid_cursor", "message": "Invalid pagination cursor"},
+        )
+
+
+# A full page may have more behind it: hand out the cursor for the next one
+def _set_next_cursor(response: Response, rows: list, limit: int, make_cursor) -> None:
+    page_size = max(1, min(int(limit), MAX_PAGE_SIZE)) if limit else None
+    if rows and page_size and len(rows) >= page_size:
+        response.headers["X-Next-Cursor"] = make_cursor(rows[-1])
+
+
 # List users (requires auth)
+# Pass the X-Next-Cursor response header back as `after=` for the next page
 @app.get("/users", response_model=List[UserOut], tags=["Auth"])
 def list_users_endpoint(
     request: Request,
+    response: Response,
     offset: int = 0,
     limit: int = 100,
+    after: Optional[str] = None,
     db: Session = Depends(get_db),
     _: str = Depends(require_token),
 ) -> List[UserOut]:
-    users = list_users(db, offset=offset, limit=limit)
-    log_app.info(
-        "users_list",
-        extra={
-            "actor": getattr(request.state, "user_id", None),
-            "offset": offset,
-            "limit": limit,
-            "count": len(users),
-        },
-    )
+    after_id = _parse_cursor(parse_user_cursor, after)
+    users = list_users(db, offset=offset, limit=limit, after_id=after_id)
+    _set_next_cursor(response, users, limit, lambda u: user_cursor(u.id))
+    if log_app.isEnabledFor(logging.INFO):
+        log_app.info(
+            "users_list",
+            extra={
+                "actor": getattr(request.state, "user_id", None),
+                "offset": offset,
+                "limit": limit,
+                "count": len(users),
+            },
+        )
     return [UserOut(id=u.id, email=u.email) for u in users]
 
 # Rate-limited dependency
 # Applies rate limiting based on bearer token
 def _rate_limit(token: str = Depends(require_token)):
     # Use the bearer token as the rate-limit key
-    limit_for(token)
+    t0 = time.perf_counter()
+    try:
+        limit_for(token)
+    finally:
+        observe_stage("rate_limit", time.perf_counter() - t0)
+
+
+# Scoring helpers; they run on the inference executor, never on the event loop
+# Feature prep and model call are timed separately (Server-Timing stages)
+def _timed_predict(runtime, bodies: List[dict], batch: bool):
+    t0 = time.perf_counter()
+    X = runtime.prepare_batch(bodies) if batch else runtime.prepare_features(bodies[0])
+    t1 = time.perf_counter()
+    y = runtime.predict_batch(X) if batch else runtime.predict(X)
+    t2 = time.perf_counter()
+    observe_stage("features", t1 - t0)
+    observe_stage("inference", t2 - t1)
+    if shadow_evaluator is not None:
+        shadow_evaluator.maybe_submit(bodies, y, runtime.version, t2 - t0, batch)
+    return y
+
+
+# Each returns the prediction(s) together with the version of the model that
+# produced them; a reload can swap the runtime between two requests
+def _score_one(body: dict) -> Tuple[float, str]:
+    runtime = model_loader.get()
+    y = prediction_cache.get_or_compute(
+        body, runtime.version, lambda: _timed_predict(runtime, [body], batch=False)
+    )
+    return y, runtime.version
+
+
+def _score_many(bodies: List[dict], cached: bool = False) -> Tuple[List[float], str]:
+    runtime = model_loader.get()
+    if cached:
+        ys = prediction_cache.get_many_or_compute(
+            bodies, runtime.version, lambda ps: _timed_predict(runtime, ps, batch=True)
+        )
+    else:
+        ys = _timed_predict(runtime, bodies, batch=True)
+    return ys, runtime.version
+
+
+# Process workers hold their own model, so they score without the parent's cache;
+# their features + inference time is reported as one "inference" stage
+async def _score_in_process(bodies: List[dict]) -> Tuple[List[float], str]:
+    t0 = time.perf_counter()
+    try:
+        return await inference_executor.run(score_in_worker, bodies)
+    finally:
+        observe_stage("inference", time.perf_counter() - t0)
+
+
+async def _score_batch(bodies: List[dict], cached: bool = False) -> Tuple[List[float], str]:
+    if inference_executor.kind == "process":
+        return await _score_in_process(bodies)
+    return await inference_executor.run(_score_many, bodies, cached)
+
+
+# Coalesce concurrent /predict calls into one model call (MICRO_BATCH=on)
+# The batch runs in its own task; its stage timings go to the histograms only
+async def _score_micro_batch(bodies: List[dict]) -> List[Tuple[float, str]]:
+    detach_request()
+    ys, version = await _score_batch(bodies, cached=True)
+    return [(y, version) for y in ys]
+
+
+micro_batcher = build_micro_batcher(_score_micro_batch)
+
+
+async def _score_single(body: dict) -> Tuple[float, str]:
+    if micro_batcher is not None:
+        return await micro_batcher.submit(body)
+    if inference_executor.kind == "process":
+        ys, version = await _score_in_process([body])
+        return ys[0], version
+    return await inference_executor.run(_score_one, body)
+
+
+def _check_comparables_k(k: int, allow_zero: bool = False) -> None:
+    if not (0 if allow_zero else 1) <= k <= COMPARABLES_MAX_K:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"code": "invalid_query", "message": f"comparables/k must be 1..{COMPARABLES_MAX_K}"},
+        )
+
+
+# The k districts of housing.csv most similar to the input (location first,
+# then the other features); a KD-tree lookup, no model call
+@app.post("/comparables", response_model=ComparablesOutput, tags=["Predictions"])
+def comparables_endpoint(payload: PredictionInput, k: int = 5, _: str = Depends(require_token)):
+    _check_comparables_k(k)
+    return {"comparables": comparables_store.get().query(payload.dict(), k)}
 
 
 # Prediction endpoint
 # Accepts input data and returns model predictions ( Needs bearer token )
 @app.post("/predict", response_model=PredictionOutput, tags=["Predictions"])
-def predict(
+async def predict(
     request: Request,
     payload: PredictionInput,
+    comparables: int = 0,
     db: Session = Depends(get_db),
     _: None = Depends(_rate_limit),
 ):
+    _check_comparables_k(comparables, allow_zero=True)
     try:
         body = payload.dict()
-        X = runtime.prepare_features(body)
-        y = runtime.predict(X)
+        y, version = await _score_single(body)
         # Persist prediction for this user
         try:
             user_id = int(getattr(request.state, "user_id", "0"))
         except Exception:
             user_id = 0
         if user_id:
-            create_prediction(db, user_id=user_id, payload=body, predicted_value=y)
-        return {"prediction": y}
+            t0 = time.perf_counter()
+            # Write-behind queues without blocking; when it is off or its queue
+            # is full the row is written here, off the event loop
+            if prediction_writer is None or not prediction_writer.try_submit(
+                user_id, payload=body, predicted_value=y, model_version=version
+            ):
+                await run_in_threadpool(
+                    create_prediction, db, user_id=user_id, payload=body, predicted_value=y, model_version=version
+                )
+            observe_stage("db_insert", time.perf_counter() - t0)
     except Exception:
         log_app.exception("predict_failed")
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail={"code": "prediction_error", "message": "Failed to compute prediction"},
         )
+    out = {"prediction": y, "model_version": version}
+    if comparables:
+        # the prediction is already stored; a comparables failure must not hide it
+        try:
+            out["comparables"] = await run_in_threadpool(comparables_store.get().query, body, comparables)
+        except Exception:
+            log_app.exception("comparables_failed")
+            out["comparables_error"] = "comparables_unavailable"
+    return out
+
+
+# Batch prediction endpoint
+# Scores all records with one model call and stores them with one bulk insert
+# Counts as a single hit against the rate limit ( Needs bearer token )
+@app.post("/predict/batch", response_model=PredictionBatchOutput, tags=["Predictions"])
+async def predict_batch(
+    request: Request,
+    payload: PredictionBatchInput,
+    db: Session = Depends(get_db),
+    _: None = Depends(_rate_limit),
+):
+    if len(payload.records) > PREDICT_BATCH_MAX:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail={
+                "code": "batch_too_large",
+                "message": f"At most {PREDICT_BATCH_MAX} records per batch",
+            },
+        )
+    try:
+        bodies = [r.dict() for r in payload.records]
+        ys, version = await _score_batch(bodies) if bodies else ([], model_loader.version)
+        try:
+            user_id = int(getattr(request.state, "user_id", "0"))
+        except Exception:
+            user_id = 0
+        if user_id:
+            t0 = time.perf_counter()
+            await run_in_threadpool(
+                create_predictions,
+                db,
+                user_id=user_id,
+                payloads=bodies,
+                predicted_values=ys,
+                model_version=version,
+            )
+            observe_stage("db_insert", time.perf_counter() - t0)
+        if log_app.isEnabledFor(logging.INFO):
+            log_app.info("predict_batch", extra={"user_id": user_id, "count": len(ys)})
+        return {"predictions": ys, "model_version": version}
+    except Exception:
+        log_app.exception("predict_batch_failed")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"code": "prediction_error", "message": "Failed to compute predictions"},
+        )
 
 
 # List current user's predictions
+# Pass the X-Next-Cursor response header back as `after=` for the next page
 @app.get("/predictions", response_model=List[PredictionRecord], tags=["Predictions"])
 def list_predictions(
     request: Request,
+    response: Response,
     offset: int = 0,
     limit: int = 50,
+    after: Optional[str] = None,
     db: Session = Depends(get_db),
     _: str = Depends(require_token),
 ):
@@ -245,13 +680,137 @@ def list_predictions(
         user_id = 0
     if not user_id:
         raise HTTPException(status_code=401, detail={"code": "unauthorized", "message": "Missing user"})
-    rows = list_user_predictions(db, user_id=user_id, offset=offset, limit=limit)
+    keyset = _parse_cursor(parse_prediction_cursor, after)
+    rows = list_user_predictions(db, user_id=user_id, offset=offset, limit=limit, after=keyset)
+    _set_next_cursor(response, rows, limit, lambda r: prediction_cursor(r.created_at, r.id))
     return [
         PredictionRecord(
             id=r.id,
             predicted_value=r.predicted_value,
             payload=r.payload,
             created_at=r.created_at.isoformat(),
+            model_version=r.model_version,
         )
         for r in rows
     ]
+
+
+STATS_GROUPINGS = ("day", "ocean_proximity", "day_ocean")
+
+
+# Aggregated stats over the current user's predictions for the last `days` UTC days
+# source=rollup reads the maintained rollup table; source=raw aggregates the
+# predictions table directly (both in SQL)
+@app.get("/predictions/stats", response_model=PredictionStats, tags=["Predictions"])
+def prediction_stats(
+    request: Request,
+    group_by: str = "day",
+    days: int = 30,
+    source: str = "rollup",
+    db: Session = Depends(get_db),
+    _: str = Depends(require_token),
+):
+    try:
+        user_id = int(getattr(request.state, "user_id", "0"))
+    except Exception:
+        user_id = 0
+    if not user_id:
+        raise HTTPException(status_code=401, detail={"code": "unauthorized", "message": "Missing user"})
+    if group_by not in STATS_GROUPINGS or source not in ("rollup", "raw") or not 1 <= days <= 366:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={
+                "code": "invalid_query",
+                "message": "group_by must be day|ocean_proximity|day_ocean, source rollup|raw, days 1..366",
+            },
+        )
+    buckets = user_stats(db, user_id, group_by=group_by, days=days, source=source)
+    return PredictionStats(group_by=group_by, source=source, buckets=buckets)
+
+
+# If-None-Match is a comma-separated list of (possibly weak) tags or "*";
+# it uses the weak comparison, so W/"x" matches "x"
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+# Slice of the precomputed price grid for one ocean_proximity category
+# No model call; the ETag changes with the grid's model version and build
+# parameters, so clients revalidate with If-None-Match and get 304s.
+# A grid built by another model than the one being served is still returned,
+# flagged with "stale": true and X-Grid-Stale until it is rebuilt.
+@app.get("/grid", tags=["Predictions"])
+def price_grid(
+    request: Request,
+    ocean_proximity: str,
+    lon_min: Optional[float] = None,
+    lat_min: Optional[float] = None,
+    lon_max: Optional[float] = None,
+    lat_max: Optional[float] = None,
+    stride: int = 1,
+    _: str = Depends(require_token),
+):
+    grid = grid_store.get()
+    if grid is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail={"code": "grid_not_built", "message": "Run `python -m app.price_grid build` first"},
+        )
+    if ocean_proximity not in grid.categories or not 1 <= stride <= 100:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={
+                "code": "invalid_query",
+                "message": f"ocean_proximity must be one of {grid.categories}, stride 1..100",
+            },
+        )
+    serving = model_loader.version
+    stale = serving is not None and serving != grid.model_version
+    params = f"{ocean_proximity}|{lon_min}|{lat_min}|{lon_max}|{lat_max}|{stride}|{stale}"
+    etag = f'"{grid.etag_base}-{hashlib.sha1(params.encode()).hexdigest()[:10]}"'
+    headers = {"ETag": etag, "Cache-Control": f"private, max-age={GRID_CACHE_SECONDS}"}
+    if stale:
+        headers["X-Grid-Stale"] = "true"
+    if _etag_matches(request.headers.get("if-none-match", ""), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    rows, cols = grid.slice_shape(lon_min, lat_min, lon_max, lat_max, stride)
+    if rows * cols > GRID_MAX_CELLS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"code": "grid_too_large", "message": f"At most {GRID_MAX_CELLS} cells; raise `stride`"},
+        )
+    body = grid.slice(ocean_proximity, lon_min, lat_min, lon_max, lat_max, stride)
+    body["stale"] = stale
+    return JSONResponse(body, headers=headers)
+
+
+# Stream the current user's full prediction history (ndjson or csv)
+# Rows are read through a server-side cursor, so memory use does not grow with history size
+@app.get("/predictions/export", tags=["Predictions"])
+def export_predictions(
+    request: Request,
+    format: str = "ndjson",
+    _: str = Depends(require_token),
+):
+    try:
+        user_id = int(getattr(request.state, "user_id", "0"))
+    except Exception:
+        user_id = 0
+    if not user_id:
+        raise HTTPException(status_code=401, detail={"code": "unauthorized", "message": "Missing user"})
+    fmt = format.lower()
+    if fmt not in MEDIA_TYPES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"code": "invalid_format", "message": "format must be 'ndjson' or 'csv'"},
+        )
+    log_app.info("predictions_export", extra={"user_id": user_id, "format": fmt})
+    return StreamingResponse(
+        stream_user_predictions(user_id, fmt),
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="predictions.{fmt}"'},
+    )
@@ -0,0 +1,220 @@
+# Request and stage latency metrics, exposed in Prometheus text format at /metrics.
+#
+# Histograms have fixed buckets allocated once at import; observing a value
+# is a bisect plus three increments under a lock. Stage timings for the
+# current request are also collected in a ContextVar slot so the middleware
+# can emit a Server-Timing header.
+import bisect
+import collections
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger("app.metrics")
+
+# Stages of a prediction request, in Server-Timing order
+STAGES = ("auth", "rate_limit", "features", "inference", "db_insert")
+_STAGE_INDEX = {name: i for i, name in enumerate(STAGES)}
+
+# Seconds; roughly log-spaced from 50us to 10s
+DEFAULT_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+SERVER_TIMING = os.getenv("SERVER_TIMING", "on").lower() not in ("0", "off", "false")
+
+
+class Histogram:
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.total += value
+            self.count += 1
+
+    def render(self, name: str, labels: str) -> List[str]:
+        with self._lock:
+            counts = list(self.counts)
+            total, count = self.total, self.count
+        sep = "," if labels else ""
+        lines = []
+        cumulative = 0
+        for bound, c in zip(self.buckets, counts):
+            cumulative += c
+            lines.append(f'{name}_bucket{{{labels}{sep}le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels}{sep}le="+Inf"}} {count}')
+        lines.append(f"{name}_sum{{{labels}}} {total}")
+        lines.append(f"{name}_count{{{labels}}} {count}")
+        return lines
+
+
+_stage_histograms = [Histogram() for _ in STAGES]
+# Keyed by (method, route template); bounded by the number of routes
+_request_histograms: Dict[Tuple[str, str], Histogram] = {}
+_responses: Dict[Tuple[str, str, int], int] = collections.defaultdict(int)
+_registry_lock = threading.Lock()
+
+# Per-request stage durations (seconds, indexed like STAGES); None outside a request
+_current_stages: ContextVar[Optional[List[float]]] = ContextVar("stage_times", default=None)
+
+
+def begin_request() -> List[float]:
+    times = [0.0] * len(STAGES)
+    _current_stages.set(times)
+    return times
+
+
+# Stop attributing stage timings to the calling request (for work done on
+# behalf of several requests, e.g. a micro-batch task)
+def detach_request() -> None:
+    _current_stages.set(None)
+
+
+# Record a stage duration in its histogram and in the current request's slot
+def observe_stage(stage: str, seconds: float) -> None:
+    i = _STAGE_INDEX[stage]
+    _stage_histograms[i].observe(seconds)
+    times = _current_stages.get()
+    if times is not None:
+        times[i] += seconds
+
+
+def observe_request(method: str, route: str, status: int, seconds: float) -> None:
+    key = (method, route)
+    hist = _request_histograms.get(key)
+    if hist is None:
+        with _registry_lock:
+            hist = _request_histograms.setdefault(key, Histogram())
+    hist.observe(seconds)
+    with _registry_lock:
+        _responses[(method, route, status)] += 1
+
+
+def server_timing(times: Sequence[float], total: float) -> str:
+    parts = [f"{name};dur={t * 1e3:.3f}" for name, t in zip(STAGES, times) if t]
+    parts.append(f"total;dur={total * 1e3:.3f}")
+    return ", ".join(parts)
+
+
+def render_prometheus() -> str:
+    lines = [
+        "# HELP http_request_duration_seconds Request latency by route",
+        "# TYPE http_request_duration_seconds histogram",
+    ]
+    with _registry_lock:
+        requests = sorted(_request_histograms.items())
+        responses = sorted(_responses.items())
+    for (method, route), hist in requests:
+        lines.extend(hist.render("http_request_duration_seconds", f'method="{method}",route="{route}"'))
+    lines += [
+        "# HELP http_responses_total Responses by route and status code",
+        "# TYPE http_responses_total counter",
+    ]
+    for (method, route, status), n in responses:
+        lines.append(f'http_responses_total{{method="{method}",route="{route}",status="{status}"}} {n}')
+    lines += [
+        "# HELP request_stage_duration_seconds Time spent per request stage",
+        "# TYPE request_stage_duration_seconds histogram",
+    ]
+    for name, hist in zip(STAGES, _stage_histograms):
+        lines.extend(hist.render("request_stage_duration_seconds", f'stage="{name}"'))
+    return "\n".join(lines) + "\n"
+
+
+# Opt-in sampling profiler for slow requests (PROFILE_SLOW_MS).
+# A PROFILE_SAMPLE_RATE fraction of requests is profiled: while any of them is
+# in flight, one thread snapshots every thread's stack each PROFILE_INTERVAL_MS.
+# Requests slower than the threshold log their most frequent collapsed stacks.
+_IDLE_FILES = ("threading.py", "queue.py", "selectors.py", "thread.py")
+
+
+class SlowRequestProfiler:
+    def __init__(self, threshold: float, sample_rate: float = 1.0, interval: float = 0.005, top: int = 15) -> None:
+        self.threshold = threshold
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self.top = top
+        self._lock = threading.Lock()
+        self._active: Dict[int, collections.Counter] = {}
+        self._next_id = 0
+        self._thread: Optional[threading.Thread] = None
+        self.profiled = 0
+        self.reported = 0
+
+    def start(self) -> Optional[int]:
+        if random.random() >= self.sample_rate:
+            return None
+        with self._lock:
+            self._next_id += 1
+            token = self._next_id
+            self._active[token] = collections.Counter()
+            self.profiled += 1
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._sample, name="slow-request-profiler", daemon=True)
+                self._thread.start()
+        return token
+
+    def finish(self, token: Optional[int], seconds: float, label: str) -> None:
+        if token is None:
+            return
+        with self._lock:
+            stacks = self._active.pop(token, None)
+        if stacks is None or seconds < self.threshold:
+            return
+        self.reported += 1
+        logger.warning(
+            "slow_request_profile",
+            extra={
+                "request": label,
+                "duration_ms": round(seconds * 1e3, 3),
+                "samples": sum(stacks.values()),
+                "stacks": [f"{stack} {n}" for stack, n in stacks.most_common(self.top)],
+            },
+        )
+
+    def _sample(self) -> None:
+        me = threading.get_ident()
+        while True:
+            with self._lock:
+                if not self._active:
+                    self._thread = None
+                    return
+                counters = list(self._active.values())
+            for ident, frame in sys._current_frames().items():
+                if ident == me or frame.f_code.co_filename.endswith(_IDLE_FILES):
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_code.co_name}")
+                    frame = frame.f_back
+                collapsed = ";".join(reversed(stack))
+                for c in counters:
+                    c[collapsed] += 1
+            time.sleep(self.interval)
+
+    def stats(self) -> dict:
+        return {"profiled": self.profiled, "reported": self.reported, "threshold_ms": self.threshold * 1e3}
+
+
+def build_slow_request_profiler() -> Optional[SlowRequestProfiler]:
+    threshold_ms = os.getenv("PROFILE_SLOW_MS")
+    if not threshold_ms:
+        return None
+    return SlowRequestProfiler(
+        threshold=float(threshold_ms) / 1e3,
+        sample_rate=float(os.getenv("PROFILE_SAMPLE_RATE", "1.0")),
+        interval=float(os.getenv("PROFILE_INTERVAL_MS", "5")) / 1e3,
+    )
@@ -0,0 +1,88 @@
+# Coalesces concurrent single-record predictions into one vectorized call.
+# Requests wait at most `max_wait` seconds (or until `max_batch_size` records
+# are pending); each gets its own result back when the batch is scored.
+# All state is touched from the event loop thread only, so no locks are needed.
+import asyncio
+import os
+from typing import Any, Awaitable, Callable, List, Optional, Set, Tuple
+
+# Returns one result per payload, in order
+ScoreMany = Callable[[List[dict]], Awaitable[List[Any]]]
+
+
+class MicroBatcher:
+    def __init__(self, score_many: ScoreMany, max_batch_size: int = 64, max_wait: float = 0.002) -> None:
+        self._score_many = score_many
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait))
+        self._pending: List[Tuple[dict, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # strong references to running batches; the loop only keeps weak ones
+        self._tasks: Set[asyncio.Task] = set()
+        self.batches = 0
+        self.items = 0
+        self.largest_batch = 0
+
+    async def submit(self, payload: dict) -> Any:
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self._pending.append((payload, fut))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await fut
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[dict, asyncio.Future]]) -> None:
+        self.batches += 1
+        self.items += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+        try:
+            results = await self._score_many([payload for payload, _ in batch])
+            if len(results) != len(batch):
+                raise RuntimeError(f"score_many returned {len(results)} results for {len(batch)} payloads")
+            for (_, fut), y in zip(batch, results):
+                # a waiter may have gone away (client disconnect)
+                if not fut.done():
+                    fut.set_result(y)
+        except Exception as exc:
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(exc)
+        finally:
+            # only reached with waiters left when the batch itself was cancelled
+            for _, fut in batch:
+                if not fut.done():
+                    fut.cancel()
+
+    def stats(self) -> dict:
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_seconds": self.max_wait,
+            "pending": len(self._pending),
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": self.items / self.batches if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+        }
+
+
+# MICRO_BATCH=on enables it; MICRO_BATCH_MAX_SIZE / MICRO_BATCH_MAX_WAIT_MS tune it
+def build_micro_batcher(score_many: ScoreMany) -> Optional[MicroBatcher]:
+    if os.getenv("MICRO_BATCH", "off").lower() not in ("on", "1", "true"):
+        return None
+    return MicroBatcher(
+        score_many,
+        max_batch_size=int(os.getenv("MICRO_BATCH_MAX_SIZE", "64")),
+        max_wait=float(os.getenv("MICRO_BATCH_MAX_WAIT_MS", "2")) / 1000.0,
+    )
@@ -0,0 +1,112 @@
+# Local model registry: one directory per version, as written by
+# `python main.py train` (models/<version>/{model.joblib, model.mmap.joblib,
+# model.schema.json}),
+# plus a CURRENT file naming the version workers should serve.
+#
+# Promoting a version rewrites CURRENT atomically; every worker's ModelWatcher
+# notices and hot-swaps its runtime (see ModelLoader.reload).
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+logger = logging.getLogger("app.model")
+
+ROOT = Path(__file__).resolve().parents[1]
+MODEL_REGISTRY_DIR = Path(os.getenv("MODEL_REGISTRY_DIR", str(ROOT / "models")))
+# Seconds between CURRENT checks; 0 disables the watcher
+MODEL_WATCH_INTERVAL = float(os.getenv("MODEL_WATCH_INTERVAL", "10"))
+
+CURRENT_FILE = "CURRENT"
+MODEL_FILE = "model.joblib"
+# Uncompressed copy loaded with mmap_mode="r" under MODEL_FORMAT=mmap
+MMAP_MODEL_FILE = "model.mmap.joblib"
+SCHEMA_FILE = "model.schema.json"
+
+
+class ModelRegistry:
+    def __init__(self, root: Path = MODEL_REGISTRY_DIR) -> None:
+        self.root = Path(root)
+
+    def versions(self) -> List[str]:
+        if not self.root.is_dir():
+            return []
+        return sorted(
+            p.name
+            for p in self.root.iterdir()
+            if p.is_dir() and not p.name.startswith(".") and (p / MODEL_FILE).exists()
+        )
+
+    # Version named by CURRENT, or None (no registry / not promoted yet)
+    def current(self) -> Optional[str]:
+        try:
+            version = (self.root / CURRENT_FILE).read_text().strip()
+        except OSError:
+            return None
+        return version if version and (self.root / version / MODEL_FILE).exists() else None
+
+    # (model path, schema path) of a registered version; only names listed
+    # by versions() are accepted, so a request can't point outside the registry
+    def paths(self, version: str) -> Tuple[Path, Path]:
+        if version not in self.versions():
+            raise KeyError(f"Unknown model version {version!r}")
+        return self.root / version / MODEL_FILE, self.root / version / SCHEMA_FILE
+
+    def set_current(self, version: str) -> None:
+        self.paths(version)
+        tmp = self.root / f".{CURRENT_FILE}.tmp"
+        tmp.write_text(version + "\n")
+        tmp.replace(self.root / CURRENT_FILE)
+        logger.info("model_version_promoted", extra={"model_version": version})
+
+
+registry = ModelRegistry()
+
+
+# Polls CURRENT and calls on_change(version) when it differs from the served
+# version, so all workers follow a promotion without an admin call each.
+# on_change returns False when it did not start a reload (one is running);
+# a version whose reload fails is not retried until CURRENT changes again.
+class ModelWatcher:
+    def __init__(
+        self,
+        registry: ModelRegistry,
+        served_version: Callable[[], Optional[str]],
+        on_change: Callable[[str], Optional[bool]],
+        failed_version: Callable[[], Optional[str]] = lambda: None,
+        interval: float = MODEL_WATCH_INTERVAL,
+    ) -> None:
+        self._registry = registry
+        self._served_version = served_version
+        self._on_change = on_change
+        self._failed_version = failed_version
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="model-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def check(self) -> None:
+        current = self._registry.current()
+        served = self._served_version()
+        if current is None or served is None or current == served:
+            return
+        if current == self._failed_version():
+            return
+        logger.info("model_version_changed", extra={"from": served, "to": current})
+        self._on_change(current)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception:
+                logger.exception("model_watch_failed")
@@ -1,32 +1,161 @@
+import logging
+import os
+import threading
+import time
+import warnings
 from pathlib import Path
-from typing import List
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
 
 import joblib
+import numpy as np
 import pandas as pd
 
+from .feature_schema import file_sha256, load_schema, schema_from_csv
+from .forest_engine import FlatForest, flat_dir
+from .model_registry import MMAP_MODEL_FILE, ModelRegistry, registry as default_registry
+
 # paths
 ROOT = Path(__file__).resolve().parents[1]
 DATA_PATH = ROOT / "housing.csv"
 MODEL_PATH = ROOT / "model.joblib"
+MODEL_MMAP_PATH = ROOT / "model.mmap.joblib"
+SCHEMA_PATH = ROOT / "model.schema.json"
+
+logger = logging.getLogger("app.model")
+
+# "compressed" loads model.joblib into private memory; "mmap" loads the
+# uncompressed export with mmap_mode="r" so its arrays live in the page cache
+MODEL_FORMAT = os.getenv("MODEL_FORMAT", "compressed").lower()
+
+
+# Artifact path and joblib mmap_mode for the configured format; model_path is
+# a registry version's model.joblib, whose mmap export sits next to it
+def model_artifact(fmt: Optional[str] = None, model_path: Optional[Path] = None) -> Tuple[Path, Optional[str]]:
+    fmt = (fmt or MODEL_FORMAT).lower()
+    if fmt == "mmap":
+        return (MODEL_MMAP_PATH if model_path is None else model_path.with_name(MMAP_MODEL_FILE)), "r"
+    if fmt != "compressed":
+        raise ValueError(f"Unknown MODEL_FORMAT {fmt!r}; expected 'compressed' or 'mmap'")
+    return model_path or MODEL_PATH, None
+
+# "sklearn" calls model.predict; "flat" scores with the NumPy FlatForest
+# engine built from the loaded forest (same predictions, less per-call overhead)
+INFERENCE_ENGINE = os.getenv("INFERENCE_ENGINE", "sklearn").lower()
+# Larger batches go to sklearn, whose compiled traversal wins once per-call
+# overhead is amortized (see benchmarks/bench_forest_engine.py)
+FLAT_ENGINE_MAX_ROWS = int(os.getenv("FLAT_ENGINE_MAX_ROWS", "512"))
+
+# The only categorical input; get_dummies names its columns "<field>_<value>"
+CATEGORICAL_FIELD = "ocean_proximity"
+_CATEGORY_PREFIX = f"{CATEGORICAL_FIELD}_"
+
+# A couple of realistic records used to warm a freshly loaded runtime
+WARMUP_PAYLOADS = (
+    {
+        "longitude": -122.23, "latitude": 37.88, "housing_median_age": 41.0, "total_rooms": 880.0,
+        "total_bedrooms": 129.0, "population": 322.0, "households": 126.0, "median_income": 8.3252,
+        "ocean_proximity": "NEAR BAY",
+    },
+    {
+        "longitude": -117.81, "latitude": 33.79, "housing_median_age": 16.0, "total_rooms": 2604.0,
+        "total_bedrooms": 490.0, "population": 1417.0, "households": 471.0, "median_income": 3.1544,
+        "ocean_proximity": "<1H OCEAN",
+    },
+)
 
 
 class ModelRuntime:
-    def __init__(self) -> None:
-        self.expected_columns: List[str] = self._compute_expected_columns()
-        self.model = self._load_model()
+    # version=None serves the registry's CURRENT version, or the legacy
+    # model.joblib / model.schema.json pair when there is no registry
+    def __init__(self, version: Optional[str] = None, registry: Optional[ModelRegistry] = None) -> None:
+        registry = registry or default_registry
+        version = version or registry.current()
+        model_path = schema_path = None
+        if version is not None:
+            model_path, schema_path = registry.paths(version)
+        self.schema: dict = self._load_feature_schema(schema_path)
+        self.expected_columns: List[str] = list(self.schema["columns"])
+        self._numeric_slots, self._category_slots = self._build_slot_tables(self.expected_columns)
+        self.model, model_file, model_sha, mmapped = self._load_model(model_path)
+        self.version: str = version or model_sha[:12]
+        # the mmap export may carry the flattened engine arrays, mapped the same way
+        shared = FlatForest.load(flat_dir(model_file), model_sha) if mmapped else None
+        self.engine = self._build_engine(self.model, prebuilt=shared)
+
+    # Load the persisted feature schema; fall back to re-deriving it from
+    # the training CSV when the artifact is missing or of another version
+    def _load_feature_schema(self, path: Optional[Path] = None) -> dict:
+        path = path or SCHEMA_PATH
+        schema = load_schema(path)
+        if schema is not None:
+            logger.info("feature_schema_loaded", extra={"path": str(path)})
+            return schema
+        logger.warning("feature_schema_fallback_csv", extra={"path": str(path)})
+        return self._compute_schema_from_csv()
 
     # Compute expected feature columns from training data
-    def _compute_expected_columns(self) -> List[str]:
-        df = pd.read_csv(DATA_PATH)
-        df = df.dropna()
-        df = pd.get_dummies(df)
-        features = df.drop(["median_house_value"], axis=1)
-        return list(features.columns)
+    def _compute_schema_from_csv(self) -> dict:
+        return schema_from_csv(DATA_PATH)
+
+    # Split expected columns into numeric (field, index) pairs and a
+    # category value -> one-hot column index table
+    @staticmethod
+    def _build_slot_tables(columns: Sequence[str]) -> Tuple[List[Tuple[str, int]], Dict[str, int]]:
+        numeric: List[Tuple[str, int]] = []
+        categories: Dict[str, int] = {}
+        for idx, col in enumerate(columns):
+            if col.startswith(_CATEGORY_PREFIX):
+                categories[col[len(_CATEGORY_PREFIX):]] = idx
+            else:
+                numeric.append((col, idx))
+        return numeric, categories
+
+    # Returns the fitted model, the file it came from, that file's sha256
+    # (short form used as the version) and whether it was memory-mapped
+    def _load_model(self, path: Optional[Path] = None):
+        path, mmap_mode = model_artifact(model_path=path)
+        if mmap_mode is not None and not path.exists():
+            raise FileNotFoundError(
+                f"MODEL_FORMAT=mmap but {path} is missing; retrain, or run `python main.py --export-mmap`"
+            )
+        return joblib.load(path, mmap_mode=mmap_mode), path, file_sha256(path), mmap_mode is not None
 
-    def _load_model(self):
-        return joblib.load(MODEL_PATH)
+    # prebuilt: arrays loaded from disk (mmap export); otherwise flattened here
+    @staticmethod
+    def _build_engine(
+        model, engine: Optional[str] = None, prebuilt: Optional[FlatForest] = None
+    ) -> Optional[FlatForest]:
+        engine = (engine or INFERENCE_ENGINE).lower()
+        if engine == "sklearn":
+            return None
+        if engine != "flat":
+            raise ValueError(f"Unknown INFERENCE_ENGINE {engine!r}; expected 'sklearn' or 'flat'")
+        forest = prebuilt if prebuilt is not None else FlatForest.from_sklearn(model)
+        logger.info(
+            "forest_engine_built",
+            extra={
+                "trees": forest.n_trees,
+                "nodes": len(forest.value),
+                "max_depth": forest.max_depth,
+                "mapped": prebuilt is not None,
+            },
+        )
+        return forest
 
-    def prepare_features(self, payload: dict) -> pd.DataFrame:
+    # Fast single-record encoder: writes straight into a zeroed NumPy row
+    # using the precomputed slot tables, no DataFrame involved
+    def prepare_features(self, payload: dict) -> np.ndarray:
+        X = np.zeros((1, len(self.expected_columns)), dtype=np.float64)
+        row = X[0]
+        for name, idx in self._numeric_slots:
+            row[idx] = payload.get(name, 0)
+        slot = self._category_slots.get(payload.get(CATEGORICAL_FIELD))
+        if slot is not None:
+            row[slot] = 1.0
+        return X
+
+    # Reference pandas encoder; kept for parity checks and benchmarks
+    def prepare_features_frame(self, payload: dict) -> pd.DataFrame:
         # Convert single record to DataFrame and align with training columns
         df = pd.DataFrame([payload])
         df = pd.get_dummies(df)
@@ -34,11 +163,183 @@ class ModelRuntime:
         aligned = df.reindex(columns=self.expected_columns, fill_value=0)
         return aligned
 
-    def predict(self, X: pd.DataFrame) -> float:
-        y = self.model.predict(X)
+    # Vectorized encoding of many records into one (n, n_features) matrix.
+    # Unknown categories leave every one-hot slot at 0, like reindex does.
+    def prepare_batch(self, payloads: Sequence[dict]) -> np.ndarray:
+        n = len(payloads)
+        X = np.zeros((n, len(self.expected_columns)), dtype=np.float64)
+        if not n:
+            return X
+        names = [name for name, _ in self._numeric_slots]
+        idx = [i for _, i in self._numeric_slots]
+        X[:, idx] = np.array(
+            [[p.get(name, 0) for name in names] for p in payloads], dtype=np.float64
+        )
+        lookup = self._category_slots.get
+        slots = np.fromiter(
+            (lookup(p.get(CATEGORICAL_FIELD), -1) for p in payloads), dtype=np.intp, count=n
+        )
+        known = slots >= 0
+        X[np.flatnonzero(known), slots[known]] = 1.0
+        return X
+
+    # Array inputs are aligned to expected_columns by construction, so the
+    # feature-name check sklearn does for DataFrame-fitted models is redundant;
+    # silenced here only, not for the rest of the process
+    def _model_predict(self, X: np.ndarray) -> np.ndarray:
+        with warnings.catch_warnings():
+            warnings.filterwarnings(
+                "ignore", message="X does not have valid feature names", category=UserWarning
+            )
+            return self.model.predict(X)
+
+    def predict(self, X: np.ndarray) -> float:
+        y = self.engine.predict(X) if self.engine is not None else self._model_predict(X)
         return float(y[0])
 
+    # Score a whole matrix with a single model call
+    def predict_batch(self, X: np.ndarray) -> List[float]:
+        if not len(X):
+            return []
+        if self.engine is not None and len(X) <= FLAT_ENGINE_MAX_ROWS:
+            return self.engine.predict(X).tolist()
+        return self._model_predict(X).astype(float).tolist()
+
+    # Exercise both scoring paths once before serving, so the first requests
+    # don't pay for lazy initialisation; refuses a model that returns garbage
+    def warm_up(self, payloads: Sequence[dict] = WARMUP_PAYLOADS) -> None:
+        ys = [self.predict(self.prepare_features(p)) for p in payloads]
+        ys += self.predict_batch(self.prepare_batch(list(payloads) * 8))
+        if not np.all(np.isfinite(ys)):
+            raise ValueError(f"model {self.version} returned non-finite warm-up predictions")
+
+
+# Builds the ModelRuntime on first use or on a background thread, so importing
+# the app never blocks on joblib decompressing the forest
+class ModelLoader:
+    def __init__(self, factory: Callable[[Optional[str]], ModelRuntime] = ModelRuntime) -> None:
+        self._factory = factory
+        self._runtime: Optional[ModelRuntime] = None
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._listeners: List[Callable[[ModelRuntime], None]] = []
+        self._reload_thread: Optional[threading.Thread] = None
+        # guards _reload_thread only; _lock is held for a whole build
+        self._reload_lock = threading.Lock()
+        self.load_seconds: Optional[float] = None
+        self.error: Optional[str] = None
+        # registry version whose last load or warm-up failed
+        self.failed_version: Optional[str] = None
+
+    @property
+    def ready(self) -> bool:
+        return self._runtime is not None
+
+    # Called with the new runtime after every successful (re)load
+    def add_listener(self, fn: Callable[[ModelRuntime], None]) -> None:
+        self._listeners.append(fn)
+
+    # Build the runtime once; concurrent callers wait for the same load
+    def load(self) -> ModelRuntime:
+        with self._lock:
+            if self._runtime is not None:
+                return self._runtime
+            return self._build()
+
+    # Build and warm a fresh runtime, then swap the reference. Requests keep
+    # using the old runtime until then, and in-flight ones finish on it
+    def reload(self, version: Optional[str] = None) -> ModelRuntime:
+        with self._lock:
+            return self._build(version)
+
+    # Reload on a background thread; False (without waiting) if a reload is
+    # already running
+    def reload_in_background(self, version: Optional[str] = None) -> bool:
+        with self._reload_lock:
+            if self._reload_thread is not None and self._reload_thread.is_alive():
+                return False
+            self._reload_thread = threading.Thread(
+                target=self._reload_quietly, args=(version,), name="model-reloader", daemon=True
+            )
+            self._reload_thread.start()
+        return True
+
+    def _reload_quietly(self, version: Optional[str]) -> None:
+        try:
+            self.reload(version)
+        except Exception:
+            pass  # recorded in self.error; the previous runtime keeps serving
+
+    # Caller holds self._lock
+    def _build(self, version: Optional[str] = None) -> ModelRuntime:
+        logger.info("model_load_start", extra={"format": MODEL_FORMAT, "model_version": version})
+        t0 = time.perf_counter()
+        try:
+            rt = self._factory(version)
+            rt.warm_up()
+        except Exception as exc:
+            self.error = f"{type(exc).__name__}: {exc}"
+            self.failed_version = version
+            logger.exception("model_load_failed")
+            raise
+        self.load_seconds = time.perf_counter() - t0
+        self.error = None
+        self.failed_version = None
+        self._runtime = rt
+        logger.info(
+            "model_load_done",
+            extra={"seconds": round(self.load_seconds, 3), "model_version": rt.version},
+        )
+        for fn in self._listeners:
+            try:
+                fn(rt)
+            except Exception:
+                logger.exception("model_load_listener_failed")
+        return rt
+
+    # Kick off loading without blocking the caller (idempotent)
+    def start_background(self) -> None:
+        if self.ready or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._thread = threading.Thread(target=self._load_quietly, name="model-loader", daemon=True)
+        self._thread.start()
+
+    def _load_quietly(self) -> None:
+        try:
+            self.load()
+        except Exception:
+            pass  # recorded in self.error; get() will retry
+
+    # Runtime for request handlers; loads lazily if it isn't there yet
+    def get(self) -> ModelRuntime:
+        rt = self._runtime
+        if rt is not None:
+            return rt
+        return self.load()
+
+    @property
+    def version(self) -> Optional[str]:
+        rt = self._runtime
+        return rt.version if rt is not None else None
+
+    def status(self) -> dict:
+        return {
+            "loaded": self.ready,
+            "version": self.version,
+            "loading": self._thread is not None and self._thread.is_alive(),
+            "reloading": self._reload_thread is not None and self._reload_thread.is_alive(),
+            "load_seconds": self.load_seconds,
+            "error": self.error,
+            "failed_version": self.failed_version,
+        }
+
+
+# Process-wide loader for the app
+model_loader = ModelLoader()
 
-# Singleton runtime for the app
-runtime = ModelRuntime()
 
+# `from app.model_runtime import runtime` keeps working, but loads on first access
+def __getattr__(name: str):
+    if name == "runtime":
+        return model_loader.get()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,6 +1,6 @@
 from datetime import datetime
 
-from sqlalchemy import Column, DateTime, Integer, String, Float, ForeignKey
+from sqlalchemy import Column, Date, DateTime, Integer, String, Float, ForeignKey, Index
 from sqlalchemy.dialects.sqlite import JSON as SQLITE_JSON
 from sqlalchemy.dialects.postgresql import JSONB as PG_JSONB
 
@@ -34,3 +34,51 @@ class Prediction(Base):
     payload = Column(_json_type(), nullable=False)
     predicted_value = Column(Float, nullable=False)
     created_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
+    # Registry version (or model file hash) of the model that produced the value
+    model_version = Column(String(64), nullable=True)
+
+    # Serves "a user's history, newest first" (and its keyset cursor) from the index alone
+    __table_args__ = (
+        Index("ix_predictions_user_created_id", user_id, created_at.desc(), id),
+    )
+
+
+# Per user / UTC day / ocean_proximity aggregates of predictions, so stats
+# are read from O(buckets) rows. `histogram` maps a value bin index (see
+# app.analytics.BIN_WIDTH) to a count and backs approximate percentiles.
+class PredictionRollup(Base):
+    __tablename__ = "prediction_rollups"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    ocean_proximity = Column(String(64), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    total = Column(Float, nullable=False, default=0.0)
+    min_value = Column(Float, nullable=True)
+    max_value = Column(Float, nullable=True)
+    histogram = Column(_json_type(), nullable=False, default=dict)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+# Predictions created before folded_until are in the rollups (scheduled refresher)
+class RollupWatermark(Base):
+    __tablename__ = "prediction_rollup_watermark"
+
+    id = Column(Integer, primary_key=True)
+    folded_until = Column(DateTime, nullable=True)
+
+
+# One shadow-scored call: the live model's and the candidate's predictions
+# for the same records, and how long each took (see app.shadow)
+class ShadowPrediction(Base):
+    __tablename__ = "shadow_predictions"
+
+    id = Column(Integer, primary_key=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
+    live_version = Column(String(64), nullable=False)
+    shadow_version = Column(String(64), nullable=False)
+    rows = Column(Integer, nullable=False)
+    live_values = Column(_json_type(), nullable=False)
+    shadow_values = Column(_json_type(), nullable=False)
+    live_ms = Column(Float, nullable=False)
+    shadow_ms = Column(Float, nullable=False)
@@ -0,0 +1,53 @@
+# Opaque keyset-pagination cursors: base64url-encoded JSON of the sort key
+# of the last row on a page. Clients pass it back as `after=`.
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Tuple
+
+
+def encode_cursor(data: dict) -> str:
+    raw = json.dumps(data, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+# Raises ValueError on anything that isn't a cursor we issued
+def decode_cursor(cursor: str) -> dict:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+    except Exception as exc:
+        raise ValueError("invalid cursor") from exc
+    if not isinstance(data, dict):
+        raise ValueError("invalid cursor")
+    return data
+
+
+# Predictions are ordered by (created_at DESC, id ASC)
+def prediction_cursor(created_at: datetime, row_id: int) -> str:
+    return encode_cursor({"t": created_at.isoformat(), "i": row_id})
+
+
+def parse_prediction_cursor(cursor: Optional[str]) -> Optional[Tuple[datetime, int]]:
+    if not cursor:
+        return None
+    data = decode_cursor(cursor)
+    try:
+        return datetime.fromisoformat(data["t"]), int(data["i"])
+    except (KeyError, TypeError, ValueError) as exc:
+        raise ValueError("invalid cursor") from exc
+
+
+# Users are ordered by id ASC
+def user_cursor(row_id: int) -> str:
+    return encode_cursor({"i": row_id})
+
+
+def parse_user_cursor(cursor: Optional[str]) -> Optional[int]:
+    if not cursor:
+        return None
+    data = decode_cursor(cursor)
+    try:
+        return int(data["i"])
+    except (KeyError, TypeError, ValueError) as exc:
+        raise ValueError("invalid cursor") from exc
@@ -0,0 +1,261 @@
+# Bounded cache of /predict results keyed on the normalized payload and the
+# model version. The in-process LRU is the default; the SQLite backend is a
+# local stand-in for a shared store so several workers can reuse each other's hits.
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Callable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger("app.cache")
+
+
+# Stable key: same fields and values -> same key, regardless of dict order
+def canonical_key(payload: dict, model_version: str) -> str:
+    blob = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(f"{model_version}\x00{blob}".encode()).hexdigest()
+
+
+# Interface every cache backend implements
+class CacheBackend(ABC):
+    @abstractmethod
+    def get(self, key: str) -> Optional[float]: ...
+
+    @abstractmethod
+    def set(self, key: str, value: float, model_version: str) -> None: ...
+
+    # Drop everything not produced by model_version (None drops everything)
+    @abstractmethod
+    def invalidate(self, model_version: Optional[str] = None) -> None: ...
+
+    @abstractmethod
+    def __len__(self) -> int: ...
+
+
+# In-process LRU with optional TTL; thread-safe
+class MemoryLRUBackend(CacheBackend):
+    def __init__(
+        self, max_entries: int = 10000, ttl_seconds: float = 0, clock: Callable[[], float] = time.time
+    ) -> None:
+        self.max_entries = max(1, int(max_entries))
+        self.ttl = float(ttl_seconds)
+        self._clock = clock
+        self._data: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[float]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at and expires_at <= self._clock():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: float, model_version: str) -> None:
+        expires_at = self._clock() + self.ttl if self.ttl > 0 else 0.0
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def invalidate(self, model_version: Optional[str] = None) -> None:
+        # keys don't carry the version in clear text, so drop everything
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+# File-backed store shared by all workers on the host. LRU is approximate:
+# hits bump touched_at and pruning runs every `prune_every` writes.
+class SQLiteBackend(CacheBackend):
+    def __init__(
+        self,
+        path: str,
+        max_entries: int = 100000,
+        ttl_seconds: float = 0,
+        prune_every: int = 256,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.path = path
+        self.max_entries = max(1, int(max_entries))
+        self.ttl = float(ttl_seconds)
+        self.prune_every = max(1, int(prune_every))
+        self._clock = clock
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS prediction_cache ("
+            " key TEXT PRIMARY KEY, value REAL NOT NULL, model_version TEXT NOT NULL,"
+            " expires_at REAL NOT NULL, touched_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS ix_prediction_cache_touched ON prediction_cache (touched_at)"
+        )
+
+    def get(self, key: str) -> Optional[float]:
+        now = self._clock()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM prediction_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, expires_at = row
+            if expires_at and expires_at <= now:
+                self._conn.execute("DELETE FROM prediction_cache WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE prediction_cache SET touched_at = ? WHERE key = ?", (now, key))
+            return float(value)
+
+    def set(self, key: str, value: float, model_version: str) -> None:
+        now = self._clock()
+        expires_at = now + self.ttl if self.ttl > 0 else 0.0
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO prediction_cache VALUES (?, ?, ?, ?, ?)",
+                (key, float(value), model_version, expires_at, now),
+            )
+            self._writes += 1
+            if self._writes % self.prune_every == 0:
+                self._prune(now)
+
+    def _prune(self, now: float) -> None:
+        self._conn.execute(
+            "DELETE FROM prediction_cache WHERE expires_at > 0 AND expires_at <= ?", (now,)
+        )
+        self._conn.execute(
+            "DELETE FROM prediction_cache WHERE key IN ("
+            " SELECT key FROM prediction_cache ORDER BY touched_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+    def invalidate(self, model_version: Optional[str] = None) -> None:
+        with self._lock:
+            if model_version is None:
+                self._conn.execute("DELETE FROM prediction_cache")
+            else:
+                self._conn.execute(
+                    "DELETE FROM prediction_cache WHERE model_version != ?", (model_version,)
+                )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM prediction_cache").fetchone()[0]
+
+
+# Front door used by the API; with no backend it simply computes
+class PredictionCache:
+    def __init__(self, backend: Optional[CacheBackend] = None) -> None:
+        self.backend = backend
+        # guards the counters only; backends do their own locking
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    def get_or_compute(self, payload: dict, model_version: str, compute: Callable[[], float]) -> float:
+        if self.backend is None:
+            return compute()
+        key = canonical_key(payload, model_version)
+        cached = self._lookup(key)
+        if cached is not None:
+            return cached
+        value = compute()
+        self._store(key, value, model_version)
+        return value
+
+    # Batch variant: look every payload up, score only the misses in one call
+    def get_many_or_compute(
+        self,
+        payloads: Sequence[dict],
+        model_version: str,
+        compute_many: Callable[[List[dict]], List[float]],
+    ) -> List[float]:
+        if self.backend is None:
+            return list(compute_many(list(payloads)))
+        keys = [canonical_key(p, model_version) for p in payloads]
+        results: List[Optional[float]] = [self._lookup(k) for k in keys]
+        missing = [i for i, v in enumerate(results) if v is None]
+        if missing:
+            computed = compute_many([payloads[i] for i in missing])
+            for i, value in zip(missing, computed):
+                results[i] = value
+                self._store(keys[i], value, model_version)
+        return results  # type: ignore[return-value]
+
+    # A broken cache must never fail a prediction
+    def _lookup(self, key: str) -> Optional[float]:
+        failed = False
+        try:
+            cached = self.backend.get(key)
+        except Exception:
+            failed = True
+            logger.warning("prediction_cache_get_failed", exc_info=True)
+            cached = None
+        with self._lock:
+            self.errors += failed
+            if cached is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return cached
+
+    def _store(self, key: str, value: float, model_version: str) -> None:
+        try:
+            self.backend.set(key, value, model_version)
+        except Exception:
+            with self._lock:
+                self.errors += 1
+            logger.warning("prediction_cache_set_failed", exc_info=True)
+
+    # Called when a new model is loaded
+    def invalidate(self, model_version: Optional[str] = None) -> None:
+        if self.backend is not None:
+            self.backend.invalidate(model_version)
+            logger.info("prediction_cache_invalidated", extra={"model_version": model_version})
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits, misses, errors = self.hits, self.misses, self.errors
+        return {
+            "enabled": self.enabled,
+            "backend": type(self.backend).__name__ if self.backend is not None else None,
+            "hits": hits,
+            "misses": misses,
+            "errors": errors,
+            "size": len(self.backend) if self.backend is not None else 0,
+        }
+
+
+# Build the cache from PREDICTION_CACHE* environment variables
+def build_prediction_cache() -> PredictionCache:
+    kind = os.getenv("PREDICTION_CACHE", "off").lower()
+    size = int(os.getenv("PREDICTION_CACHE_SIZE", "10000"))
+    ttl = float(os.getenv("PREDICTION_CACHE_TTL", "3600"))
+    if kind == "memory":
+        return PredictionCache(MemoryLRUBackend(max_entries=size, ttl_seconds=ttl))
+    if kind == "sqlite":
+        path = os.getenv("PREDICTION_CACHE_PATH", "/tmp/prediction_cache.sqlite3")
+        return PredictionCache(SQLiteBackend(path, max_entries=size, ttl_seconds=ttl))
+    if kind not in ("off", "none", ""):
+        logger.warning("prediction_cache_unknown_backend", extra={"backend": kind})
+    return PredictionCache(None)
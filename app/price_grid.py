@@ -0,0 +1,212 @@
+# Precomputed price grid for map views.
+#
+# `python -m app.price_grid build` scores a regular longitude/latitude grid
+# over California once per ocean_proximity category with the serving
+# ModelRuntime, holding the other features at defaults (training medians
+# unless overridden with --set). The result is one float32 array
+# (category, lat, lon) saved as .npy next to a JSON header; the API maps it
+# read-only and /grid serves slices of it without calling the model.
+import hashlib
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger("app.grid")
+
+ROOT = Path(__file__).resolve().parents[1]
+GRID_PATH = Path(os.getenv("GRID_PATH", str(ROOT / "price_grid.npy")))
+# Bounding box of housing.csv, rounded outwards
+GRID_BOUNDS = (-124.4, 32.5, -114.3, 42.0)  # lon_min, lat_min, lon_max, lat_max
+GRID_STEP = float(os.getenv("GRID_STEP", "0.02"))
+# Rows per predict_batch call while building
+GRID_BUILD_CHUNK = 65536
+
+
+def meta_path(path: Path) -> Path:
+    return Path(path).with_suffix(".json")
+
+
+# Training medians of the numeric features (before one-hot encoding)
+def default_features(data_path: Path) -> Dict[str, float]:
+    df = pd.read_csv(data_path).dropna()
+    numeric = df.select_dtypes("number").drop(columns=["median_house_value", "longitude", "latitude"])
+    return {k: float(v) for k, v in numeric.median().items()}
+
+
+def build_grid(
+    runtime,
+    defaults: Dict[str, float],
+    step: float = GRID_STEP,
+    bounds: Tuple[float, float, float, float] = GRID_BOUNDS,
+) -> Tuple[np.ndarray, dict]:
+    lon_min, lat_min, lon_max, lat_max = bounds
+    lons = lon_min + step * np.arange(int(round((lon_max - lon_min) / step)) + 1)
+    lats = lat_min + step * np.arange(int(round((lat_max - lat_min) / step)) + 1)
+    categories: List[str] = list(runtime.schema["categories"]["ocean_proximity"])
+    lon_col = runtime.expected_columns.index("longitude")
+    lat_col = runtime.expected_columns.index("latitude")
+
+    # encode one template row per category with the runtime's own encoder,
+    # then only the coordinate columns change across the grid
+    templates = runtime.prepare_batch(
+        [dict(defaults, longitude=0.0, latitude=0.0, ocean_proximity=c) for c in categories]
+    )
+    grid_lat, grid_lon = np.meshgrid(lats, lons, indexing="ij")
+    coords_lon, coords_lat = grid_lon.ravel(), grid_lat.ravel()
+    out = np.empty((len(categories), len(lats), len(lons)), dtype=np.float32)
+    for i, template in enumerate(templates):
+        flat = out[i].reshape(-1)
+        for start in range(0, flat.size, GRID_BUILD_CHUNK):
+            stop = min(start + GRID_BUILD_CHUNK, flat.size)
+            X = np.repeat(template[None, :], stop - start, axis=0)
+            X[:, lon_col] = coords_lon[start:stop]
+            X[:, lat_col] = coords_lat[start:stop]
+            flat[start:stop] = runtime.predict_batch(X)
+    meta = {
+        "model_version": runtime.version,
+        "categories": categories,
+        "lon_min": float(lons[0]),
+        "lat_min": float(lats[0]),
+        "step": step,
+        "shape": list(out.shape),
+        "defaults": defaults,
+    }
+    return out, meta
+
+
+# Array first, header last: a reader that sees the new header also sees the new array
+def save_grid(values: np.ndarray, meta: dict, path: Path = GRID_PATH) -> None:
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as fh:
+        np.save(fh, values)
+    os.replace(tmp, path)
+    tmp_meta = meta_path(path).with_suffix(".json.tmp")
+    tmp_meta.write_text(json.dumps(meta, indent=2))
+    os.replace(tmp_meta, meta_path(path))
+
+
+class PriceGrid:
+    def __init__(self, values: np.ndarray, meta: dict) -> None:
+        self.values = values
+        self.meta = meta
+        self.model_version: str = meta["model_version"]
+        self.categories: List[str] = meta["categories"]
+        self.step: float = meta["step"]
+        self.lon_min: float = meta["lon_min"]
+        self.lat_min: float = meta["lat_min"]
+        # changes with the model and with any rebuild parameter (step, defaults)
+        digest = hashlib.sha1(json.dumps(meta, sort_keys=True).encode()).hexdigest()[:10]
+        self.etag_base = f"{self.model_version}-{digest}"
+
+    @classmethod
+    def open(cls, path: Path = GRID_PATH) -> "PriceGrid":
+        meta = json.loads(meta_path(path).read_text())
+        values = np.load(path, mmap_mode="r")
+        if list(values.shape) != meta["shape"]:
+            raise ValueError(f"grid {path} has shape {values.shape}, header says {meta['shape']}")
+        return cls(values, meta)
+
+    # Index range [lo, hi) of the cells whose centre lies inside [a, b]
+    def _span(self, origin: float, n: int, a: Optional[float], b: Optional[float]) -> Tuple[int, int]:
+        lo = 0 if a is None else int(np.ceil((a - origin) / self.step - 1e-9))
+        hi = n if b is None else int(np.floor((b - origin) / self.step + 1e-9)) + 1
+        return max(lo, 0), min(hi, n)
+
+    # Row and column ranges of the box: (r0, r1, c0, c1)
+    def _window(self, lon_min, lat_min, lon_max, lat_max) -> Tuple[int, int, int, int]:
+        _, n_rows, n_cols = self.values.shape
+        r0, r1 = self._span(self.lat_min, n_rows, lat_min, lat_max)
+        c0, c1 = self._span(self.lon_min, n_cols, lon_min, lon_max)
+        return r0, r1, c0, c1
+
+    # (rows, cols) that slice() would return, without touching the values
+    def slice_shape(
+        self,
+        lon_min: Optional[float] = None,
+        lat_min: Optional[float] = None,
+        lon_max: Optional[float] = None,
+        lat_max: Optional[float] = None,
+        stride: int = 1,
+    ) -> Tuple[int, int]:
+        r0, r1, c0, c1 = self._window(lon_min, lat_min, lon_max, lat_max)
+        return len(range(r0, r1, stride)), len(range(c0, c1, stride))
+
+    # Cells of one category inside the box, every `stride`-th in each direction
+    def slice(
+        self,
+        category: str,
+        lon_min: Optional[float] = None,
+        lat_min: Optional[float] = None,
+        lon_max: Optional[float] = None,
+        lat_max: Optional[float] = None,
+        stride: int = 1,
+    ) -> dict:
+        r0, r1, c0, c1 = self._window(lon_min, lat_min, lon_max, lat_max)
+        cells = self.values[self.categories.index(category), r0:r1:stride, c0:c1:stride]
+        return {
+            "model_version": self.model_version,
+            "ocean_proximity": category,
+            "lon_min": round(self.lon_min + c0 * self.step, 6),
+            "lat_min": round(self.lat_min + r0 * self.step, 6),
+            "step": self.step * stride,
+            "rows": int(cells.shape[0]),
+            "cols": int(cells.shape[1]),
+            # row-major from the south-west corner; whole dollars keep the body small
+            "values": np.rint(cells).astype(np.int64).tolist(),
+        }
+
+
+# Reopens the grid when the build job replaces it; stat() per request is the only cost
+class GridStore:
+    def __init__(self, path: Path = GRID_PATH) -> None:
+        self.path = Path(path)
+        self._grid: Optional[PriceGrid] = None
+        self._stamp: Optional[float] = None
+
+    def get(self) -> Optional[PriceGrid]:
+        try:
+            stamp = meta_path(self.path).stat().st_mtime_ns
+        except OSError:
+            return None
+        if stamp != self._stamp:
+            self._grid = PriceGrid.open(self.path)
+            self._stamp = stamp
+            logger.info("price_grid_loaded", extra={"model_version": self._grid.model_version})
+        return self._grid
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from .model_runtime import DATA_PATH, ModelRuntime
+
+    parser = argparse.ArgumentParser(prog="python -m app.price_grid")
+    sub = parser.add_subparsers(dest="command", required=True)
+    b = sub.add_parser("build", help="score the lon/lat grid with the serving model")
+    b.add_argument("--step", type=float, default=GRID_STEP, help="cell size in degrees")
+    b.add_argument("--set", action="append", default=[], metavar="FEATURE=VALUE", help="override a default")
+    b.add_argument("--model-version", default=None, help="registry version (default: CURRENT)")
+    b.add_argument("--out", default=str(GRID_PATH))
+    args = parser.parse_args()
+
+    defaults = default_features(DATA_PATH)
+    for item in args.set:
+        name, value = item.split("=", 1)
+        if name not in defaults:
+            raise SystemExit(f"unknown feature {name!r}; expected one of {sorted(defaults)}")
+        defaults[name] = float(value)
+    rt = ModelRuntime(args.model_version)
+    t0 = time.perf_counter()
+    values, meta = build_grid(rt, defaults, step=args.step)
+    save_grid(values, meta, Path(args.out))
+    print(
+        f"{values.shape[0]} categories x {values.shape[1]} x {values.shape[2]} cells "
+        f"({values.nbytes / 2**20:.1f} MiB) with model {rt.version} in {time.perf_counter() - t0:.1f}s -> {args.out}"
+    )
@@ -1,34 +1,273 @@
+import logging
+import os
+import sqlite3
+import threading
 import time
+from abc import ABC, abstractmethod
 from collections import defaultdict, deque
-from typing import Deque, Dict
+from typing import Callable, Deque, Dict, List, Optional, Tuple
 
 from fastapi import Depends, HTTPException, status
 
+logger = logging.getLogger("app.rate_limit")
+
+
+def _too_many() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail={"code": "rate_limit_exceeded", "message": "Rate limit exceeded"},
+    )
+
+
 # Fixed window rate limiter implementation
 # Each key is allowed max_requests per window_seconds
+# (a sliding log: keeps every hit timestamp, so memory grows with max_requests)
 class FixedWindowLimiter:
-    def __init__(self, max_requests: int, window_seconds: int) -> None:
+    def __init__(self, max_requests: int, window_seconds: int, sweep_interval: float = 60.0) -> None:
         self.max_requests = max_requests
         self.window = window_seconds
         self._hits: Dict[str, Deque[float]] = defaultdict(deque)
+        self._lock = threading.Lock()
+        self._sweep_interval = sweep_interval
+        self._last_sweep = time.time()
 
     # Record a hit for the given key and enforce rate limit
     def hit(self, key: str) -> None:
         now = time.time()
-        q = self._hits[key]
-        # Purge old hits outside the window
-        cutoff = now - self.window
-        while q and q[0] < cutoff:
-            q.popleft()
-        if len(q) >= self.max_requests:
-            raise HTTPException(
-                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                detail={"code": "rate_limit_exceeded", "message": "Rate limit exceeded"},
-            )
-        q.append(now)
+        with self._lock:
+            q = self._hits[key]
+            # Purge old hits outside the window
+            cutoff = now - self.window
+            while q and q[0] < cutoff:
+                q.popleft()
+            if len(q) >= self.max_requests:
+                raise _too_many()
+            q.append(now)
+            if now - self._last_sweep >= self._sweep_interval:
+                self._sweep(cutoff)
+                self._last_sweep = now
+
+    # Drop keys whose newest hit is already outside the window
+    def _sweep(self, cutoff: float) -> None:
+        for key in [k for k, q in self._hits.items() if not q or q[-1] < cutoff]:
+            del self._hits[key]
+
+
+# Limiter state is a fixed-size tuple per key, so memory is O(1) per key.
+State = Tuple[float, float, float]
+Step = Callable[[Optional[State], float], Tuple[State, bool]]
+
+
+# Storage for per-key limiter state. update() must apply `step` atomically
+# (read state, compute new state, write it back) and return whether the hit
+# is allowed. Keys idle for longer than idle_ttl seconds are evicted.
+class LimiterStore(ABC):
+    @abstractmethod
+    def update(self, key: str, step: Step, now: float) -> bool: ...
+
+    @abstractmethod
+    def __len__(self) -> int: ...
+
+
+# In-process store with striped locks so unrelated keys don't contend
+class MemoryLimiterStore(LimiterStore):
+    def __init__(self, idle_ttl: float = 120.0, sweep_interval: float = 60.0, stripes: int = 64) -> None:
+        self.idle_ttl = idle_ttl
+        self.sweep_interval = sweep_interval
+        self._data: Dict[str, List] = {}
+        self._locks = [threading.Lock() for _ in range(stripes)]
+        self._sweep_lock = threading.Lock()
+        self._last_sweep = 0.0
+
+    def update(self, key: str, step: Step, now: float) -> bool:
+        with self._locks[hash(key) % len(self._locks)]:
+            entry = self._data.get(key)
+            state, allowed = step(entry[0] if entry else None, now)
+            self._data[key] = [state, now]
+        if now - self._last_sweep >= self.sweep_interval:
+            self._sweep(now)
+        return allowed
+
+    def _sweep(self, now: float) -> None:
+        if not self._sweep_lock.acquire(blocking=False):
+            return  # another thread is already sweeping
+        try:
+            self._last_sweep = now
+            cutoff = now - self.idle_ttl
+            for key, entry in list(self._data.items()):
+                if entry[1] < cutoff:
+                    with self._locks[hash(key) % len(self._locks)]:
+                        current = self._data.get(key)
+                        if current is not None and current[1] < cutoff:
+                            del self._data[key]
+        finally:
+            self._sweep_lock.release()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+# SQLite file shared by every worker on the host; BEGIN IMMEDIATE serializes
+# the read-modify-write across processes, so limits are not multiplied by
+# the worker count. Local stand-in for a shared store such as Redis.
+class SQLiteLimiterStore(LimiterStore):
+    def __init__(self, path: str, idle_ttl: float = 120.0, sweep_interval: float = 60.0) -> None:
+        self.idle_ttl = idle_ttl
+        self.sweep_interval = sweep_interval
+        self._lock = threading.Lock()
+        self._last_sweep = 0.0
+        self._conn = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS rate_limit ("
+            " key TEXT PRIMARY KEY, a REAL NOT NULL, b REAL NOT NULL, c REAL NOT NULL,"
+            " last_seen REAL NOT NULL)"
+        )
+
+    def update(self, key: str, step: Step, now: float) -> bool:
+        with self._lock:
+            conn = self._conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT a, b, c FROM rate_limit WHERE key = ?", (key,)).fetchone()
+                state, allowed = step(tuple(row) if row else None, now)
+                conn.execute(
+                    "INSERT OR REPLACE INTO rate_limit VALUES (?, ?, ?, ?, ?)", (key, *state, now)
+                )
+                if now - self._last_sweep >= self.sweep_interval:
+                    conn.execute("DELETE FROM rate_limit WHERE last_seen < ?", (now - self.idle_ttl,))
+                    self._last_sweep = now
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return allowed
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM rate_limit").fetchone()[0]
+
+
+# Token bucket: holds up to max_requests tokens, refilled continuously at
+# max_requests per window_seconds. State: (tokens, last_refill, unused).
+class TokenBucketLimiter:
+    def __init__(
+        self,
+        max_requests: int,
+        window_seconds: int,
+        store: Optional[LimiterStore] = None,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.max_requests = max_requests
+        self.window = window_seconds
+        self.rate = max_requests / float(window_seconds)
+        self.store = store if store is not None else MemoryLimiterStore(idle_ttl=2 * window_seconds)
+        self._clock = clock
+
+    def _step(self, state: Optional[State], now: float) -> Tuple[State, bool]:
+        if state is None:
+            tokens = float(self.max_requests)
+        else:
+            tokens = min(float(self.max_requests), state[0] + (now - state[1]) * self.rate)
+        if tokens >= 1.0:
+            return (tokens - 1.0, now, 0.0), True
+        return (tokens, now, 0.0), False
+
+    def hit(self, key: str) -> None:
+        if not self.store.update(key, self._step, self._clock()):
+            raise _too_many()
+
+
+# Sliding window counter: counts for the current and previous fixed window,
+# weighting the previous one by how much of it still overlaps the sliding
+# window. State: (window_index, current_count, previous_count).
+class SlidingWindowCounterLimiter:
+    def __init__(
+        self,
+        max_requests: int,
+        window_seconds: int,
+        store: Optional[LimiterStore] = None,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.max_requests = max_requests
+        self.window = window_seconds
+        self.store = store if store is not None else MemoryLimiterStore(idle_ttl=2 * window_seconds)
+        self._clock = clock
+
+    def _step(self, state: Optional[State], now: float) -> Tuple[State, bool]:
+        idx = float(int(now // self.window))
+        if state is None or state[0] < idx - 1:
+            current, previous = 0.0, 0.0
+        elif state[0] == idx - 1:
+            current, previous = 0.0, state[1]
+        else:
+            current, previous = state[1], state[2]
+        overlap = 1.0 - (now - idx * self.window) / self.window
+        if previous * overlap + current + 1 > self.max_requests:
+            return (idx, current, previous), False
+        return (idx, current + 1, previous), True
+
+    def hit(self, key: str) -> None:
+        if not self.store.update(key, self._step, self._clock()):
+            raise _too_many()
+
+
+# Fixed window counter on a LimiterStore: the shared-store form of "fixed",
+# since a per-key timestamp log does not fit the store's fixed-size state.
+# State: (window_index, count, unused).
+class FixedWindowCounterLimiter:
+    def __init__(
+        self,
+        max_requests: int,
+        window_seconds: int,
+        store: Optional[LimiterStore] = None,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.max_requests = max_requests
+        self.window = window_seconds
+        self.store = store if store is not None else MemoryLimiterStore(idle_ttl=2 * window_seconds)
+        self._clock = clock
+
+    def _step(self, state: Optional[State], now: float) -> Tuple[State, bool]:
+        idx = float(int(now // self.window))
+        count = state[1] if state is not None and state[0] == idx else 0.0
+        if count + 1 > self.max_requests:
+            return (idx, count, 0.0), False
+        return (idx, count + 1, 0.0), True
+
+    def hit(self, key: str) -> None:
+        if not self.store.update(key, self._step, self._clock()):
+            raise _too_many()
+
+
+# Build a limiter from RATE_LIMIT_ALGORITHM (fixed|token_bucket|sliding_window)
+# and RATE_LIMIT_BACKEND (memory|sqlite, the latter shared across workers)
+def build_limiter(max_requests: int, window_seconds: int):
+    algorithm = os.getenv("RATE_LIMIT_ALGORITHM", "fixed").lower()
+    backend = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()
+    if backend not in ("memory", "sqlite"):
+        raise ValueError(f"Unknown RATE_LIMIT_BACKEND {backend!r}")
+    if algorithm == "fixed" and backend == "memory":
+        return FixedWindowLimiter(max_requests, window_seconds)
+    idle_ttl = 2 * window_seconds
+    if backend == "sqlite":
+        path = os.getenv("RATE_LIMIT_SQLITE_PATH", "/tmp/rate_limit.sqlite3")
+        store: LimiterStore = SQLiteLimiterStore(path, idle_ttl=idle_ttl)
+    else:
+        store = MemoryLimiterStore(idle_ttl=idle_ttl)
+    if algorithm == "fixed":
+        logger.info("rate_limit_fixed_window_counter", extra={"backend": backend})
+        return FixedWindowCounterLimiter(max_requests, window_seconds, store)
+    if algorithm == "token_bucket":
+        return TokenBucketLimiter(max_requests, window_seconds, store)
+    if algorithm == "sliding_window":
+        return SlidingWindowCounterLimiter(max_requests, window_seconds, store)
+    raise ValueError(f"Unknown RATE_LIMIT_ALGORITHM {algorithm!r}")
+
 
 # Factory to create a dependency that uses the limiter
-def limiter_dependency_factory(limiter: FixedWindowLimiter):
+def limiter_dependency_factory(limiter):
     def _dep(key: str) -> None:
         limiter.hit(key)
 
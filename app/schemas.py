@@ -1,5 +1,5 @@
-from typing import Any, Dict
-from pydantic import BaseModel, Field, EmailStr
+from typing import Any, Dict, List, Optional
+from pydantic import BaseModel, ConfigDict, Field, EmailStr
 
 # Pydantic schema for input data validation
 class PredictionInput(BaseModel):
@@ -13,9 +13,51 @@ class PredictionInput(BaseModel):
     median_income: float = Field(...)
     ocean_proximity: str = Field(..., description="Category like 'NEAR OCEAN', 'INLAND', '<1H OCEAN', 'ISLAND', 'NEAR BAY'")
 
+# A real district from housing.csv; `id` is its data row number, `distance`
+# is measured in the comparables index's standardized feature space
+class Comparable(BaseModel):
+    id: int
+    longitude: float
+    latitude: float
+    housing_median_age: float
+    total_rooms: float
+    total_bedrooms: float
+    population: float
+    households: float
+    median_income: float
+    ocean_proximity: str
+    median_house_value: float
+    distance: float
+
+
+class ComparablesOutput(BaseModel):
+    comparables: List[Comparable]
+
+
 # Pydantic schema for output data validation
 class PredictionOutput(BaseModel):
     prediction: float
+    model_version: Optional[str] = None
+    # only with /predict?comparables=K
+    comparables: Optional[List[Comparable]] = None
+    # set instead of comparables when the lookup failed
+    comparables_error: Optional[str] = None
+
+    # allow the model_version field name (pydantic reserves model_*)
+    model_config = ConfigDict(protected_namespaces=())
+
+
+# Batch scoring: many records in, one prediction per record out (same order)
+class PredictionBatchInput(BaseModel):
+    records: List[PredictionInput]
+
+
+class PredictionBatchOutput(BaseModel):
+    predictions: List[float]
+    model_version: Optional[str] = None
+
+    # allow the model_version field name (pydantic reserves model_*)
+    model_config = ConfigDict(protected_namespaces=())
 
 
 class TokenRequest(BaseModel):
@@ -48,3 +90,37 @@ class PredictionRecord(BaseModel):
     predicted_value: float
     payload: Dict[str, Any]
     created_at: str
+    model_version: Optional[str] = None
+
+    model_config = ConfigDict(protected_namespaces=())
+
+
+# Aggregated prediction statistics; p50/p90/p99 are histogram approximations
+class StatsBucket(BaseModel):
+    day: Optional[str] = None
+    ocean_proximity: Optional[str] = None
+    count: int
+    mean: Optional[float] = None
+    min: Optional[float] = None
+    max: Optional[float] = None
+    p50: Optional[float] = None
+    p90: Optional[float] = None
+    p99: Optional[float] = None
+
+
+class ModelVersions(BaseModel):
+    versions: List[str]
+    current: Optional[str] = None
+    loaded: Optional[str] = None
+    status: Dict[str, Any]
+
+
+class ModelReloadRequest(BaseModel):
+    # Promote this registered version first; omit to reload CURRENT
+    version: Optional[str] = None
+
+
+class PredictionStats(BaseModel):
+    group_by: str
+    source: str
+    buckets: List[StatsBucket]
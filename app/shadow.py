@@ -0,0 +1,256 @@
+# Shadow evaluation of a candidate model on live traffic.
+#
+# With SHADOW_MODEL_VERSION set (a version in the model registry), a
+# SHADOW_SAMPLE_RATE fraction of in-process model calls is handed to a
+# single background thread after the live result is computed. That thread
+# scores the same records with the candidate and stores both predictions and
+# both latencies in shadow_predictions. The response never waits for it: when
+# SHADOW_MAX_PENDING calls are already queued, new samples are dropped.
+# A sampled batch call keeps at most SHADOW_MAX_ROWS random records of it.
+#
+# `python -m app.shadow report` summarizes divergence and latency per
+# (live, candidate) version pair.
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Callable, List, Optional, Sequence, Union
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from .models import ShadowPrediction
+
+logger = logging.getLogger("app.shadow")
+
+SHADOW_MODEL_VERSION = os.getenv("SHADOW_MODEL_VERSION", "")
+SHADOW_SAMPLE_RATE = float(os.getenv("SHADOW_SAMPLE_RATE", "0.05"))
+SHADOW_MAX_PENDING = int(os.getenv("SHADOW_MAX_PENDING", "64"))
+SHADOW_MAX_ROWS = int(os.getenv("SHADOW_MAX_ROWS", "256"))
+
+
+class ShadowEvaluator:
+    def __init__(
+        self,
+        candidate_factory: Callable[[], Any],
+        session_factory: Callable[[], Session],
+        sample_rate: float = SHADOW_SAMPLE_RATE,
+        max_pending: int = SHADOW_MAX_PENDING,
+        max_rows: int = SHADOW_MAX_ROWS,
+    ) -> None:
+        self._candidate_factory = candidate_factory
+        self._session_factory = session_factory
+        self.sample_rate = sample_rate
+        self.max_pending = max(1, int(max_pending))
+        self.max_rows = max(1, int(max_rows))
+        # one thread: shadow work never takes more than one core from requests
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shadow")
+        self._candidate = None
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.sampled = 0
+        self.dropped = 0
+        self.recorded = 0
+        self.failed = 0
+        self.error: Optional[str] = None
+
+    # Called on the live path right after scoring; only draws a random number
+    # and enqueues. `batch` tells whether the live call used predict_batch
+    def maybe_submit(
+        self,
+        payloads: Sequence[dict],
+        live: Union[float, List[float]],
+        live_version: str,
+        live_seconds: float,
+        batch: bool,
+    ) -> bool:
+        if self.error is not None or random.random() >= self.sample_rate:
+            return False
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.dropped += 1
+                return False
+            self.pending += 1
+            self.sampled += 1
+        payloads = list(payloads)
+        if batch and len(payloads) > self.max_rows:
+            # the live latency is prorated to the kept rows so the two stay comparable
+            keep = sorted(random.sample(range(len(payloads)), self.max_rows))
+            live_seconds *= self.max_rows / len(payloads)
+            payloads = [payloads[i] for i in keep]
+            live = [live[i] for i in keep]
+        self._executor.submit(self._evaluate, payloads, live, live_version, live_seconds, batch)
+        return True
+
+    def _evaluate(
+        self, payloads: List[dict], live, live_version: str, live_seconds: float, batch: bool
+    ) -> None:
+        try:
+            rt = self._runtime()
+            if rt is None:
+                return
+            # same calls as the live path, so the latencies are comparable
+            t0 = time.perf_counter()
+            if batch:
+                shadow = rt.predict_batch(rt.prepare_batch(payloads))
+            else:
+                shadow = rt.predict(rt.prepare_features(payloads[0]))
+            shadow_seconds = time.perf_counter() - t0
+            self._record(
+                ShadowPrediction(
+                    created_at=datetime.utcnow(),
+                    live_version=live_version,
+                    shadow_version=rt.version,
+                    rows=len(payloads),
+                    live_values=live if batch else [live],
+                    shadow_values=shadow if batch else [shadow],
+                    live_ms=live_seconds * 1e3,
+                    shadow_ms=shadow_seconds * 1e3,
+                )
+            )
+        except Exception:
+            with self._lock:
+                self.failed += 1
+            logger.exception("shadow_evaluation_failed")
+        finally:
+            with self._lock:
+                self.pending -= 1
+
+    # Candidate is loaded on the shadow thread at first use; a candidate that
+    # fails to load or warm up disables shadowing instead of retrying per call
+    def _runtime(self):
+        if self._candidate is None and self.error is None:
+            try:
+                rt = self._candidate_factory()
+                rt.warm_up()
+                self._candidate = rt
+                logger.info("shadow_model_loaded", extra={"model_version": rt.version})
+            except Exception as exc:
+                self.error = f"{type(exc).__name__}: {exc}"
+                logger.exception("shadow_model_load_failed")
+        return self._candidate
+
+    def _record(self, row: ShadowPrediction) -> None:
+        db = self._session_factory()
+        try:
+            db.add(row)
+            db.commit()
+        finally:
+            db.close()
+        with self._lock:
+            self.recorded += 1
+
+    # Waits for queued evaluations unless cancel is set
+    def stop(self, cancel: bool = True) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=cancel)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "candidate": self._candidate.version if self._candidate is not None else SHADOW_MODEL_VERSION,
+                "sample_rate": self.sample_rate,
+                "max_rows": self.max_rows,
+                "pending": self.pending,
+                "sampled": self.sampled,
+                "dropped": self.dropped,
+                "recorded": self.recorded,
+                "failed": self.failed,
+                "error": self.error,
+            }
+
+
+def build_shadow_evaluator(session_factory: Callable[[], Session]) -> Optional[ShadowEvaluator]:
+    if not SHADOW_MODEL_VERSION or SHADOW_SAMPLE_RATE <= 0:
+        return None
+    from .model_runtime import ModelRuntime
+
+    return ShadowEvaluator(lambda: ModelRuntime(SHADOW_MODEL_VERSION), session_factory)
+
+
+def _pct(values: List[float], q: float) -> Optional[float]:
+    return round(float(np.percentile(values, q)), 3) if values else None
+
+
+# Divergence and latency per (live, candidate) pair since `since`.
+# Divergence is per record; latency is per model call (micro-batched and
+# /predict/batch calls score several records at once, see `rows`)
+def summarize(db: Session, since: Optional[datetime] = None, threshold: float = 0.1) -> List[dict]:
+    q = db.query(ShadowPrediction).order_by(ShadowPrediction.id)
+    if since is not None:
+        q = q.filter(ShadowPrediction.created_at >= since)
+    groups: dict = {}
+    for r in q.yield_per(1000):
+        g = groups.setdefault(
+            (r.live_version, r.shadow_version), {"live": [], "shadow": [], "live_ms": [], "shadow_ms": []}
+        )
+        g["live"].extend(r.live_values)
+        g["shadow"].extend(r.shadow_values)
+        g["live_ms"].append(r.live_ms)
+        g["shadow_ms"].append(r.shadow_ms)
+    out = []
+    for (live_version, shadow_version), g in sorted(groups.items()):
+        live = np.asarray(g["live"], dtype=np.float64)
+        diff = np.abs(np.asarray(g["shadow"], dtype=np.float64) - live)
+        rel = diff / np.maximum(np.abs(live), 1e-9)
+        delta = list(np.asarray(g["shadow_ms"]) - np.asarray(g["live_ms"]))
+        out.append(
+            {
+                "live_version": live_version,
+                "shadow_version": shadow_version,
+                "calls": len(g["live_ms"]),
+                "records": int(live.size),
+                "abs_diff_mean": round(float(diff.mean()), 3),
+                "abs_diff_p50": _pct(list(diff), 50),
+                "abs_diff_p99": _pct(list(diff), 99),
+                "abs_diff_max": round(float(diff.max()), 3),
+                "rel_diff_mean": round(float(rel.mean()), 5),
+                "share_over_threshold": round(float((rel > threshold).mean()), 5),
+                "live_ms_p50": _pct(g["live_ms"], 50),
+                "live_ms_p99": _pct(g["live_ms"], 99),
+                "shadow_ms_p50": _pct(g["shadow_ms"], 50),
+                "shadow_ms_p99": _pct(g["shadow_ms"], 99),
+                "delta_ms_p99": _pct(delta, 99),
+            }
+        )
+    return out
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    from .db import SessionLocal, init_db
+
+    parser = argparse.ArgumentParser(prog="python -m app.shadow")
+    sub = parser.add_subparsers(dest="command", required=True)
+    rep = sub.add_parser("report", help="divergence and latency of shadow-scored traffic")
+    rep.add_argument("--hours", type=float, default=None, help="only the last N hours")
+    rep.add_argument("--threshold", type=float, default=0.1, help="relative difference counted as divergent")
+    rep.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    init_db()
+    session = SessionLocal()
+    try:
+        since = datetime.utcnow() - timedelta(hours=args.hours) if args.hours else None
+        summary = summarize(session, since=since, threshold=args.threshold)
+    finally:
+        session.close()
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        raise SystemExit(0)
+    if not summary:
+        print("no shadow predictions recorded")
+    for s in summary:
+        print(f"{s['live_version']} (live) vs {s['shadow_version']} (shadow): {s['calls']} calls, {s['records']} records")
+        print(
+            f"  |diff| mean {s['abs_diff_mean']}  p50 {s['abs_diff_p50']}  p99 {s['abs_diff_p99']}  max {s['abs_diff_max']}"
+        )
+        print(f"  relative diff mean {s['rel_diff_mean']:.2%}; over {args.threshold:.0%}: {s['share_over_threshold']:.2%}")
+        print(
+            f"  latency ms  live p50 {s['live_ms_p50']} p99 {s['live_ms_p99']}  |  "
+            f"shadow p50 {s['shadow_ms_p50']} p99 {s['shadow_ms_p99']}  |  delta p99 {s['delta_ms_p99']}"
+        )
@@ -0,0 +1,221 @@
+# Write-behind persistence for /predict: requests enqueue the prediction and
+# return; a background thread flushes the queue with multi-row INSERTs when
+# it holds `batch_size` rows or `flush_interval` seconds have passed.
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Callable, List, Optional
+
+from sqlalchemy import exc as exc_module
+from sqlalchemy.orm import Session
+
+from .crud import insert_prediction_rows
+
+logger = logging.getLogger("app.db")
+
+_STOP = object()
+
+
+# Errors worth retrying as is: the connection dropped or the database was busy
+def _is_transient(exc: BaseException) -> bool:
+    if isinstance(exc, exc_module.DBAPIError) and exc.connection_invalidated:
+        return True
+    return isinstance(exc, (exc_module.OperationalError, exc_module.DisconnectionError, exc_module.TimeoutError))
+
+
+class PredictionWriter:
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        max_queue: int = 10000,
+        batch_size: int = 500,
+        flush_interval: float = 0.2,
+        retries: int = 3,
+        retry_backoff: float = 0.1,
+    ) -> None:
+        self._session_factory = session_factory
+        self.max_queue = max(1, int(max_queue))
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = float(flush_interval)
+        self.retries = max(0, int(retries))
+        self.retry_backoff = float(retry_backoff)
+        self._queue: "queue.Queue" = queue.Queue(maxsize=self.max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._stats_lock = threading.Lock()
+        # backpressure / throughput counters
+        self.enqueued = 0
+        self.overflow_sync = 0
+        self.flushed_rows = 0
+        self.flushed_batches = 0
+        self.failed_rows = 0
+        self.retried_batches = 0
+        self.max_depth = 0
+        self.last_flush_seconds = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._thread = threading.Thread(target=self._run, name="prediction-writer", daemon=True)
+        self._thread.start()
+        logger.info(
+            "prediction_writer_started",
+            extra={"max_queue": self.max_queue, "batch_size": self.batch_size},
+        )
+
+    # Flush whatever is queued and stop the worker
+    def stop(self, timeout: float = 10.0) -> None:
+        if not self.running:
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        logger.info("prediction_writer_stopped", extra=self.stats())
+
+    # Queue a prediction without blocking; False (counted as overflow) when the
+    # queue is full and the caller must write the row itself. Async callers do
+    # that write off the event loop (see /predict)
+    def try_submit(
+        self,
+        user_id: int,
+        payload: dict,
+        predicted_value: float,
+        model_version: Optional[str] = None,
+    ) -> bool:
+        row = {
+            "user_id": user_id,
+            "payload": payload,
+            "predicted_value": predicted_value,
+            "model_version": model_version,
+            "created_at": datetime.utcnow(),
+        }
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            with self._stats_lock:
+                self.overflow_sync += 1
+            return False
+        with self._stats_lock:
+            self.enqueued += 1
+            depth = self._queue.qsize()
+            if depth > self.max_depth:
+                self.max_depth = depth
+        return True
+
+    def _run(self) -> None:
+        batch: List[dict] = []
+        deadline = 0.0
+        while True:
+            timeout = max(0.0, deadline - time.monotonic()) if batch else None
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            if item is _STOP:
+                self._drain_into(batch)
+                self._flush(batch)
+                return
+            if item is not None:
+                if not batch:
+                    deadline = time.monotonic() + self.flush_interval
+                batch.append(item)
+            if len(batch) >= self.batch_size or (batch and time.monotonic() >= deadline):
+                self._flush(batch)
+                batch = []
+
+    def _drain_into(self, batch: List[dict]) -> None:
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if item is not _STOP:
+                batch.append(item)
+
+    # One transaction per batch. Transient errors (disconnects, lock timeouts)
+    # retry with backoff; anything else, or retries running out, falls back
+    # to one insert per row so only the offending rows are lost
+    def _flush(self, batch: List[dict]) -> None:
+        if not batch:
+            return
+        t0 = time.perf_counter()
+        for attempt in range(self.retries + 1):
+            try:
+                self._insert(batch)
+                break
+            except Exception as exc:
+                if not _is_transient(exc) or attempt == self.retries:
+                    logger.warning(
+                        "prediction_writer_batch_failed",
+                        extra={"rows": len(batch), "error": f"{type(exc).__name__}: {exc}"},
+                    )
+                    self._flush_rows(batch)
+                    return
+                with self._stats_lock:
+                    self.retried_batches += 1
+                time.sleep(self.retry_backoff * 2**attempt)
+        with self._stats_lock:
+            self.flushed_rows += len(batch)
+            self.flushed_batches += 1
+            self.last_flush_seconds = time.perf_counter() - t0
+
+    def _insert(self, rows: List[dict]) -> None:
+        db = self._session_factory()
+        try:
+            insert_prediction_rows(db, rows)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _flush_rows(self, batch: List[dict]) -> None:
+        ok = 0
+        for row in batch:
+            try:
+                self._insert([row])
+                ok += 1
+            except Exception:
+                logger.exception(
+                    "prediction_writer_row_dropped",
+                    extra={"user_id": row.get("user_id"), "created_at": row.get("created_at")},
+                )
+        with self._stats_lock:
+            self.flushed_rows += ok
+            self.failed_rows += len(batch) - ok
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "running": self.running,
+                "queue_depth": self._queue.qsize(),
+                "queue_max": self.max_queue,
+                "max_depth": self.max_depth,
+                "enqueued": self.enqueued,
+                "overflow_sync": self.overflow_sync,
+                "flushed_rows": self.flushed_rows,
+                "flushed_batches": self.flushed_batches,
+                "failed_rows": self.failed_rows,
+                "retried_batches": self.retried_batches,
+                "last_flush_seconds": self.last_flush_seconds,
+            }
+
+
+# PREDICTION_WRITE_MODE=write_behind enables the queue; "sync" (default)
+# keeps the per-request commit
+def build_prediction_writer(session_factory: Callable[[], Session]) -> Optional[PredictionWriter]:
+    mode = os.getenv("PREDICTION_WRITE_MODE", "sync").lower()
+    if mode != "write_behind":
+        return None
+    return PredictionWriter(
+        session_factory,
+        max_queue=int(os.getenv("PREDICTION_WRITE_QUEUE_MAX", "10000")),
+        batch_size=int(os.getenv("PREDICTION_WRITE_BATCH", "500")),
+        flush_interval=float(os.getenv("PREDICTION_WRITE_INTERVAL_MS", "200")) / 1000.0,
+        retries=int(os.getenv("PREDICTION_WRITE_RETRIES", "3")),
+    )
@@ -0,0 +1,39 @@
+# Per-request auth overhead: full JWT verification vs the verified-token
+# cache, for tokens signed by the current secret and by the oldest of N.
+import argparse
+import os
+import time
+
+import jwt
+
+from app import auth
+from benchmarks.common import format_us, percentiles, time_calls
+
+
+def _token(secret: str) -> str:
+    now = int(time.time())
+    return jwt.encode({"sub": "1", "iat": now, "exp": now + 900}, secret, algorithm="HS256")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Per-request auth overhead: full JWT verification vs the verified-token cache.")
+    parser.add_argument("--calls", type=int, default=20000)
+    parser.add_argument("--secrets", type=int, default=4)
+    args = parser.parse_args()
+
+    secrets = [f"benchmark-secret-{i:02d}".ljust(32, "x") for i in range(args.secrets)]
+    os.environ["JWT_SECRETS"] = ",".join(secrets)
+    for label, secret in (("current secret", secrets[0]), ("oldest secret", secrets[-1])):
+        token = _token(secret)
+        for cache_size in (0, 10000):
+            os.environ["JWT_CACHE_SIZE"] = str(cache_size)
+            auth.reload_settings()
+            # rotation order is what a fresh worker sees: try index 0 first
+            auth._last_match_index = 0
+            samples = time_calls(auth._verify_jwt, [token] * args.calls)
+            mode = "cached" if cache_size else "uncached"
+            print(f"{label:15s} {mode:9s} {format_us(percentiles(samples))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+# Comparables lookup: KD-tree index (app.comparables) vs a brute-force NumPy
+# scan over the same candidate rows, single query p50/p99 for several k,
+# plus index build time from housing.csv vs loading the saved artifact.
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from app.comparables import FEATURES, build_index, load_index, save_index
+from benchmarks.common import format_us, percentiles, sample_payloads, time_calls
+
+
+def brute_force(index, payload: dict, k: int) -> np.ndarray:
+    rows, _ = index.candidates(payload["ocean_proximity"], k)
+    points = index.points if rows is None else index.points[rows]
+    x = index.transform(np.array([[float(payload[f]) for f in FEATURES]]))
+    d = np.einsum("ij,ij->i", points - x, points - x)
+    top = np.argpartition(d, k - 1)[:k]
+    top = top[np.argsort(d[top])]
+    return top if rows is None else rows[top]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Comparables lookup: KD-tree index vs brute-force scan.")
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 5, 20, 50])
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    index = build_index()
+    print(f"build from csv: {(time.perf_counter() - t0) * 1e3:.1f}ms ({len(index.row_ids)} rows)")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "comparables.joblib"
+        save_index(index, path)
+        t0 = time.perf_counter()
+        load_index(path)
+        print(f"load artifact:  {(time.perf_counter() - t0) * 1e3:.1f}ms ({path.stat().st_size / 2**20:.1f} MiB)")
+
+    payloads = sample_payloads(args.queries, seed=3)
+    for p in payloads:
+        p["longitude"] += 0.01  # not an exact match with a row
+    for k in args.k:
+        mismatches = sum(
+            [c["id"] for c in index.query(p, k)] != index.row_ids[brute_force(index, p, k)].tolist()
+            for p in payloads[:200]
+        )
+        kd = percentiles(time_calls(lambda p: index.query(p, k), payloads))
+        brute = percentiles(time_calls(lambda p: brute_force(index, p, k), payloads))
+        print(f"k={k:3d}  kd-tree  {format_us(kd)}")
+        print(f"       brute    {format_us(brute)}  speedup(p50)={brute['p50'] / kd['p50']:5.1f}x  "
+              f"result mismatches={mismatches}/200")
+
+
+if __name__ == "__main__":
+    main()
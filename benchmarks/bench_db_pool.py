@@ -0,0 +1,66 @@
+# Connection pool under concurrent load: latency per request-shaped unit of
+# work (checkout, one short query, checkin) for pre-ping strategies and pool
+# sizes, plus checkout wait and overflow from the pool metrics.
+# Uses --url (default: a throwaway SQLite file); point it at Postgres to
+# see the pre-ping round trip over a real network hop.
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from sqlalchemy import text
+
+from app.db import build_engine
+from benchmarks.common import percentiles
+
+
+def _run(engine, threads: int, requests: int):
+    samples = [[] for _ in range(threads)]
+    barrier = threading.Barrier(threads)
+
+    def worker(out):
+        barrier.wait()
+        for _ in range(requests):
+            t0 = time.perf_counter()
+            with engine.connect() as conn:
+                conn.execute(text("SELECT 1")).scalar()
+            out.append(time.perf_counter() - t0)
+
+    pool = [threading.Thread(target=worker, args=(s,)) for s in samples]
+    t0 = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    wall = time.perf_counter() - t0
+    return [x for s in samples for x in s], wall
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Connection pool latency, checkout wait and overflow under concurrent load.")
+    parser.add_argument("--url", default=None)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=500, help="per thread")
+    parser.add_argument("--pool-sizes", type=int, nargs="+", default=[5, 20])
+    args = parser.parse_args()
+
+    url = args.url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_pool.db')}"
+    print(f"{args.threads} threads x {args.requests} requests against {url.split('@')[-1]}")
+    for pool_size in args.pool_sizes:
+        for pre_ping in ("always", "idle", "off"):
+            engine = build_engine(url, pool_size=pool_size, max_overflow=pool_size, pre_ping=pre_ping)
+            samples, wall = _run(engine, args.threads, args.requests)
+            st = percentiles(samples)
+            m = engine.pool_metrics.snapshot(engine.pool)
+            print(
+                f"pool={pool_size:3d}+{pool_size:<3d} pre_ping={pre_ping:6s}  "
+                f"{len(samples) / wall:9.0f} req/s  p50={st['p50'] * 1e3:7.3f}ms  "
+                f"p99={st['p99'] * 1e3:7.3f}ms  wait mean={m['checkout_wait_mean_ms']:7.3f}ms "
+                f"max={m['checkout_wait_max_ms']:7.2f}ms  connects={m['connects']}  pings={m['pings']}"
+            )
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+# Per-call latency of the pandas feature path vs the NumPy fast path,
+# both for encoding alone and for encode + model.predict.
+import argparse
+
+from app.model_runtime import runtime
+from benchmarks.common import format_us, percentiles, sample_payloads, time_calls
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Per-call latency of the pandas feature path vs the NumPy fast path.")
+    parser.add_argument("--calls", type=int, default=2000)
+    args = parser.parse_args()
+
+    payloads = sample_payloads(args.calls)
+    # warm up both paths
+    for p in payloads[:50]:
+        runtime.predict(runtime.prepare_features_frame(p))
+        runtime.predict(runtime.prepare_features(p))
+
+    cases = {
+        "encode/pandas": runtime.prepare_features_frame,
+        "encode/numpy": runtime.prepare_features,
+        "end2end/pandas": lambda p: runtime.predict(runtime.prepare_features_frame(p)),
+        "end2end/numpy": lambda p: runtime.predict(runtime.prepare_features(p)),
+    }
+    for name, fn in cases.items():
+        print(f"{name:16s} {format_us(percentiles(time_calls(fn, payloads)))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+# RandomForest inference: sklearn predict vs the flattened NumPy engine
+# (app.forest_engine) vs the runtime's hybrid dispatch (INFERENCE_ENGINE=flat,
+# FLAT_ENGINE_MAX_ROWS) for batch sizes 1, 32, 1024 and 100k.
+import argparse
+import time
+
+import numpy as np
+
+from app import model_runtime
+from app.forest_engine import FlatForest
+from app.model_runtime import ModelRuntime
+from benchmarks.common import sample_payloads
+
+
+def _time(fn, X, repeat: int) -> float:
+    fn(X)  # warm-up
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(X)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="RandomForest inference: sklearn vs the flattened NumPy engine.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 32, 1024, 100_000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    runtime = ModelRuntime()
+    t0 = time.perf_counter()
+    forest = FlatForest.from_sklearn(runtime.model)
+    print(
+        f"flattened {forest.n_trees} trees / {len(forest.value)} nodes "
+        f"(max depth {forest.max_depth}) in {(time.perf_counter() - t0) * 1e3:.1f}ms"
+    )
+    runtime.engine = forest
+
+    X_all = runtime.prepare_batch(sample_payloads(max(args.sizes)))
+    diff = np.abs(forest.predict(X_all) - runtime.model.predict(X_all)).max()
+    print(f"max |flat - sklearn| over {len(X_all)} rows: {diff:.3g}")
+
+    for n in args.sizes:
+        X = X_all[:n]
+        repeat = max(1, args.repeat if n <= 1024 else args.repeat // 10)
+        sk = _time(runtime.model.predict, X, repeat)
+        flat = _time(forest.predict, X, repeat)
+        hybrid = _time(runtime.predict_batch, X, repeat)
+        print(
+            f"rows={n:7d}  sklearn={sk * 1e3:9.3f}ms  flat={flat * 1e3:9.3f}ms  "
+            f"runtime(flat<= {model_runtime.FLAT_ENGINE_MAX_ROWS})={hybrid * 1e3:9.3f}ms  "
+            f"speedup={sk / flat:5.1f}x  flat rows/s={n / flat:12.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
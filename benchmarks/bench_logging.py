@@ -0,0 +1,96 @@
+# Logging overhead per request: the log calls one /predict makes, timed on the
+# calling thread, for logging off / synchronous text / synchronous JSON /
+# queue-based JSON (with and without DEBUG sampling). "drain" is the extra
+# wall time the queue listener needed after the last call. With --e2e it also
+# times POST /predict through the ASGI app for each configuration.
+import argparse
+import logging
+import os
+import time
+
+from app.logging_setup import configure_logging, shutdown_logging
+from benchmarks.common import format_us, percentiles, sample_payloads
+
+CONFIGS = {
+    "off": dict(level="WARNING", fmt="json", async_=False, sample=""),
+    "sync-text": dict(level="INFO", fmt="text", async_=False, sample=""),
+    "sync-json": dict(level="INFO", fmt="json", async_=False, sample=""),
+    "queue-json": dict(level="INFO", fmt="json", async_=True, sample=""),
+    "queue-json-debug-sampled": dict(level="DEBUG", fmt="json", async_=True, sample="app.db=0.01,app.api=0.01"),
+}
+
+api = logging.getLogger("app.api")
+db = logging.getLogger("app.db")
+
+
+# Mirrors the events of one /predict request with the call sites' guards
+def _request_logs(i: int) -> None:
+    if api.isEnabledFor(logging.INFO):
+        api.info("request_start", extra={"id": f"{i:012x}", "method": "POST", "path": "/predict"})
+    db.debug("db_session_open")
+    db.debug("db_engine_connect")
+    if db.isEnabledFor(logging.INFO):
+        db.info("db_insert_prediction_start", extra={"user_id": 1})
+    if db.isEnabledFor(logging.INFO):
+        db.info("db_insert_prediction_done", extra={"prediction_id": i})
+    db.debug("db_session_close")
+    if api.isEnabledFor(logging.INFO):
+        api.info("request_end", extra={"id": f"{i:012x}", "status": 200})
+
+
+def _micro(n: int, sink) -> None:
+    for name, cfg in CONFIGS.items():
+        configure_logging(stream=sink, **cfg)
+        samples = []
+        t_start = time.perf_counter()
+        for i in range(n):
+            t0 = time.perf_counter()
+            _request_logs(i)
+            samples.append(time.perf_counter() - t0)
+        t_calls = time.perf_counter()
+        shutdown_logging()
+        drain = time.perf_counter() - t_calls
+        print(f"{name:26s} {format_us(percentiles(samples))}  calls={t_calls - t_start:6.3f}s drain={drain:6.3f}s")
+
+
+def _e2e(n: int, sink) -> None:
+    os.environ.setdefault("JWT_SECRET", "bench-logging-secret")
+    # each configuration below installs its own handler
+    os.environ["LOG_CONFIGURE"] = "off"
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+
+    payloads = sample_payloads(n)
+    with TestClient(app) as client:
+        client.post("/users", json={"email": "bench-logging@example.com", "password": "StrongPass123"})
+        token = client.post(
+            "/login", json={"email": "bench-logging@example.com", "password": "StrongPass123"}
+        ).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        while client.get("/ready").status_code != 200:
+            time.sleep(0.05)
+        for name, cfg in CONFIGS.items():
+            configure_logging(stream=sink, **cfg)
+            samples = []
+            for p in payloads:
+                t0 = time.perf_counter()
+                client.post("/predict", headers=headers, json=p)
+                samples.append(time.perf_counter() - t0)
+            shutdown_logging()
+            print(f"e2e {name:22s} {format_us(percentiles(samples))}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Logging overhead per request for each logging configuration.")
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--e2e", type=int, default=0, help="POST /predict calls per config (needs DATABASE_URL)")
+    args = parser.parse_args()
+    with open(os.devnull, "w") as sink:
+        _micro(args.requests, sink)
+        if args.e2e:
+            _e2e(args.e2e, sink)
+
+
+if __name__ == "__main__":
+    main()
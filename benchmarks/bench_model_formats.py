@@ -0,0 +1,76 @@
+# Per-worker load time and memory for the compressed vs mmap model formats.
+# Starts N worker processes per format, keeps them alive together and reads
+# RSS and PSS (proportional share, Linux only) so page-cache sharing shows up.
+import argparse
+import multiprocessing as mp
+import os
+import time
+from pathlib import Path
+
+import joblib
+import pandas as pd
+
+from app.model_runtime import MODEL_MMAP_PATH, MODEL_PATH, model_artifact
+from benchmarks.common import sample_payloads
+
+
+def _memory_kb() -> dict:
+    out = {}
+    for fname, keys in (("status", ("VmRSS",)), ("smaps_rollup", ("Pss",))):
+        try:
+            for line in Path(f"/proc/self/{fname}").read_text().splitlines():
+                key = line.split(":", 1)[0]
+                if key in keys:
+                    out[key] = int(line.split()[1])
+        except OSError:
+            pass
+    return out
+
+
+def _worker(fmt: str, barrier, results) -> None:
+    import sklearn.ensemble  # noqa: F401 - keep import cost out of the load timing
+
+    path, mmap_mode = model_artifact(fmt)
+    t0 = time.perf_counter()
+    model = joblib.load(path, mmap_mode=mmap_mode)
+    load_s = time.perf_counter() - t0
+    # touch every tree once, like serving traffic would
+    X = pd.get_dummies(pd.DataFrame(sample_payloads(64)))
+    model.predict(X.reindex(columns=model.feature_names_in_, fill_value=0))
+    barrier.wait()
+    results.put({"pid": os.getpid(), "load_s": load_s, **_memory_kb()})
+    barrier.wait()
+
+
+def _run(fmt: str, workers: int) -> None:
+    ctx = mp.get_context("spawn")
+    barrier = ctx.Barrier(workers)
+    results = ctx.Queue()
+    procs = [ctx.Process(target=_worker, args=(fmt, barrier, results)) for _ in range(workers)]
+    for p in procs:
+        p.start()
+    rows = [results.get() for _ in procs]
+    for p in procs:
+        p.join()
+    for r in rows:
+        print(
+            f"{fmt:10s} pid={r['pid']:<7d} load={r['load_s'] * 1e3:8.1f}ms "
+            f"rss={r.get('VmRSS', 0) / 1024:7.1f}MiB pss={r.get('Pss', 0) / 1024:7.1f}MiB"
+        )
+    total_pss = sum(r.get("Pss", 0) for r in rows) / 1024
+    print(f"{fmt:10s} total pss across {workers} workers: {total_pss:.1f}MiB")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Per-worker load time and memory for the compressed vs mmap model formats.")
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    if not MODEL_MMAP_PATH.exists():
+        joblib.dump(joblib.load(MODEL_PATH), MODEL_MMAP_PATH, compress=0)
+    for fmt in ("compressed", "mmap"):
+        _run(fmt, args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# Page-N latency of /predictions history: OFFSET/LIMIT vs keyset (after=).
+# Seeds one user with --rows predictions (default 1M) into DATABASE_URL
+# (sqlite:///bench.db works), then times fetching page N both ways.
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from app.crud import create_user, get_user_by_email, insert_prediction_rows, list_user_predictions
+from app.db import SessionLocal, init_db
+from app.models import Prediction
+from benchmarks.common import percentiles
+
+EMAIL = "bench-pagination@example.com"
+
+
+def _seed(db, rows: int, chunk: int = 20000) -> int:
+    user = get_user_by_email(db, EMAIL) or create_user(db, EMAIL, "StrongPass123")
+    have = db.query(Prediction).filter(Prediction.user_id == user.id).count()
+    rng = random.Random(0)
+    start = datetime(2024, 1, 1)
+    payload = {"longitude": -122.0, "latitude": 37.0, "ocean_proximity": "NEAR BAY"}
+    for base in range(have, rows, chunk):
+        n = min(chunk, rows - base)
+        insert_prediction_rows(
+            db,
+            [
+                {
+                    "user_id": user.id,
+                    "payload": payload,
+                    "predicted_value": rng.uniform(5e4, 5e5),
+                    # about one prediction a minute, with duplicate timestamps
+                    "created_at": start + timedelta(minutes=(base + i) // 2),
+                }
+                for i in range(n)
+            ],
+        )
+    print(f"seeded {rows} predictions")
+    return user.id
+
+
+def _time(fn, repeat: int):
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return percentiles(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Page-N latency of /predictions history: OFFSET/LIMIT vs keyset.")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 10, 100, 1000, 9000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    init_db()
+    db = SessionLocal()
+    try:
+        user_id = _seed(db, args.rows)
+        for page in args.pages:
+            offset = (page - 1) * args.limit
+            if offset >= args.rows:
+                continue
+            # the cursor a client would hold after reading page-1 (setup, untimed)
+            after = None
+            if offset:
+                prev = list_user_predictions(db, user_id, offset=offset - 1, limit=1)[0]
+                after = (prev.created_at, prev.id)
+            off = _time(
+                lambda: list_user_predictions(db, user_id, offset=offset, limit=args.limit), args.repeat
+            )
+            key = _time(
+                lambda: list_user_predictions(db, user_id, limit=args.limit, after=after), args.repeat
+            )
+            print(
+                f"page {page:6d}  offset p50={off['p50'] * 1e3:9.2f}ms  "
+                f"keyset p50={key['p50'] * 1e3:9.2f}ms"
+            )
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
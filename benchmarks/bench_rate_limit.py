@@ -0,0 +1,56 @@
+# hit() throughput and memory per key with many distinct keys, for each
+# limiter algorithm and store. Limits are set high so every hit is allowed.
+import argparse
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from app.rate_limit import (
+    FixedWindowLimiter,
+    SlidingWindowCounterLimiter,
+    SQLiteLimiterStore,
+    TokenBucketLimiter,
+)
+
+
+def _bench(name: str, limiter, keys, hits: int) -> None:
+    rng = random.Random(0)
+    order = [keys[rng.randrange(len(keys))] for _ in range(hits)]
+    tracemalloc.start()
+    for k in keys:  # populate every key once
+        limiter.hit(k)
+    mem, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    t0 = time.perf_counter()
+    for k in order:
+        limiter.hit(k)
+    elapsed = time.perf_counter() - t0
+    print(
+        f"{name:28s} {hits / elapsed:12.0f} hits/s  {elapsed / hits * 1e6:7.2f}us/hit  "
+        f"~{mem / len(keys):6.0f} B/key (python heap)"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Rate limiter hit() throughput and memory per key.")
+    parser.add_argument("--keys", type=int, default=100_000)
+    parser.add_argument("--hits", type=int, default=500_000)
+    parser.add_argument("--sqlite-hits", type=int, default=20_000)
+    parser.add_argument("--max-requests", type=int, default=1000)
+    args = parser.parse_args()
+
+    keys = [f"user:{i}" for i in range(args.keys)]
+    limit, window = args.max_requests, 60
+    _bench("fixed (sliding log)", FixedWindowLimiter(limit, window), keys, args.hits)
+    _bench("token_bucket/memory", TokenBucketLimiter(limit, window), keys, args.hits)
+    _bench("sliding_window/memory", SlidingWindowCounterLimiter(limit, window), keys, args.hits)
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SQLiteLimiterStore(os.path.join(tmp, "rl.sqlite3"))
+        sqlite_keys = keys[: min(len(keys), args.sqlite_hits)]
+        _bench("token_bucket/sqlite", TokenBucketLimiter(limit, window, store), sqlite_keys, args.sqlite_hits)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+# Cold-start cost of resolving the feature schema: persisted artifact vs
+# re-reading and one-hot encoding housing.csv, plus full ModelRuntime build.
+import argparse
+import time
+
+from app.feature_schema import load_schema, schema_from_csv
+from app.model_runtime import DATA_PATH, SCHEMA_PATH, ModelRuntime
+from benchmarks.common import percentiles
+
+
+def _measure(fn, repeat: int):
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return percentiles(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Cold-start cost of the feature schema artifact vs re-reading housing.csv.")
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    cases = {
+        "schema/artifact": lambda: load_schema(SCHEMA_PATH),
+        "schema/csv": lambda: schema_from_csv(DATA_PATH),
+        "runtime/total": ModelRuntime,
+    }
+    for name, fn in cases.items():
+        stats = _measure(fn, args.repeat)
+        print(f"{name:16s} " + "  ".join(f"{k}={v * 1e3:8.2f}ms" for k, v in stats.items()))
+
+
+if __name__ == "__main__":
+    main()
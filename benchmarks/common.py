@@ -0,0 +1,41 @@
+# Shared helpers for the benchmark scripts in this directory.
+# Run any benchmark from the repo root, e.g. `python -m benchmarks.bench_features`.
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Sequence
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+DATA_PATH = ROOT / "housing.csv"
+
+
+# Turn rows of housing.csv into PredictionInput-shaped dicts
+def sample_payloads(n: int, seed: int = 0) -> List[dict]:
+    df = pd.read_csv(DATA_PATH).dropna().drop(columns=["median_house_value"])
+    df = df.sample(n=n, replace=n > len(df), random_state=seed)
+    return df.to_dict(orient="records")
+
+
+# Time fn(arg) once per argument and return per-call latencies in seconds
+def time_calls(fn: Callable, args: Sequence) -> np.ndarray:
+    out = np.empty(len(args), dtype=np.float64)
+    for i, arg in enumerate(args):
+        t0 = time.perf_counter()
+        fn(arg)
+        out[i] = time.perf_counter() - t0
+    return out
+
+
+def percentiles(samples: Sequence[float]) -> Dict[str, float]:
+    a = np.asarray(samples, dtype=np.float64)
+    return {
+        "p50": float(np.percentile(a, 50)),
+        "p99": float(np.percentile(a, 99)),
+        "mean": float(a.mean()),
+    }
+
+
+def format_us(stats: Dict[str, float]) -> str:
+    return "  ".join(f"{k}={v * 1e6:9.1f}us" for k, v in stats.items())
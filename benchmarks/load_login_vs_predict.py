@@ -0,0 +1,80 @@
+# Login burst vs /predict latency, in-process against the ASGI app.
+# A steady /predict probe runs alone, then alongside N concurrent login
+# loops; prints predict p50/p99 and login throughput for each phase.
+# Needs DATABASE_URL (sqlite:///... works) and model.joblib.
+import argparse
+import asyncio
+import os
+import time
+
+os.environ.setdefault("JWT_SECRETS", "benchmark-secret-benchmark-secret")
+os.environ.setdefault("RATE_LIMIT_MAX", "100000000")
+
+import httpx  # noqa: E402
+
+from app.db import init_db  # noqa: E402
+from app.main import app, hashing_executor  # noqa: E402
+from app.model_runtime import model_loader  # noqa: E402
+from benchmarks.common import format_us, percentiles, sample_payloads  # noqa: E402
+
+CREDS = {"email": "bench-login@example.com", "password": "StrongPass123"}
+
+
+async def _predict_probe(client, headers, payloads, stop: asyncio.Event, out: list) -> None:
+    i = 0
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        r = await client.post("/predict", headers=headers, json=payloads[i % len(payloads)])
+        r.raise_for_status()
+        out.append(time.perf_counter() - t0)
+        i += 1
+
+
+async def _login_loop(client, stop: asyncio.Event, counter: list) -> None:
+    while not stop.is_set():
+        r = await client.post("/login", json=CREDS)
+        counter.append(r.status_code)
+        if r.status_code == 503:
+            await asyncio.sleep(0.05)  # back off like a well-behaved client
+
+
+async def _phase(client, headers, payloads, logins: int, seconds: float) -> None:
+    stop = asyncio.Event()
+    latencies: list = []
+    statuses: list = []
+    tasks = [asyncio.ensure_future(_predict_probe(client, headers, payloads, stop, latencies))]
+    tasks += [asyncio.ensure_future(_login_loop(client, stop, statuses)) for _ in range(logins)]
+    await asyncio.sleep(seconds)
+    stop.set()
+    await asyncio.gather(*tasks)
+    ok = sum(1 for s in statuses if s == 200)
+    busy = sum(1 for s in statuses if s == 503)
+    print(
+        f"logins={logins:3d}  predict {format_us(percentiles(latencies))}  "
+        f"login {ok / seconds:7.1f}/s ok, {busy / seconds:7.1f}/s shed"
+    )
+
+
+async def _main(args) -> None:
+    init_db()
+    model_loader.load()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await client.post("/users", json=CREDS)
+        token = (await client.post("/login", json=CREDS)).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        payloads = sample_payloads(256)
+        for logins in args.logins:
+            await _phase(client, headers, payloads, logins, args.seconds)
+    print("hashing stats:", hashing_executor.stats())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Login burst vs /predict latency against the ASGI app.")
+    parser.add_argument("--logins", type=int, nargs="+", default=[0, 8, 32, 128])
+    parser.add_argument("--seconds", type=float, default=5.0)
+    asyncio.run(_main(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
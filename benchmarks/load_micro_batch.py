@@ -0,0 +1,70 @@
+# Closed-loop load test of /predict's scoring path with the micro-batcher on
+# and off. C concurrent clients each send requests back to back; prints
+# throughput and latency percentiles per concurrency level.
+import argparse
+import asyncio
+import time
+
+from app.inference_pool import InferenceExecutor
+from app.micro_batcher import MicroBatcher
+from app.model_runtime import model_loader
+from benchmarks.common import format_us, percentiles, sample_payloads
+
+
+def _score_one(body: dict) -> float:
+    rt = model_loader.get()
+    return rt.predict(rt.prepare_features(body))
+
+
+def _score_many(bodies):
+    rt = model_loader.get()
+    return rt.predict_batch(rt.prepare_batch(bodies))
+
+
+async def _run_level(concurrency: int, requests: int, payloads, batcher, executor):
+    latencies = []
+
+    async def client(worker: int) -> None:
+        for i in range(worker, requests, concurrency):
+            body = payloads[i % len(payloads)]
+            t0 = time.perf_counter()
+            if batcher is not None:
+                await batcher.submit(body)
+            else:
+                await executor.run(_score_one, body)
+            latencies.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(client(w) for w in range(concurrency)))
+    return requests / (time.perf_counter() - t0), latencies
+
+
+async def _main(args) -> None:
+    model_loader.load()
+    payloads = sample_payloads(1024)
+    executor = InferenceExecutor("thread", args.workers)
+    batcher = MicroBatcher(
+        lambda bodies: executor.run(_score_many, bodies),
+        max_batch_size=args.max_batch,
+        max_wait=args.max_wait_ms / 1000.0,
+    )
+    for mode, b in (("off", None), ("on", batcher)):
+        for c in args.concurrency:
+            rps, lat = await _run_level(c, args.requests, payloads, b, executor)
+            print(f"batcher={mode:3s} clients={c:4d} {rps:9.1f} req/s  {format_us(percentiles(lat))}")
+    print("batcher stats:", batcher.stats())
+    executor.shutdown()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Closed-loop /predict load test with the micro-batcher on and off.")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 128, 256])
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--max-wait-ms", type=float, default=2.0)
+    asyncio.run(_main(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
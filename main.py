@@ -1,4 +1,23 @@
 import sys
+import argparse
+import io
+import itertools
+import multiprocessing
+import random
+import json
+import os
+import resource
+import shutil
+import tempfile
+import time
+import tracemalloc
+import warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
 import pandas as pd
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestRegressor
@@ -6,12 +25,24 @@ from sklearn.metrics import mean_absolute_error
 import joblib
 import logging
 
+from app.feature_schema import TARGET_COLUMN, build_schema, file_sha256, load_schema, save_schema, schema_from_csv
+from app.forest_engine import FlatForest, flat_dir
+
 logging.basicConfig(stream=sys.stdout, level=logging.DEBUG)
 
 TRAIN_DATA = 'housing.csv'
 MODEL_NAME = 'model.joblib'
+MODEL_MMAP_NAME = 'model.mmap.joblib'
+SCHEMA_NAME = 'model.schema.json'
 RANDOM_STATE=100
 
+# Cleaned + encoded datasets, one directory per CSV hash
+CACHE_DIR = Path('.cache/datasets')
+# Versioned training outputs: models/<version>/{model.joblib, model.schema.json, metrics.json}
+MODELS_DIR = Path('models')
+# Bump when the cleaning/encoding below changes, so cached datasets are rebuilt
+DATASET_FORMAT = 1
+
 def prepare_data(input_data_path):
     df=pd.read_csv(input_data_path)
     df=df.dropna() 
@@ -26,11 +57,13 @@ def prepare_data(input_data_path):
 
     return (X_train, X_test, y_train, y_test)
 
-def train(X_train, y_train):
-    # what columns are expected by the model
-    X_train.columns
-
-    regr = RandomForestRegressor(max_depth=12)
+def train(X_train, y_train, n_jobs=None, n_estimators=100, max_depth=12, random_state=RANDOM_STATE,
+          max_features=1.0):
+    # n_jobs=-1 grows the trees on all cores; random_state keeps runs reproducible
+    regr = RandomForestRegressor(
+        n_estimators=n_estimators, max_depth=max_depth, n_jobs=n_jobs, random_state=random_state,
+        max_features=max_features,
+    )
     regr.fit(X_train,y_train)
 
     return regr
@@ -43,11 +76,343 @@ def save_model(model, filename):
     with open(filename, 'wb'):
         joblib.dump(model, filename, compress=3)
 
+# Uncompressed export; the API can load it with mmap_mode='r' (MODEL_FORMAT=mmap)
+# so workers read the arrays from the shared page cache instead of decompressing.
+# The flattened engine arrays (INFERENCE_ENGINE=flat) are saved next to it for the same reason
+def save_model_mmap(model, filename):
+    joblib.dump(model, filename, compress=0)
+    FlatForest.from_sklearn(model).save(flat_dir(filename), source=file_sha256(Path(filename)))
+
 def load_model(filename):
     model = joblib.load(filename)
     return model
 
+# Same cleaning/encoding as prepare_data, as float64 arrays plus the feature schema
+def encode_dataset(input_data_path):
+    raw = pd.read_csv(input_data_path).dropna()
+    features = pd.get_dummies(raw).drop([TARGET_COLUMN], axis=1)
+    X = features.to_numpy(dtype=np.float64)
+    y = raw[TARGET_COLUMN].to_numpy(dtype=np.float64)
+    return X, y, build_schema(raw, features, Path(input_data_path))
+
+# Feature-named view of encoded rows (no copy): models fitted on it keep
+# feature_names_in_, and sklearn checks the column order at predict time
+def as_frame(X, schema):
+    return pd.DataFrame(X, columns=schema['columns'], copy=False)
+
+# Encoded dataset from the .npy cache keyed on the CSV hash, building it on a miss.
+# Cached arrays are memory-mapped; returns (X, y, schema, cache_hit)
+def load_dataset(input_data_path, cache_dir=CACHE_DIR, use_cache=True):
+    entry = Path(cache_dir) / f'{file_sha256(Path(input_data_path))[:16]}-v{DATASET_FORMAT}'
+    if use_cache and (entry / 'schema.json').exists():
+        schema = load_schema(entry / 'schema.json')
+        if schema is not None:
+            X = np.load(entry / 'X.npy', mmap_mode='r')
+            y = np.load(entry / 'y.npy', mmap_mode='r')
+            return X, y, schema, True
+
+    X, y, schema = encode_dataset(input_data_path)
+    if use_cache:
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        tmp = Path(tempfile.mkdtemp(dir=entry.parent))
+        np.save(tmp / 'X.npy', X)
+        np.save(tmp / 'y.npy', y)
+        save_schema(schema, tmp / 'schema.json')
+        try:
+            tmp.rename(entry)
+        except OSError:
+            # another run cached it first
+            shutil.rmtree(tmp, ignore_errors=True)
+    return X, y, schema, False
+
+# Wall time and peak traced memory of one pipeline stage, appended to `report`
+@contextmanager
+def stage(name, report):
+    tracemalloc.reset_peak()
+    t0 = time.perf_counter()
+    entry = {'stage': name}
+    yield entry
+    entry['wall_seconds'] = round(time.perf_counter() - t0, 3)
+    entry['peak_mib'] = round(tracemalloc.get_traced_memory()[1] / 2**20, 1)
+    report.append(entry)
+    logging.info(f"{name}: {entry}")
+
+# models/<UTC timestamp>-<model sha12>/ written via a temp dir and rename
+def write_artifact(model, schema, metrics, out_dir=MODELS_DIR):
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    tmp = Path(tempfile.mkdtemp(dir=out_dir, prefix='.tmp-'))
+    save_model(model, tmp / MODEL_NAME)
+    save_model_mmap(model, tmp / MODEL_MMAP_NAME)
+    model_sha = file_sha256(tmp / MODEL_NAME)
+    version = f"{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')}-{model_sha[:12]}"
+    schema = dict(schema, model_version=version, model_sha256=model_sha)
+    save_schema(schema, tmp / SCHEMA_NAME)
+    (tmp / 'metrics.json').write_text(json.dumps(dict(metrics, version=version), indent=2))
+    target = out_dir / version
+    tmp.rename(target)
+    return target
+
+# Copy an artifact's model files and schema to where the API loads them from, and
+# point the registry's CURRENT at it so running workers hot-swap to it
+def promote(artifact_dir):
+    artifact_dir = Path(artifact_dir)
+    for name in (MODEL_NAME, MODEL_MMAP_NAME, SCHEMA_NAME):
+        tmp = Path(f'{name}.tmp')
+        shutil.copyfile(artifact_dir / name, tmp)
+        os.replace(tmp, name)
+    # the engine arrays record which model file they belong to, so a worker
+    # starting between these copies flattens the forest itself instead
+    flat_src, flat_dst = flat_dir(artifact_dir / MODEL_MMAP_NAME), flat_dir(Path(MODEL_MMAP_NAME))
+    if flat_src.is_dir():
+        tmp = Path(f'{flat_dst}.tmp')
+        shutil.rmtree(tmp, ignore_errors=True)
+        shutil.copytree(flat_src, tmp)
+        shutil.rmtree(flat_dst, ignore_errors=True)
+        tmp.rename(flat_dst)
+    tmp = artifact_dir.parent / '.CURRENT.tmp'
+    tmp.write_text(artifact_dir.name + '\n')
+    os.replace(tmp, artifact_dir.parent / 'CURRENT')
+
+def run_training(args):
+    tracemalloc.start()
+    report = []
+    with stage('load_dataset', report) as st:
+        X, y, schema, hit = load_dataset(args.data, use_cache=not args.no_cache)
+        st.update(cache_hit=hit, rows=int(len(y)), features=int(X.shape[1]))
+    with stage('split', report):
+        idx_train, idx_test = train_test_split(
+            np.arange(len(y)), test_size=0.2, random_state=RANDOM_STATE
+        )
+        X_train, X_test = as_frame(X[idx_train], schema), as_frame(X[idx_test], schema)
+        y_train, y_test = y[idx_train], y[idx_test]
+    with stage('fit', report) as st:
+        model = train(
+            X_train, y_train, n_jobs=args.n_jobs, n_estimators=args.n_estimators, max_depth=args.max_depth
+        )
+        st.update(n_jobs=args.n_jobs)
+    with stage('evaluate', report) as st:
+        st['train_mae'] = round(float(mean_absolute_error(y_train, model.predict(X_train))), 2)
+        st['test_mae'] = round(float(mean_absolute_error(y_test, model.predict(X_test))), 2)
+    metrics = {
+        'params': {'n_estimators': args.n_estimators, 'max_depth': args.max_depth,
+                   'random_state': RANDOM_STATE, 'n_jobs': args.n_jobs},
+        'dataset_sha256': schema['training_hash'],
+        'stages': report,
+    }
+    with stage('write_artifact', report):
+        target = write_artifact(model, schema, metrics, args.out_dir)
+    tracemalloc.stop()
+
+    # ru_maxrss is KiB on Linux
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{'stage':16s} {'wall s':>8s} {'peak MiB':>9s}  details")
+    for entry in report:
+        details = {k: v for k, v in entry.items() if k not in ('stage', 'wall_seconds', 'peak_mib')}
+        print(f"{entry['stage']:16s} {entry['wall_seconds']:8.3f} {entry['peak_mib']:9.1f}  {details or ''}")
+    print(f'peak RSS {peak_rss:.0f} MiB; artifact {target}')
+    if args.promote:
+        promote(target)
+        print(f'promoted {target.name} (CURRENT, {MODEL_NAME} / {SCHEMA_NAME})')
+    return target
+
+# --- Hyperparameter search ---------------------------------------------------
+# Each config grows its forest in rungs (warm_start adds trees) and is scored on
+# a validation split carved from the training split after every rung. A config
+# whose rung MAE is worse than the best seen at that rung by more than
+# --prune-margin stops early (asynchronous successive halving). Survivors are
+# timed afterwards, one at a time, so latencies are not skewed by training load.
+
+_search_data = {}
+
+def _parse_max_features(value):
+    if value in ('sqrt', 'log2'):
+        return value
+    return float(value) if '.' in value else int(value)
+
+def _search_init(data_path, rung_best, rung_lock):
+    X, y, schema, _ = load_dataset(data_path)
+    idx_train, _ = train_test_split(np.arange(len(y)), test_size=0.2, random_state=RANDOM_STATE)
+    idx_fit, idx_val = train_test_split(idx_train, test_size=0.2, random_state=RANDOM_STATE)
+    _search_data.update(
+        X_fit=as_frame(X[idx_fit], schema), y_fit=y[idx_fit], X_val=as_frame(X[idx_val], schema), y_val=y[idx_val],
+        rung_best=rung_best, rung_lock=rung_lock,
+    )
+
+def _rungs(n_estimators, first):
+    sizes = []
+    n = min(first, n_estimators)
+    while n < n_estimators:
+        sizes.append(n)
+        n *= 2
+    return sizes + [n_estimators]
+
+def _search_trial(config, first_rung, prune_margin, model_dir):
+    d = _search_data
+    model = RandomForestRegressor(
+        max_depth=config['max_depth'], max_features=config['max_features'],
+        n_estimators=0, warm_start=True, random_state=RANDOM_STATE,
+    )
+    t0 = time.perf_counter()
+    history = []
+    for n in _rungs(config['n_estimators'], first_rung):
+        model.set_params(n_estimators=n)
+        model.fit(d['X_fit'], d['y_fit'])
+        mae = float(mean_absolute_error(d['y_val'], model.predict(d['X_val'])))
+        history.append((n, round(mae, 2)))
+        with d['rung_lock']:
+            best = d['rung_best'].get(n)
+            if best is None or mae < best:
+                d['rung_best'][n] = mae
+        if best is not None and mae > best * (1 + prune_margin) and n < config['n_estimators']:
+            return dict(config, status='pruned', val_mae=round(mae, 2), trees_fitted=n,
+                        fit_seconds=round(time.perf_counter() - t0, 3), history=history)
+    path = Path(model_dir) / f"{config['id']}.joblib"
+    joblib.dump(model, path, compress=0)
+    return dict(config, status='done', val_mae=round(mae, 2), trees_fitted=config['n_estimators'],
+                fit_seconds=round(time.perf_counter() - t0, 3), history=history, path=str(path))
+
+def search_configs(args):
+    grid = [
+        {'max_depth': d, 'n_estimators': n, 'max_features': f}
+        for d, n, f in itertools.product(args.max_depths, args.n_estimators_grid, args.max_features)
+    ]
+    if args.random:
+        grid = random.Random(args.seed).sample(grid, min(args.random, len(grid)))
+    return [dict(c, id=f"d{c['max_depth']}-n{c['n_estimators']}-f{c['max_features']}") for c in grid]
+
+# Latencies are timed on plain arrays, as the API's ModelRuntime calls the model
+def _measure(result, X_test, y_test, repeat):
+    model = joblib.load(result['path'])
+    row = X_test.to_numpy()[:1]
+    batch = X_test.to_numpy()[:1024]
+    with warnings.catch_warnings():
+        warnings.filterwarnings('ignore', message='X does not have valid feature names')
+        model.predict(row)
+        single = []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            model.predict(row)
+            single.append(time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        model.predict(batch)
+        batch_seconds = time.perf_counter() - t0
+    buf = io.BytesIO()
+    joblib.dump(model, buf, compress=3)
+    result.update(
+        test_mae=round(float(mean_absolute_error(y_test, model.predict(X_test))), 2),
+        single_row_ms=round(float(np.median(single)) * 1e3, 3),
+        batch_1024_ms=round(batch_seconds * 1e3, 3),
+        size_mib=round(len(buf.getvalue()) / 2**20, 2),
+        nodes=int(sum(e.tree_.node_count for e in model.estimators_)),
+    )
+    return model
+
+# Configs no other config beats on all of (val MAE, single-row latency, size)
+def pareto_front(results):
+    keys = ('val_mae', 'single_row_ms', 'size_mib')
+    front = []
+    for r in results:
+        dominated = any(
+            all(o[k] <= r[k] for k in keys) and any(o[k] < r[k] for k in keys)
+            for o in results if o is not r
+        )
+        if not dominated:
+            front.append(r)
+    return front
+
+def run_search(args):
+    configs = search_configs(args)
+    X, y, schema, _ = load_dataset(args.data)
+    logging.info(f'searching {len(configs)} configs on {args.workers} processes')
+    manager = multiprocessing.Manager()
+    rung_best, rung_lock = manager.dict(), manager.Lock()
+    with tempfile.TemporaryDirectory() as model_dir:
+        results = []
+        with ProcessPoolExecutor(
+            max_workers=args.workers, initializer=_search_init, initargs=(args.data, rung_best, rung_lock)
+        ) as pool:
+            # biggest configs first, so cheap ones fill the tail
+            order = sorted(configs, key=lambda c: (-c['n_estimators'], -c['max_depth']))
+            futures = [pool.submit(_search_trial, c, args.first_rung, args.prune_margin, model_dir) for c in order]
+            for fut in as_completed(futures):
+                r = fut.result()
+                logging.info(f"{r['id']}: {r['status']} val_mae={r['val_mae']} after {r['trees_fitted']} trees")
+                results.append(r)
+
+        idx_train, idx_test = train_test_split(np.arange(len(y)), test_size=0.2, random_state=RANDOM_STATE)
+        X_test, y_test = as_frame(X[idx_test], schema), y[idx_test]
+        done = [r for r in results if r['status'] == 'done']
+        for r in done:
+            _measure(r, X_test, y_test, args.latency_repeat)
+        front = pareto_front(done)
+        for r in done:
+            r['pareto'] = r in front
+
+        print(f"{'config':24s} {'val MAE':>9s} {'test MAE':>9s} {'1-row ms':>9s} {'1024 ms':>9s} {'MiB':>7s}  pareto")
+        for r in sorted(done, key=lambda r: r['val_mae']):
+            print(f"{r['id']:24s} {r['val_mae']:9.0f} {r['test_mae']:9.0f} {r['single_row_ms']:9.3f} "
+                  f"{r['batch_1024_ms']:9.2f} {r['size_mib']:7.2f}  {'*' if r['pareto'] else ''}")
+        pruned = [r for r in results if r['status'] == 'pruned']
+        print(f'{len(pruned)} of {len(results)} configs pruned early')
+
+        # most accurate Pareto config within the latency budget
+        eligible = [r for r in front if args.max_latency_ms is None or r['single_row_ms'] <= args.max_latency_ms]
+        chosen = min(eligible, key=lambda r: r['val_mae']) if eligible else None
+
+        out_dir = Path(args.out_dir)
+        out_dir.mkdir(parents=True, exist_ok=True)
+        report_path = out_dir / f"search-{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')}.json"
+        report = [{k: v for k, v in r.items() if k != 'path'} for r in results]
+        report_path.write_text(json.dumps({'configs': report, 'chosen': chosen and chosen['id']}, indent=2))
+        print(f'report {report_path}')
+        if chosen and args.write_best:
+            model = joblib.load(chosen['path'])
+            metrics = {'params': {k: chosen[k] for k in ('max_depth', 'n_estimators', 'max_features')},
+                       'dataset_sha256': schema['training_hash'],
+                       'search': {k: v for k, v in chosen.items() if k != 'path'}}
+            print(f"chosen {chosen['id']}: artifact {write_artifact(model, schema, metrics, out_dir)}")
+    return results
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description='Housing price model: evaluate or retrain')
+    parser.add_argument('--export-mmap', action='store_true', help='also write the uncompressed mmap export')
+    sub = parser.add_subparsers(dest='command')
+    tr = sub.add_parser('train', help='fit a new model and write a versioned artifact')
+    tr.add_argument('--data', default=TRAIN_DATA)
+    tr.add_argument('--n-jobs', type=int, default=-1, help='cores used to grow trees (-1 = all)')
+    tr.add_argument('--n-estimators', type=int, default=100)
+    tr.add_argument('--max-depth', type=int, default=12)
+    tr.add_argument('--out-dir', default=str(MODELS_DIR))
+    tr.add_argument('--no-cache', action='store_true', help='re-encode housing.csv instead of using the cache')
+    tr.add_argument('--promote', action='store_true', help=f'copy the result to {MODEL_NAME} / {SCHEMA_NAME}')
+    se = sub.add_parser('search', help='parallel hyperparameter search with early pruning')
+    se.add_argument('--data', default=TRAIN_DATA)
+    se.add_argument('--max-depths', type=int, nargs='+', default=[8, 12, 16, 20])
+    se.add_argument('--n-estimators-grid', type=int, nargs='+', default=[25, 50, 100])
+    se.add_argument('--max-features', type=_parse_max_features, nargs='+', default=[1.0, 0.5, 'sqrt'])
+    se.add_argument('--random', type=int, default=0, help='sample this many configs instead of the full grid')
+    se.add_argument('--seed', type=int, default=RANDOM_STATE)
+    se.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    se.add_argument('--first-rung', type=int, default=8, help='trees fitted before the first pruning check')
+    se.add_argument('--prune-margin', type=float, default=0.05, help='prune when MAE > best at the rung by this fraction')
+    se.add_argument('--latency-repeat', type=int, default=50)
+    se.add_argument('--max-latency-ms', type=float, default=None, help='single-row latency budget for --write-best')
+    se.add_argument('--write-best', action='store_true', help='write the chosen config as a versioned artifact')
+    se.add_argument('--out-dir', default=str(MODELS_DIR))
+    return parser.parse_args(argv)
+
 if __name__ == '__main__':
+    args = parse_args(sys.argv[1:])
+    if args.command == 'train':
+        logging.getLogger().setLevel(logging.INFO)
+        run_training(args)
+        sys.exit(0)
+    if args.command == 'search':
+        logging.getLogger().setLevel(logging.INFO)
+        run_search(args)
+        sys.exit(0)
+
     logging.info('Preparing the data...')
     X_train, X_test, y_train, y_test = prepare_data(TRAIN_DATA)
 
@@ -59,9 +424,17 @@ if __name__ == '__main__':
     # logging.info('Exporting the model...')
     # save_model(regr, MODEL_NAME)
 
+    # column order + category vocabulary the API loads instead of housing.csv
+    logging.info('Exporting the feature schema...')
+    save_schema(schema_from_csv(TRAIN_DATA), SCHEMA_NAME)
+
     logging.info('Loading the model...')
     model = load_model(MODEL_NAME)
 
+    if args.export_mmap:
+        logging.info('Exporting the uncompressed (mmap) model...')
+        save_model_mmap(model, MODEL_MMAP_NAME)
+
     logging.info('Calculating train dataset predictions...')
     y_pred_train = predict(X_train, model)
     logging.info('Calculating test dataset predictions...')
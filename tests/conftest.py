@@ -0,0 +1,42 @@
+import json
+
+import joblib
+import numpy as np
+import pytest
+from sklearn.dummy import DummyRegressor
+
+from app.db import SessionLocal, init_db
+from app.feature_schema import schema_from_csv
+from app.model_registry import ModelRegistry
+from app.model_runtime import DATA_PATH
+
+
+# Session on the configured database with all tables created
+@pytest.fixture()
+def db():
+    init_db()
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+def _register(reg: ModelRegistry, version: str, constant: float, schema: dict) -> None:
+    d = reg.root / version
+    d.mkdir(parents=True)
+    X = np.zeros((2, len(schema["columns"])))
+    model = DummyRegressor().fit(X, [0.0, 0.0])
+    model.constant_ = np.array([[constant]])
+    joblib.dump(model, d / "model.joblib")
+    (d / "model.schema.json").write_text(json.dumps(schema))
+
+
+# Registry with constant models: v1 (1.0, CURRENT), v2 (2.0) and broken (NaN)
+@pytest.fixture()
+def reg(tmp_path):
+    reg = ModelRegistry(tmp_path / "models")
+    schema = schema_from_csv(DATA_PATH)
+    _register(reg, "v1", 1.0, schema)
+    _register(reg, "v2", 2.0, schema)
+    _register(reg, "broken", float("nan"), schema)
+    reg.set_current("v1")
+    return reg
@@ -38,6 +38,30 @@ def test_health(client: TestClient):
     assert r.json()["status"] == "ok"
 
 
+def test_ready(client: TestClient):
+    # Model loads in the background; readiness flips to 200 once it is warm
+    deadline = time.time() + 60
+    r = client.get("/ready")
+    while r.status_code != 200 and time.time() < deadline:
+        time.sleep(0.1)
+        r = client.get("/ready")
+    assert r.status_code == 200
+    body = r.json()
+    assert body["model"]["loaded"] is True
+    assert body["model"]["load_seconds"] is not None
+    assert body["db"]["ok"] is True
+
+
+def test_stats(client: TestClient):
+    assert client.get("/stats").status_code == 401
+    token = _signup_and_login(client, "stats-reader@example.com", "StrongPass123")
+    r = client.get("/stats", headers={"Authorization": f"Bearer {token}"})
+    assert r.status_code == 200
+    inference = r.json()["inference"]
+    assert inference["workers"] >= 1
+    assert "queue_wait_mean_seconds" in inference
+
+
 def test_auth_required(client: TestClient):
     r = client.post("/predict", json={})
     assert r.status_code == 401
@@ -112,3 +136,455 @@ def test_predict_unauthorized_without_token(client):
     }
     r = client.post("/predict", json=payload)
     assert r.status_code == 401
+
+
+# Stage timings show up in Server-Timing and in the Prometheus histograms
+def test_server_timing_and_metrics(client):
+    token = _signup_and_login(client, "timing@example.com", "StrongPass123")
+    payload = {
+        "longitude": -122.23,
+        "latitude": 37.88,
+        "housing_median_age": 41.0,
+        "total_rooms": 880.0,
+        "total_bedrooms": 129.0,
+        "population": 322.0,
+        "households": 126.0,
+        "median_income": 8.3252,
+        "ocean_proximity": "NEAR BAY",
+    }
+    r = client.post("/predict", headers={"Authorization": f"Bearer {token}"}, json=payload)
+    assert r.status_code == 200
+    timing = r.headers["Server-Timing"]
+    for stage in ("auth", "rate_limit", "total"):
+        assert f"{stage};dur=" in timing
+
+    m = client.get("/metrics")
+    assert m.status_code == 200
+    assert m.headers["content-type"].startswith("text/plain")
+    assert 'http_request_duration_seconds_count{method="POST",route="/predict"}' in m.text
+    assert 'request_stage_duration_seconds_bucket{stage="inference",le="+Inf"}' in m.text
+
+
+# Requests rejected by auth never check a connection out of the pool
+def test_unauthorized_requests_do_not_touch_pool(client):
+    from app.main import prediction_writer
+
+    if prediction_writer is not None:
+        # let earlier tests' queued rows flush; those checkouts aren't ours
+        time.sleep(prediction_writer.flush_interval * 3)
+    token = _signup_and_login(client, "pool-reader@example.com", "StrongPass123")
+    headers = {"Authorization": f"Bearer {token}"}
+    before = client.get("/stats", headers=headers).json()["db_pool"]["checkouts"]
+    for _ in range(5):
+        assert client.get("/predictions").status_code == 401
+        assert client.get("/users", headers={"Authorization": "Bearer nope"}).status_code == 401
+    after = client.get("/stats", headers=headers).json()["db_pool"]
+    assert after["checkouts"] == before
+    assert {"in_use", "overflow", "checkout_wait_max_ms"} <= set(after)
+
+
+# Batch endpoint must agree with the single-record endpoint, in input order
+def test_predict_batch_matches_single(client):
+    token = _signup_and_login(client, "batch@example.com", "StrongPass123")
+    headers = {"Authorization": f"Bearer {token}"}
+    records = [
+        {
+            "longitude": -122.64,
+            "latitude": 38.01,
+            "housing_median_age": 36.0,
+            "total_rooms": 1336.0,
+            "total_bedrooms": 258.0,
+            "population": 678.0,
+            "households": 249.0,
+            "median_income": 5.5789,
+            "ocean_proximity": "NEAR OCEAN",
+        },
+        {
+            "longitude": -115.73,
+            "latitude": 33.35,
+            "housing_median_age": 23.0,
+            "total_rooms": 1586.0,
+            "total_bedrooms": 448.0,
+            "population": 338.0,
+            "households": 182.0,
+            "median_income": 1.2132,
+            "ocean_proximity": "INLAND",
+        },
+        {
+            "longitude": -117.96,
+            "latitude": 33.89,
+            "housing_median_age": 24.0,
+            "total_rooms": 1332.0,
+            "total_bedrooms": 252.0,
+            "population": 625.0,
+            "households": 230.0,
+            "median_income": 4.4375,
+            "ocean_proximity": "<1H OCEAN",
+        },
+    ]
+    r = client.post("/predict/batch", headers=headers, json={"records": records})
+    assert r.status_code == 200
+    batch = r.json()["predictions"]
+    version = r.json()["model_version"]
+    assert version
+    assert len(batch) == len(records)
+    for rec, value in zip(records, batch):
+        single = client.post("/predict", headers=headers, json=rec).json()
+        assert abs(single["prediction"] - value) < 1e-6
+        assert single["model_version"] == version
+    # the serving version is stored with every prediction
+    stored = client.get("/predictions", headers=headers, params={"limit": 6}).json()
+    assert {p["model_version"] for p in stored} == {version}
+
+
+# /grid serves the precomputed grid with an ETag clients can revalidate
+def test_grid_etag_and_not_modified(client, tmp_path, monkeypatch):
+    import app.main as main
+    from app.model_runtime import DATA_PATH, runtime
+    from app.price_grid import GridStore, build_grid, default_features, save_grid
+
+    token = _signup_and_login(client, "grid@example.com", "StrongPass123")
+    headers = {"Authorization": f"Bearer {token}"}
+    store = GridStore(tmp_path / "price_grid.npy")
+    monkeypatch.setattr(main, "grid_store", store)
+    params = {"ocean_proximity": "INLAND", "lon_min": -120, "lon_max": -119}
+    assert client.get("/grid", headers=headers, params=params).status_code == 404
+
+    values, meta = build_grid(runtime, default_features(DATA_PATH), step=0.5, bounds=(-121, 36, -119, 37))
+    save_grid(values, meta, store.path)
+    r = client.get("/grid", headers=headers, params=params)
+    assert r.status_code == 200
+    assert r.json()["model_version"] == runtime.version and r.json()["cols"] == 3
+    assert r.json()["stale"] is False
+    etag = r.headers["ETag"]
+    assert runtime.version in etag and "max-age" in r.headers["Cache-Control"]
+    r = client.get("/grid", headers={**headers, "If-None-Match": etag}, params=params)
+    assert r.status_code == 304 and not r.content
+    other = client.get("/grid", headers=headers, params={**params, "ocean_proximity": "NEAR BAY"})
+    assert other.headers["ETag"] != etag
+    bad = client.get("/grid", headers=headers, params={"ocean_proximity": "MOON"})
+    assert bad.status_code == 400
+
+    # If-None-Match lists, weak tags and "*"; a substring is not a match
+    for inm in (f'"other", W/{etag}', "*"):
+        assert client.get("/grid", headers={**headers, "If-None-Match": inm}, params=params).status_code == 304
+    assert client.get("/grid", headers={**headers, "If-None-Match": etag[:-2] + '"'}, params=params).status_code == 200
+    assert r.headers.get("X-Grid-Stale") is None
+
+    # a grid built by another model is served but flagged stale
+    save_grid(values, dict(meta, model_version="older"), store.path)
+    r = client.get("/grid", headers=headers, params=params)
+    assert r.status_code == 200 and r.json()["stale"] is True
+    assert r.headers["X-Grid-Stale"] == "true"
+    assert r.headers["ETag"] != etag
+
+    # oversized requests are rejected before any cell is read
+    monkeypatch.setattr(main, "GRID_MAX_CELLS", 2)
+    monkeypatch.setattr(type(store.get()), "slice", lambda *a, **k: pytest.fail("sliced"))
+    big = client.get("/grid", headers=headers, params=params)
+    assert big.status_code == 400 and big.json()["code"] == "grid_too_large"
+
+
+def test_comparables_endpoint_and_predict_field(client):
+    token = _signup_and_login(client, "comps@example.com", "StrongPass123")
+    headers = {"Authorization": f"Bearer {token}"}
+    record = {
+        "longitude": -122.23,
+        "latitude": 37.88,
+        "housing_median_age": 41.0,
+        "total_rooms": 880.0,
+        "total_bedrooms": 129.0,
+        "population": 322.0,
+        "households": 126.0,
+        "median_income": 8.3252,
+        "ocean_proximity": "NEAR BAY",
+    }
+    r = client.post("/comparables", headers=headers, params={"k": 3}, json=record)
+    assert r.status_code == 200
+    comps = r.json()["comparables"]
+    # the first row of housing.csv is this exact district
+    assert comps[0]["id"] == 0 and comps[0]["distance"] == 0.0
+    assert len(comps) == 3
+    assert client.post("/comparables", headers=headers, params={"k": 0}, json=record).status_code == 400
+
+    r = client.post("/predict", headers=headers, params={"comparables": 3}, json=record)
+    assert r.status_code == 200
+    assert r.json()["comparables"] == comps
+    assert client.post("/predict", headers=headers, json=record).json()["comparables"] is None
+
+
+# A comparables failure still returns (and keeps) the stored prediction
+def test_predict_survives_comparables_failure(client, monkeypatch):
+    import app.main as main
+
+    class Broken:
+        def get(self):
+            raise OSError("housing.csv unreadable")
+
+    token = _signup_and_login(client, "comps-broken@example.com", "StrongPass123")
+    headers = {"Authorization": f"Bearer {token}"}
+    monkeypatch.setattr(main, "comparables_store", Broken())
+    record = {
+        "longitude": -122.23,
+        "latitude": 37.88,
+        "housing_median_age": 41.0,
+        "total_rooms": 880.0,
+        "total_bedrooms": 129.0,
+        "population": 322.0,
+        "households": 126.0,
+        "median_income": 8.3252,
+        "ocean_proximity": "NEAR BAY",
+    }
+    r = client.post("/predict", headers=headers, params={"comparables": 3}, json=record)
+    assert r.status_code == 200
+    assert r.json()["comparables"] is None
+    assert r.json()["comparables_error"] == "comparables_unavailable"
+    assert isinstance(r.json()["prediction"], float)
+
+
+# Admin endpoints are disabled unless ADMIN_TOKEN is configured
+def test_admin_models_disabled_without_token(client):
+    assert client.get("/admin/models").status_code == 404
+    assert client.post("/admin/models/reload", json={}).status_code == 404
+    assert client.post("/admin/auth/reload").status_code == 404
+
+
+# Rotating JWT_SECRETS takes effect through the admin reload endpoint
+def test_admin_auth_reload_applies_rotated_secrets(client, monkeypatch):
+    import app.main as main
+
+    token = _signup_and_login(client, "rotate@example.com", "secret123")
+    headers = {"Authorization": f"Bearer {token}"}
+    monkeypatch.setattr(main, "ADMIN_TOKEN", "admintoken")
+    admin = {"X-Admin-Token": "admintoken"}
+    assert client.post("/admin/auth/reload", headers={"X-Admin-Token": "nope"}).status_code == 403
+
+    monkeypatch.setenv("JWT_SECRETS", "rotated")
+    r = client.post("/admin/auth/reload", headers=admin)
+    assert r.status_code == 200
+    assert r.json()["secrets"] == 1
+    assert client.get("/predictions", headers=headers).status_code == 401
+
+    monkeypatch.undo()
+    main.reload_settings()
+    assert client.get("/predictions", headers=headers).status_code == 200
+
+
+# Logging in with a hash below the configured work factor upgrades it
+def test_login_rehashes_weak_password_hash(client):
+    from app.crud import create_user, get_user_by_email, pwd_context
+    from app.db import SessionLocal
+
+    email = "rehash@example.com"
+    weak = pwd_context.handler("pbkdf2_sha256").using(rounds=1000).hash("StrongPass123")
+    db = SessionLocal()
+    try:
+        if not get_user_by_email(db, email):
+            create_user(db, email, password_hash=weak)
+        r = client.post("/login", json={"email": email, "password": "StrongPass123"})
+        assert r.status_code == 200
+        db.expire_all()
+        stored = get_user_by_email(db, email).password_hash
+        assert stored != weak
+        assert not pwd_context.needs_update(stored)
+    finally:
+        db.close()
+
+
+# Walking /predictions with X-Next-Cursor visits every row exactly once
+def test_predictions_keyset_pagination(client):
+    token = _signup_and_login(client, "pages@example.com", "StrongPass123")
+    headers = {"Authorization": f"Bearer {token}"}
+    payload = {
+        "longitude": -117.96,
+        "latitude": 33.89,
+        "housing_median_age": 24.0,
+        "total_rooms": 1332.0,
+        "total_bedrooms": 252.0,
+        "population": 625.0,
+        "households": 230.0,
+        "median_income": 4.4375,
+        "ocean_proximity": "<1H OCEAN",
+    }
+    r = client.post("/predict/batch", headers=headers, json={"records": [payload] * 7})
+    assert r.status_code == 200
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 3, **({"after": cursor} if cursor else {})}
+        r = client.get("/predictions", headers=headers, params=params)
+        assert r.status_code == 200
+        seen += [row["id"] for row in r.json()]
+        cursor = r.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    r = client.get("/predictions", headers=headers, params={"limit": 50})
+    offset_ids = [row["id"] for row in r.json()]
+    assert seen == offset_ids
+    assert len(seen) == 7
+
+    r = client.get("/predictions", headers=headers, params={"after": "garbage"})
+    assert r.status_code == 400
+
+
+def test_export_predictions_ndjson_and_csv(client):
+    import csv
+    import io
+    import json
+
+    token = _signup_and_login(client, "export@example.com", "StrongPass123")
+    headers = {"Authorization": f"Bearer {token}"}
+    payload = {
+        "longitude": -115.73,
+        "latitude": 33.35,
+        "housing_median_age": 23.0,
+        "total_rooms": 1586.0,
+        "total_bedrooms": 448.0,
+        "population": 338.0,
+        "households": 182.0,
+        "median_income": 1.2132,
+        "ocean_proximity": "INLAND",
+    }
+    client.post("/predict/batch", headers=headers, json={"records": [payload] * 3})
+
+    r = client.get("/predictions/export", headers=headers)
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in r.text.splitlines()]
+    assert len(lines) == 3
+    assert lines[0]["payload"]["ocean_proximity"] == "INLAND"
+
+    r = client.get("/predictions/export", headers=headers, params={"format": "csv"})
+    rows = list(csv.DictReader(io.StringIO(r.text)))
+    assert len(rows) == 3
+    assert rows[0]["ocean_proximity"] == "INLAND"
+
+    assert client.get("/predictions/export", headers=headers, params={"format": "xml"}).status_code == 400
+
+
+def test_prediction_stats(client):
+    token = _signup_and_login(client, "stats@example.com", "StrongPass123")
+    headers = {"Authorization": f"Bearer {token}"}
+    base = {
+        "longitude": -122.23,
+        "latitude": 37.88,
+        "housing_median_age": 41.0,
+        "total_rooms": 880.0,
+        "total_bedrooms": 129.0,
+        "population": 322.0,
+        "households": 126.0,
+        "median_income": 8.3252,
+    }
+    records = [{**base, "ocean_proximity": "NEAR BAY"}] * 3 + [{**base, "ocean_proximity": "INLAND"}] * 2
+    client.post("/predict/batch", headers=headers, json={"records": records})
+    # ROLLUP_MODE=schedule (default): run the refresher's pass now
+    from app.analytics import refresh_rollups
+    from app.db import SessionLocal
+
+    db = SessionLocal()
+    try:
+        refresh_rollups(db, lag=0)
+    finally:
+        db.close()
+
+    r = client.get("/predictions/stats", headers=headers, params={"group_by": "ocean_proximity"})
+    assert r.status_code == 200
+    counts = {b["ocean_proximity"]: b["count"] for b in r.json()["buckets"]}
+    assert counts == {"INLAND": 2, "NEAR BAY": 3}
+
+    raw = client.get("/predictions/stats", headers=headers, params={"group_by": "ocean_proximity", "source": "raw"})
+    assert raw.json()["buckets"] == r.json()["buckets"]
+    day = client.get("/predictions/stats", headers=headers).json()["buckets"]
+    assert len(day) == 1 and day[0]["count"] == 5
+    assert client.get("/predictions/stats", headers=headers, params={"group_by": "week"}).status_code == 400
+
+
+def _rss_kb() -> int:
+    with open("/proc/self/status") as fh:
+        for line in fh:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+
+# Slow: seeds EXPORT_TEST_ROWS (default 1M) rows; run with RUN_SLOW_TESTS=1
+@pytest.mark.skipif(not os.getenv("RUN_SLOW_TESTS"), reason="set RUN_SLOW_TESTS=1")
+def test_export_streams_large_history_in_constant_memory(client):
+    from datetime import datetime, timedelta
+
+    from app.crud import get_user_by_email, insert_prediction_rows
+    from app.db import SessionLocal
+
+    rows = int(os.getenv("EXPORT_TEST_ROWS", "1000000"))
+    email = "export-big@example.com"
+    token = _signup_and_login(client, email, "StrongPass123")
+    headers = {"Authorization": f"Bearer {token}"}
+    payload = {"longitude": -122.0, "latitude": 37.0, "ocean_proximity": "NEAR BAY"}
+    db = SessionLocal()
+    try:
+        user_id = get_user_by_email(db, email).id
+        start = datetime(2024, 1, 1)
+        for base in range(0, rows, 20000):
+            insert_prediction_rows(
+                db,
+                [
+                    {
+                        "user_id": user_id,
+                        "payload": payload,
+                        "predicted_value": 1.0,
+                        "created_at": start + timedelta(seconds=base + i),
+                    }
+                    for i in range(min(20000, rows - base))
+                ],
+            )
+    finally:
+        db.close()
+
+    # TestClient buffers whole bodies, so drive the ASGI app directly and
+    # drop each chunk as it arrives, like a real socket would
+    import asyncio
+
+    from app.main import app as asgi_app
+
+    state = {"status": None, "lines": 0, "chunks": 0}
+    baseline = _rss_kb()
+    peak = baseline
+
+    requested = False
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await asyncio.Event().wait()  # client never disconnects
+
+    async def send(message):
+        nonlocal peak
+        if message["type"] == "http.response.start":
+            state["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            state["lines"] += message.get("body", b"").count(b"\n")
+            state["chunks"] += 1
+            if state["chunks"] % 50 == 0:
+                peak = max(peak, _rss_kb())
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/predictions/export",
+        "raw_path": b"/predictions/export",
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"host", b"testserver"), (b"authorization", headers["Authorization"].encode())],
+        "client": ("127.0.0.1", 50000),
+        "server": ("testserver", 80),
+    }
+    asyncio.run(asgi_app(scope, receive, send))
+    assert state["status"] == 200
+    assert state["lines"] == rows
+    # the whole export is >100MB of NDJSON; growth must stay far below that
+    assert peak - baseline < 64 * 1024
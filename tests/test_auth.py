@@ -0,0 +1,45 @@
+import os
+import time
+
+import jwt
+import pytest
+
+os.environ.setdefault("JWT_SECRETS", "testsecret")
+
+from app import auth  # noqa: E402
+
+
+def _token(secret: str, ttl: int = 60) -> str:
+    now = int(time.time())
+    return jwt.encode({"sub": "42", "iat": now, "exp": now + ttl}, secret, algorithm="HS256")
+
+
+@pytest.fixture()
+def rotated(monkeypatch):
+    monkeypatch.setenv("JWT_SECRETS", "new,old")
+    auth.reload_settings()
+    yield monkeypatch
+    monkeypatch.undo()
+    auth.reload_settings()
+
+
+def test_verified_tokens_are_cached_until_exp(rotated):
+    token = _token("old")
+    assert auth._verify_jwt(token)["sub"] == "42"
+    hits = auth._token_cache.hits
+    assert auth._verify_jwt(token)["sub"] == "42"
+    assert auth._token_cache.hits == hits + 1
+    assert auth.token_cache_stats()["secret_matches"].get(1)
+
+    # an entry past its exp is a miss even if still cached
+    digest = next(iter(auth._token_cache._data))
+    assert auth._token_cache.get(digest, time.time() + 3600) is None
+
+
+def test_reload_drops_tokens_signed_by_removed_secret(rotated):
+    token = _token("old")
+    assert auth._verify_jwt(token) is not None
+    rotated.setenv("JWT_SECRETS", "new")
+    auth.reload_settings()
+    assert auth._verify_jwt(token) is None
+    assert auth._verify_jwt("not-a-token") is None
@@ -0,0 +1,74 @@
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.comparables import FEATURES, ComparablesStore, build_index, load_index, save_index
+from app.model_runtime import DATA_PATH
+
+
+@pytest.fixture(scope="module")
+def index():
+    return build_index()
+
+
+@pytest.fixture(scope="module")
+def queries():
+    df = pd.read_csv(DATA_PATH).dropna().sample(n=50, random_state=1)
+    rows = df.to_dict(orient="records")
+    for r in rows:
+        r["longitude"] += 0.013
+        r["median_income"] *= 1.1
+    rows.append(dict(rows[0], ocean_proximity="MOON BASE"))
+    return rows
+
+
+# Same neighbours as a full scan over the same candidate rows
+def test_matches_brute_force(index, queries):
+    for q in queries:
+        got = index.query(q, k=7)
+        rows, _ = index.candidates(q["ocean_proximity"], 7)
+        rows = np.arange(len(index.points)) if rows is None else rows
+        x = index.transform(np.array([[q[f] for f in FEATURES]]))
+        d = np.sqrt(((index.points[rows] - x) ** 2).sum(axis=1))
+        expect = np.sort(d)[:7]
+        assert np.allclose([c["distance"] for c in got], expect, atol=1e-5)
+        assert [c["distance"] for c in got] == sorted(c["distance"] for c in got)
+
+
+def test_same_category_unless_too_few(index, queries):
+    q = queries[0]
+    assert {c["ocean_proximity"] for c in index.query(q, k=10)} == {q["ocean_proximity"]}
+    # ISLAND has 5 rows: asking for more falls back to all categories
+    island = dict(q, ocean_proximity="ISLAND")
+    assert {c["ocean_proximity"] for c in index.query(island, k=5)} == {"ISLAND"}
+    assert len({c["ocean_proximity"] for c in index.query(island, k=8)}) > 1
+
+
+def test_artifact_roundtrip_and_staleness(index, queries, tmp_path):
+    path = tmp_path / "comparables.joblib"
+    save_index(index, path)
+    loaded = load_index(path)
+    assert loaded.query(queries[3], k=4) == index.query(queries[3], k=4)
+    other_csv = tmp_path / "housing.csv"
+    other_csv.write_text(DATA_PATH.read_text() + "\n")
+    assert load_index(path, data_path=other_csv) is None
+    assert load_index(tmp_path / "missing.joblib") is None
+
+
+# Corrupt or outdated pickles count as missing, and the store rebuilds from the CSV
+def test_unreadable_artifact_is_rebuilt(tmp_path):
+    garbage = tmp_path / "garbage.joblib"
+    garbage.write_bytes(b"\x80\x04not a pickle")
+    orphan = tmp_path / "orphan.joblib"
+    # a pickled reference to a class whose module no longer exists
+    orphan.write_bytes(b"cgone_module\nComparablesIndex\n.")
+    for path in (garbage, orphan):
+        assert load_index(path) is None
+        store = ComparablesStore(path)
+        store.start_background()
+        deadline = time.time() + 10
+        while store._index is None and time.time() < deadline:
+            time.sleep(0.01)
+        assert store._index is not None and len(store._index.row_ids) > 0
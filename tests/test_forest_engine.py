@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+
+from app import forest_engine
+from app.forest_engine import FlatForest
+
+
+@pytest.fixture(scope="module")
+def fitted():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(600, 6))
+    y = X[:, 0] * 3 + np.sin(X[:, 1]) + rng.normal(scale=0.1, size=600)
+    model = RandomForestRegressor(n_estimators=15, max_depth=None, random_state=0).fit(X, y)
+    return model, rng.normal(size=(1500, 6))
+
+
+# sklearn is the reference: same float32 comparisons, same leaves
+def test_matches_sklearn(fitted, monkeypatch):
+    model, X = fitted
+    forest = FlatForest.from_sklearn(model)
+    # force several chunks, including a ragged last one
+    monkeypatch.setattr(forest_engine, "CHUNK_ROWS", 256)
+    np.testing.assert_allclose(forest.predict(X), model.predict(X), rtol=1e-12)
+    np.testing.assert_allclose(forest.predict(X[:1]), model.predict(X[:1]), rtol=1e-12)
+
+
+def test_values_on_split_thresholds(fitted):
+    model, X = fitted
+    forest = FlatForest.from_sklearn(model)
+    t = model.estimators_[0].tree_
+    # rows sitting exactly on the root threshold take the left branch in both
+    edge = X[:5].copy()
+    edge[:, t.feature[0]] = t.threshold[0]
+    np.testing.assert_allclose(forest.predict(edge), model.predict(edge), rtol=1e-12)
+
+
+def test_rejects_wrong_width(fitted):
+    model, X = fitted
+    with pytest.raises(ValueError):
+        FlatForest.from_sklearn(model).predict(X[:, :3])
+
+
+# Saved arrays come back memory-mapped and score the same; arrays built from
+# another model file are ignored
+def test_saved_arrays_are_memory_mapped(fitted, tmp_path):
+    model, X = fitted
+    forest = FlatForest.from_sklearn(model)
+    forest.save(tmp_path / "m.flat", source="sha-a")
+    loaded = FlatForest.load(tmp_path / "m.flat", source="sha-a")
+    assert isinstance(loaded.value, np.memmap) and isinstance(loaded.children, np.memmap)
+    np.testing.assert_array_equal(loaded.predict(X), forest.predict(X))
+    assert FlatForest.load(tmp_path / "m.flat", source="sha-b") is None
+    assert FlatForest.load(tmp_path / "missing.flat", source="sha-a") is None
+
+
+# MODEL_FORMAT=mmap + INFERENCE_ENGINE=flat serves the mapped arrays
+def test_runtime_maps_engine_next_to_mmap_export(reg, monkeypatch):
+    import json
+
+    import joblib
+
+    from app import model_runtime
+    from app.feature_schema import file_sha256
+    from app.forest_engine import flat_dir
+    from app.model_runtime import WARMUP_PAYLOADS, ModelRuntime
+
+    schema = json.loads((reg.root / "v1" / "model.schema.json").read_text())
+    rng = np.random.default_rng(0)
+    Xs = rng.normal(size=(200, len(schema["columns"])))
+    model = RandomForestRegressor(n_estimators=5, max_depth=4, random_state=0).fit(Xs, Xs[:, 0])
+    d = reg.root / "forest"
+    d.mkdir()
+    joblib.dump(model, d / "model.joblib", compress=3)
+    joblib.dump(model, d / "model.mmap.joblib", compress=0)
+    (d / "model.schema.json").write_text(json.dumps(schema))
+    FlatForest.from_sklearn(model).save(flat_dir(d / "model.mmap.joblib"), file_sha256(d / "model.mmap.joblib"))
+
+    monkeypatch.setattr(model_runtime, "MODEL_FORMAT", "mmap")
+    monkeypatch.setattr(model_runtime, "INFERENCE_ENGINE", "flat")
+    rt = ModelRuntime("forest", registry=reg)
+    assert isinstance(rt.engine.value, np.memmap)
+    X = rt.prepare_batch(list(WARMUP_PAYLOADS))
+    np.testing.assert_allclose(rt.predict_batch(X), model.predict(X), rtol=1e-12)
@@ -0,0 +1,50 @@
+import asyncio
+import time
+
+import pytest
+
+from app.inference_pool import InferenceExecutor, score_in_worker
+from app.model_runtime import WARMUP_PAYLOADS
+
+
+# Spawned workers read MODEL_REGISTRY_DIR when they import the app, so they
+# serve the test registry's CURRENT version
+@pytest.fixture()
+def process_executor(reg, monkeypatch):
+    monkeypatch.setenv("MODEL_REGISTRY_DIR", str(reg.root))
+    executor = InferenceExecutor("process", workers=1)
+    yield executor
+    executor.shutdown()
+
+
+def test_process_workers_score_with_their_own_runtime(process_executor):
+    async def main():
+        return await process_executor.run(score_in_worker, list(WARMUP_PAYLOADS))
+
+    ys, version = asyncio.run(main())
+    assert (ys, version) == ([1.0] * len(WARMUP_PAYLOADS), "v1")
+    assert process_executor.stats()["completed"] == 1
+
+
+# Calls accepted by the old pool finish on the old version; calls made after
+# recycle() go to a pool loaded with the new one
+def test_recycle_while_calls_are_in_flight(process_executor):
+    payloads = list(WARMUP_PAYLOADS[:1])
+
+    async def main():
+        process_executor.recycle("v1")  # first load: records the version only
+        # warm the worker so the in-flight calls below are queued behind a sleep
+        await process_executor.run(score_in_worker, payloads)
+        busy = asyncio.ensure_future(process_executor.run(time.sleep, 0.5))
+        queued = asyncio.ensure_future(process_executor.run(score_in_worker, payloads))
+        await asyncio.sleep(0.1)
+        assert process_executor.stats()["in_flight"] == 2
+        process_executor.recycle("v2")
+        fresh = await process_executor.run(score_in_worker, payloads)
+        return await busy, await queued, fresh
+
+    busy, queued, fresh = asyncio.run(main())
+    assert busy is None
+    assert queued == ([1.0], "v1")
+    assert fresh == ([2.0], "v2")
+    assert process_executor.model_version == "v2"
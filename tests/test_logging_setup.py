@@ -0,0 +1,57 @@
+import io
+import json
+import logging
+
+from app.logging_setup import configure_logging, configure_from_env, shutdown_logging
+
+
+def _lines(stream: io.StringIO):
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+def test_queue_pipeline_writes_json_with_extras():
+    stream = io.StringIO()
+    configure_logging(level="INFO", fmt="json", async_=True, sample="", stream=stream)
+    try:
+        logging.getLogger("app.test").info("thing_happened", extra={"user_id": 7})
+        logging.getLogger("app.test").debug("not_enabled", extra={"x": 1})
+    finally:
+        # stops the listener, which drains the queue
+        shutdown_logging()
+    (line,) = _lines(stream)
+    assert line["event"] == "thing_happened"
+    assert line["user_id"] == 7
+    assert line["logger"] == "app.test"
+    configure_from_env()
+
+
+def test_sampling_drops_debug_only():
+    stream = io.StringIO()
+    configure_logging(level="DEBUG", fmt="json", async_=False, sample="app.db=0", stream=stream)
+    try:
+        for _ in range(50):
+            logging.getLogger("app.db").debug("db_query_result")
+        logging.getLogger("app.db").info("db_insert_user_done")
+        logging.getLogger("app.api").debug("kept")
+    finally:
+        shutdown_logging()
+    assert [line["event"] for line in _lines(stream)] == ["db_insert_user_done", "kept"]
+    configure_from_env()
+
+
+def test_app_records_do_not_reach_root_handlers():
+    seen = []
+    root_handler = logging.Handler()
+    root_handler.emit = seen.append
+    logging.getLogger().addHandler(root_handler)
+    stream = io.StringIO()
+    configure_logging(level="INFO", fmt="json", async_=False, sample="", stream=stream)
+    try:
+        logging.getLogger("app.test").warning("only_once")
+        shutdown_logging()
+        logging.getLogger("app.test").warning("after_shutdown")
+    finally:
+        logging.getLogger().removeHandler(root_handler)
+    assert [line["event"] for line in _lines(stream)] == ["only_once"]
+    assert [r.getMessage() for r in seen] == ["after_shutdown"]
+    configure_from_env()
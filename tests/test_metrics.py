@@ -0,0 +1,38 @@
+import logging
+import time
+
+from app.metrics import Histogram, SlowRequestProfiler
+
+
+def test_histogram_renders_cumulative_buckets():
+    h = Histogram(buckets=(0.01, 0.1))
+    for v in (0.005, 0.05, 0.05, 3.0):
+        h.observe(v)
+    lines = h.render("x", 'stage="a"')
+    assert lines[:3] == [
+        'x_bucket{stage="a",le="0.01"} 1',
+        'x_bucket{stage="a",le="0.1"} 3',
+        'x_bucket{stage="a",le="+Inf"} 4',
+    ]
+    assert lines[-1] == 'x_count{stage="a"} 4'
+
+
+def _busy(seconds: float) -> None:
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def test_slow_request_profiler_reports_only_slow_requests(caplog):
+    profiler = SlowRequestProfiler(threshold=0.05, interval=0.001)
+    with caplog.at_level(logging.WARNING, logger="app.metrics"):
+        fast = profiler.start()
+        profiler.finish(fast, 0.001, "fast")
+        slow = profiler.start()
+        _busy(0.1)
+        profiler.finish(slow, 0.1, "slow")
+    records = [r for r in caplog.records if r.getMessage() == "slow_request_profile"]
+    assert len(records) == 1
+    assert records[0].request == "slow"
+    assert any("_busy" in s for s in records[0].stacks)
+    assert profiler.stats()["reported"] == 1
@@ -0,0 +1,71 @@
+import asyncio
+
+from app.micro_batcher import MicroBatcher
+
+
+def test_concurrent_requests_share_batches_and_keep_order():
+    calls = []
+
+    async def score_many(bodies):
+        calls.append(len(bodies))
+        return [b["x"] * 10.0 for b in bodies]
+
+    async def main():
+        batcher = MicroBatcher(score_many, max_batch_size=4, max_wait=0.01)
+        return await asyncio.gather(*(batcher.submit({"x": i}) for i in range(10))), batcher
+
+    results, batcher = asyncio.run(main())
+    assert results == [i * 10.0 for i in range(10)]
+    assert calls == [4, 4, 2]
+    assert batcher.stats()["largest_batch"] == 4
+
+
+def test_errors_reach_every_waiter():
+    async def score_many(bodies):
+        raise RuntimeError("model exploded")
+
+    async def main():
+        batcher = MicroBatcher(score_many, max_batch_size=8, max_wait=0.001)
+        return await asyncio.gather(
+            *(batcher.submit({"x": i}) for i in range(3)), return_exceptions=True
+        )
+
+    results = asyncio.run(main())
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+def test_short_result_list_fails_the_batch():
+    async def score_many(bodies):
+        return [1.0] * (len(bodies) - 1)
+
+    async def main():
+        batcher = MicroBatcher(score_many, max_batch_size=3, max_wait=0.001)
+        results = await asyncio.gather(
+            *(batcher.submit({"x": i}) for i in range(3)), return_exceptions=True
+        )
+        return results, batcher
+
+    results, batcher = asyncio.run(main())
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert not batcher._tasks
+
+
+def test_cancelled_batch_cancels_its_waiters():
+    started = None
+
+    async def score_many(bodies):
+        started.set()
+        await asyncio.sleep(10)
+
+    async def main():
+        nonlocal started
+        started = asyncio.Event()
+        batcher = MicroBatcher(score_many, max_batch_size=2, max_wait=0.001)
+        waiters = [asyncio.ensure_future(batcher.submit({"x": i})) for i in range(2)]
+        await started.wait()
+        for task in list(batcher._tasks):
+            task.cancel()
+        return await asyncio.gather(*waiters, return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(r, asyncio.CancelledError) for r in results)
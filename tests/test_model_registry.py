@@ -0,0 +1,106 @@
+import threading
+import time
+
+import joblib
+import pytest
+
+from app.model_registry import ModelRegistry, ModelWatcher
+from app.model_runtime import WARMUP_PAYLOADS, ModelLoader, ModelRuntime
+
+
+def _loader(reg: ModelRegistry) -> ModelLoader:
+    return ModelLoader(lambda version: ModelRuntime(version, registry=reg))
+
+
+def _score(loader: ModelLoader) -> float:
+    rt = loader.get()
+    return rt.predict(rt.prepare_features(WARMUP_PAYLOADS[0]))
+
+
+def test_watcher_follows_promoted_version(reg):
+    loader = _loader(reg)
+    seen = []
+    loader.add_listener(lambda rt: seen.append(rt.version))
+    assert _score(loader) == 1.0 and loader.version == "v1"
+
+    watcher = ModelWatcher(reg, lambda: loader.version, loader.reload, interval=0)
+    watcher.check()
+    assert seen == ["v1"]  # CURRENT unchanged: nothing to do
+
+    reg.set_current("v2")
+    watcher.check()
+    assert loader.version == "v2" and _score(loader) == 2.0
+    assert seen == ["v1", "v2"]
+
+
+# A version that fails warm-up is never swapped in
+def test_failed_warm_up_keeps_serving_previous_version(reg):
+    loader = _loader(reg)
+    loader.load()
+    with pytest.raises(ValueError):
+        loader.reload("broken")
+    assert loader.version == "v1" and _score(loader) == 1.0
+    assert "non-finite" in loader.status()["error"]
+
+
+def test_registry_rejects_unknown_versions(reg):
+    assert reg.versions() == ["broken", "v1", "v2"]
+    with pytest.raises(KeyError):
+        reg.set_current("../v1")
+    assert reg.current() == "v1"
+
+
+# A second background reload returns at once while the first is still building
+def test_reload_in_background_does_not_wait_for_running_build(reg):
+    release = threading.Event()
+
+    def slow_factory(version):
+        release.wait(5)
+        return ModelRuntime(version, registry=reg)
+
+    loader = ModelLoader(slow_factory)
+    assert loader.reload_in_background("v2")
+    t0 = time.perf_counter()
+    assert loader.reload_in_background("v2") is False
+    assert time.perf_counter() - t0 < 1.0
+    release.set()
+    loader._reload_thread.join(5)
+    assert loader.version == "v2"
+
+
+# A promoted version that fails to load is tried once, not every interval
+def test_watcher_skips_failed_version_until_current_changes(reg):
+    loader = _loader(reg)
+    loader.load()
+    attempts = []
+
+    def on_change(version):
+        attempts.append(version)
+        try:
+            loader.reload(version)
+        except ValueError:
+            pass
+
+    watcher = ModelWatcher(reg, lambda: loader.version, on_change, failed_version=lambda: loader.failed_version)
+    reg.set_current("broken")
+    watcher.check()
+    watcher.check()
+    assert attempts == ["broken"] and loader.version == "v1"
+    reg.set_current("v2")
+    watcher.check()
+    assert attempts == ["broken", "v2"] and loader.version == "v2"
+
+
+# MODEL_FORMAT=mmap applies to registry versions: their uncompressed export is
+# memory-mapped, and a version without one fails with a clear error
+def test_registry_versions_honour_mmap_format(reg, monkeypatch):
+    from app import model_runtime
+
+    monkeypatch.setattr(model_runtime, "MODEL_FORMAT", "mmap")
+    with pytest.raises(FileNotFoundError, match="model.mmap.joblib"):
+        ModelRuntime("v2", registry=reg)
+    model = joblib.load(reg.root / "v2" / "model.joblib")
+    joblib.dump(model, reg.root / "v2" / "model.mmap.joblib", compress=0)
+    rt = ModelRuntime("v2", registry=reg)
+    assert rt.version == "v2"
+    assert rt.predict(rt.prepare_features(WARMUP_PAYLOADS[0])) == 2.0
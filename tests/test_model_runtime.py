@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.model_runtime import DATA_PATH, runtime
+
+
+@pytest.fixture(scope="module")
+def payloads():
+    df = pd.read_csv(DATA_PATH).dropna().drop(columns=["median_house_value"])
+    rows = df.sample(n=200, random_state=0).to_dict(orient="records")
+    # Unknown category must encode as all-zero one-hot, like reindex does
+    rows.append(dict(rows[0], ocean_proximity="MOON BASE"))
+    return rows
+
+
+# The NumPy fast path must produce the same matrix and predictions as pandas
+def test_fast_encoder_matches_pandas(payloads):
+    for p in payloads:
+        fast = runtime.prepare_features(p)
+        ref = runtime.prepare_features_frame(p).to_numpy(dtype=np.float64)
+        assert np.array_equal(fast, ref)
+        assert runtime.predict(fast) == runtime.predict(runtime.prepare_features_frame(p))
+
+
+def test_batch_encoder_matches_single(payloads):
+    batch = runtime.prepare_batch(payloads)
+    single = np.vstack([runtime.prepare_features(p) for p in payloads])
+    assert np.array_equal(batch, single)
+
+
+# The committed schema artifact must stay in sync with housing.csv
+def test_schema_artifact_matches_csv():
+    from app.feature_schema import load_schema, schema_from_csv
+    from app.model_runtime import SCHEMA_PATH
+
+    artifact = load_schema(SCHEMA_PATH)
+    fresh = schema_from_csv(DATA_PATH)
+    assert artifact is not None
+    assert artifact["columns"] == fresh["columns"]
+    assert artifact["categories"] == fresh["categories"]
+    assert artifact["training_hash"] == fresh["training_hash"]
+
+
+# The feature-name warning is silenced around the model call only
+def test_feature_name_warning_is_not_silenced_globally(payloads):
+    import warnings
+
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        runtime.predict_batch(runtime.prepare_batch(payloads[:4]))
+        assert not [w for w in caught if "valid feature names" in str(w.message)]
+        warnings.warn("X does not have valid feature names, but demo", UserWarning)
+    assert [w for w in caught if "valid feature names" in str(w.message)]
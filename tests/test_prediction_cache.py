@@ -0,0 +1,98 @@
+import threading
+
+import pytest
+
+from app.prediction_cache import (
+    CacheBackend,
+    MemoryLRUBackend,
+    PredictionCache,
+    SQLiteBackend,
+    canonical_key,
+)
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_canonical_key_ignores_order_but_not_version():
+    a = {"longitude": -122.64, "ocean_proximity": "NEAR OCEAN"}
+    b = {"ocean_proximity": "NEAR OCEAN", "longitude": -122.64}
+    assert canonical_key(a, "v1") == canonical_key(b, "v1")
+    assert canonical_key(a, "v1") != canonical_key(a, "v2")
+
+
+def test_memory_lru_evicts_least_recent_and_expires():
+    clock = _Clock()
+    backend = MemoryLRUBackend(max_entries=2, ttl_seconds=10, clock=clock)
+    backend.set("a", 1.0, "v1")
+    backend.set("b", 2.0, "v1")
+    assert backend.get("a") == 1.0  # a is now most recent
+    backend.set("c", 3.0, "v1")
+    assert backend.get("b") is None
+    assert backend.get("a") == 1.0
+    clock.now += 11
+    assert backend.get("a") is None
+
+
+def test_cache_counts_and_invalidates():
+    cache = PredictionCache(MemoryLRUBackend(max_entries=10))
+    calls = []
+    compute = lambda: calls.append(1) or 42.0  # noqa: E731
+    payload = {"x": 1.0}
+    assert cache.get_or_compute(payload, "v1", compute) == 42.0
+    assert cache.get_or_compute(payload, "v1", compute) == 42.0
+    assert len(calls) == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+    cache.invalidate("v2")
+    cache.get_or_compute(payload, "v1", compute)
+    assert len(calls) == 2
+
+
+# Counters are exact under concurrent lookups from inference threads
+def test_counters_are_exact_across_threads():
+    cache = PredictionCache(MemoryLRUBackend(max_entries=10))
+    cache.get_or_compute({"x": 1.0}, "v1", lambda: 1.0)
+
+    def work():
+        for _ in range(2000):
+            cache.get_or_compute({"x": 1.0}, "v1", lambda: 1.0)
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (16000, 1)
+
+
+# Two backends on one file behave like two workers sharing a store
+def test_sqlite_backend_shared_between_instances(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    writer = SQLiteBackend(path, max_entries=100)
+    reader = SQLiteBackend(path, max_entries=100)
+    writer.set("k", 12.5, "v1")
+    assert reader.get("k") == 12.5
+    reader.invalidate("v2")
+    assert writer.get("k") is None
+
+
+# A backend missing part of the interface fails when created, not mid-request
+def test_incomplete_backend_cannot_be_created():
+    class NoInvalidate(CacheBackend):
+        def get(self, key):
+            return None
+
+        def set(self, key, value, model_version):
+            pass
+
+        def __len__(self):
+            return 0
+
+    with pytest.raises(TypeError):
+        NoInvalidate()
@@ -0,0 +1,38 @@
+import pytest
+
+from app.model_runtime import DATA_PATH, runtime
+from app.price_grid import PriceGrid, build_grid, default_features, save_grid
+
+BOUNDS = (-122.5, 37.0, -121.0, 38.0)
+
+
+@pytest.fixture(scope="module")
+def grid(tmp_path_factory):
+    path = tmp_path_factory.mktemp("grid") / "price_grid.npy"
+    values, meta = build_grid(runtime, default_features(DATA_PATH), step=0.25, bounds=BOUNDS)
+    save_grid(values, meta, path)
+    return PriceGrid.open(path)
+
+
+# Every cell is what /predict would return at that point with the defaults
+def test_cells_match_runtime(grid):
+    assert grid.values.shape == (len(grid.categories), 5, 7)
+    for cat in ("INLAND", "NEAR BAY"):
+        s = grid.slice(cat, lon_min=-122.0, lat_min=37.5, lon_max=-121.5, lat_max=37.5)
+        assert (s["rows"], s["cols"], s["lon_min"], s["lat_min"]) == (1, 3, -122.0, 37.5)
+        for j, value in enumerate(s["values"][0]):
+            payload = dict(grid.meta["defaults"], longitude=-122.0 + 0.25 * j, latitude=37.5, ocean_proximity=cat)
+            assert value == round(runtime.predict(runtime.prepare_features(payload)))
+
+
+def test_slice_clips_and_strides(grid):
+    s = grid.slice("INLAND", lon_min=-130.0, lat_max=50.0, stride=2)
+    assert (s["rows"], s["cols"], s["step"]) == (3, 4, 0.5)
+    assert grid.slice("INLAND", lon_min=-100.0)["cols"] == 0
+
+
+# slice_shape() predicts slice() without reading values
+def test_slice_shape_matches_slice(grid):
+    for box in [{}, {"lon_min": -121.7, "lat_max": 38.0, "stride": 2}, {"lon_min": -100.0}, {"stride": 3}]:
+        s = grid.slice("INLAND", **box)
+        assert grid.slice_shape(**box) == (s["rows"], s["cols"])
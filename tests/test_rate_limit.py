@@ -0,0 +1,88 @@
+import pytest
+from fastapi import HTTPException
+
+from app.rate_limit import (
+    FixedWindowCounterLimiter,
+    LimiterStore,
+    MemoryLimiterStore,
+    SlidingWindowCounterLimiter,
+    SQLiteLimiterStore,
+    TokenBucketLimiter,
+    build_limiter,
+)
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 1_000_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _allowed(limiter, key: str, n: int) -> int:
+    ok = 0
+    for _ in range(n):
+        try:
+            limiter.hit(key)
+            ok += 1
+        except HTTPException as exc:
+            assert exc.status_code == 429
+    return ok
+
+
+@pytest.mark.parametrize("cls", [TokenBucketLimiter, SlidingWindowCounterLimiter, FixedWindowCounterLimiter])
+def test_limit_then_recover(cls):
+    clock = _Clock()
+    limiter = cls(10, 60, clock=clock)
+    assert _allowed(limiter, "user:1", 15) == 10
+    assert _allowed(limiter, "user:2", 1) == 1  # keys are independent
+    clock.now += 120
+    assert _allowed(limiter, "user:1", 10) == 10
+
+
+def test_token_bucket_refills_gradually():
+    clock = _Clock()
+    limiter = TokenBucketLimiter(10, 60, clock=clock)
+    assert _allowed(limiter, "k", 10) == 10
+    clock.now += 6  # one token per 6 seconds
+    assert _allowed(limiter, "k", 2) == 1
+
+
+def test_idle_keys_are_evicted():
+    clock = _Clock()
+    store = MemoryLimiterStore(idle_ttl=120, sweep_interval=60)
+    limiter = SlidingWindowCounterLimiter(10, 60, store=store, clock=clock)
+    for i in range(100):
+        limiter.hit(f"user:{i}")
+    assert len(store) == 100
+    clock.now += 600
+    limiter.hit("user:active")
+    assert len(store) == 1
+
+
+# Two stores on one file behave like two workers sharing the limit
+def test_sqlite_store_shares_limit_across_instances(tmp_path):
+    path = str(tmp_path / "rl.sqlite3")
+    clock = _Clock()
+    a = TokenBucketLimiter(10, 60, store=SQLiteLimiterStore(path), clock=clock)
+    b = TokenBucketLimiter(10, 60, store=SQLiteLimiterStore(path), clock=clock)
+    assert _allowed(a, "k", 6) + _allowed(b, "k", 6) == 10
+
+
+def test_fixed_algorithm_uses_shared_store(tmp_path, monkeypatch):
+    monkeypatch.setenv("RATE_LIMIT_BACKEND", "sqlite")
+    monkeypatch.setenv("RATE_LIMIT_SQLITE_PATH", str(tmp_path / "rl.sqlite3"))
+    monkeypatch.delenv("RATE_LIMIT_ALGORITHM", raising=False)
+    a, b = build_limiter(10, 60), build_limiter(10, 60)
+    assert isinstance(a.store, SQLiteLimiterStore)
+    assert _allowed(a, "k", 6) + _allowed(b, "k", 6) == 10
+
+
+def test_incomplete_store_cannot_be_created():
+    class NoLen(LimiterStore):
+        def update(self, key, step, now):
+            return True
+
+    with pytest.raises(TypeError):
+        NoLen()
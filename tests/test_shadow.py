@@ -0,0 +1,76 @@
+import threading
+import uuid
+
+import pytest
+
+from app.db import SessionLocal
+from app.models import ShadowPrediction
+from app.shadow import ShadowEvaluator, summarize
+
+
+# Stand-in runtime: predicts a constant, optionally blocking until released
+class _Candidate:
+    def __init__(self, value: float, gate: threading.Event = None) -> None:
+        self.version = f"cand-{uuid.uuid4().hex[:8]}"
+        self.value = value
+        self.gate = gate
+
+    def warm_up(self) -> None:
+        pass
+
+    def prepare_features(self, payload):
+        return payload
+
+    def prepare_batch(self, payloads):
+        return payloads
+
+    def predict(self, X) -> float:
+        if self.gate is not None:
+            self.gate.wait(5)
+        return self.value
+
+    def predict_batch(self, X):
+        return [self.predict(x) for x in X]
+
+
+def test_records_both_models_and_summarizes(db):
+    cand = _Candidate(110.0)
+    shadow = ShadowEvaluator(lambda: cand, SessionLocal, sample_rate=1.0)
+    assert shadow.maybe_submit([{"x": 1}], 100.0, "live-a", 0.002, batch=False)
+    assert shadow.maybe_submit([{"x": 1}, {"x": 2}], [100.0, 220.0], "live-a", 0.004, batch=True)
+    shadow.stop(cancel=False)
+    assert shadow.stats()["recorded"] == 2
+
+    [s] = [s for s in summarize(db) if s["shadow_version"] == cand.version]
+    assert (s["calls"], s["records"]) == (2, 3)
+    assert s["abs_diff_max"] == 110.0
+    # 10% on two records, 50% on the third
+    assert s["share_over_threshold"] == pytest.approx(1 / 3, abs=1e-4)
+    assert s["live_ms_p99"] <= 4.0
+
+
+# The live path never waits: past max_pending, samples are dropped
+def test_drops_samples_when_backlogged(db):
+    gate = threading.Event()
+    cand = _Candidate(1.0, gate)
+    shadow = ShadowEvaluator(lambda: cand, SessionLocal, sample_rate=1.0, max_pending=2)
+    submitted = [shadow.maybe_submit([{"x": i}], 1.0, "live-b", 0.001, batch=False) for i in range(5)]
+    assert submitted == [True, True, False, False, False]
+    gate.set()
+    shadow.stop(cancel=False)
+    stats = shadow.stats()
+    assert (stats["recorded"], stats["dropped"]) == (2, 3)
+    assert db.query(ShadowPrediction).filter(ShadowPrediction.shadow_version == cand.version).count() == 2
+
+
+# A sampled batch keeps at most max_rows of its records, paired with their live values
+def test_large_batches_are_capped(db):
+    cand = _Candidate(0.0)
+    shadow = ShadowEvaluator(lambda: cand, SessionLocal, sample_rate=1.0, max_rows=10)
+    live = [float(i) for i in range(1000)]
+    assert shadow.maybe_submit([{"x": i} for i in range(1000)], live, "live-c", 0.1, batch=True)
+    shadow.stop(cancel=False)
+    row = db.query(ShadowPrediction).filter(ShadowPrediction.shadow_version == cand.version).one()
+    assert row.rows == 10 and len(row.live_values) == len(row.shadow_values) == 10
+    assert len(set(row.live_values)) == 10 and set(row.live_values) <= set(live)
+    assert row.live_ms == pytest.approx(1.0)
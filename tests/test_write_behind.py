@@ -0,0 +1,68 @@
+import time
+import uuid
+
+from app.crud import create_user
+from app.db import SessionLocal
+from app.models import Prediction
+from app.write_behind import PredictionWriter
+
+
+def _count(db, user_id: int) -> int:
+    db.expire_all()
+    return db.query(Prediction).filter(Prediction.user_id == user_id).count()
+
+
+def test_flushes_on_batch_size_and_on_stop(db):
+    user = create_user(db, f"wb-{uuid.uuid4().hex[:8]}@example.com", "StrongPass123")
+    writer = PredictionWriter(SessionLocal, max_queue=100, batch_size=3, flush_interval=60)
+    writer.start()
+    for i in range(4):
+        assert writer.try_submit(user.id, {"i": i}, float(i))
+    deadline = time.time() + 5
+    while _count(db, user.id) < 3 and time.time() < deadline:
+        time.sleep(0.01)
+    assert _count(db, user.id) == 3
+    writer.stop()
+    assert _count(db, user.id) == 4
+    assert writer.stats()["flushed_batches"] == 2
+
+
+# A full queue hands the row back (False) so the caller writes it instead of dropping it
+def test_full_queue_hands_row_back(db):
+    user = create_user(db, f"wb-{uuid.uuid4().hex[:8]}@example.com", "StrongPass123")
+    writer = PredictionWriter(SessionLocal, max_queue=1, batch_size=10, flush_interval=60)
+    assert writer.try_submit(user.id, {"i": 0}, 0.0)  # worker not started: stays queued
+    assert not writer.try_submit(user.id, {"i": 1}, 1.0)
+    assert writer.stats()["overflow_sync"] == 1
+    assert writer.stats()["enqueued"] == 1
+
+
+# A transient error retries the whole batch; a bad row only loses itself
+def test_flush_retries_then_isolates_bad_rows(db, monkeypatch):
+    from sqlalchemy import exc
+
+    from app import write_behind
+
+    user = create_user(db, f"wb-{uuid.uuid4().hex[:8]}@example.com", "StrongPass123")
+    real_insert = write_behind.insert_prediction_rows
+    calls = []
+
+    def flaky_insert(session, rows):
+        calls.append(len(rows))
+        if len(calls) == 1:
+            raise exc.OperationalError("INSERT", {}, Exception("server closed the connection"))
+        if any(r["predicted_value"] < 0 for r in rows):
+            raise exc.IntegrityError("INSERT", {}, Exception("check constraint"))
+        real_insert(session, rows)
+
+    monkeypatch.setattr(write_behind, "insert_prediction_rows", flaky_insert)
+    writer = PredictionWriter(SessionLocal, batch_size=10, flush_interval=60, retry_backoff=0.001)
+    for v in (1.0, -1.0, 2.0):
+        assert writer.try_submit(user.id, {"v": v}, v)
+    writer.start()
+    writer.stop()
+    # transient failure, retry (bad row fails the batch), then one insert per row
+    assert calls == [3, 3, 1, 1, 1]
+    assert _count(db, user.id) == 2
+    stats = writer.stats()
+    assert (stats["retried_batches"], stats["flushed_rows"], stats["failed_rows"]) == (1, 2, 1)